@@ -7,6 +7,7 @@ from src.agent_core.bench.tasks import get_task_library
 from src.agent_core.specs.task_spec import TaskSpec
 from src.agent_core.verify.verifier import verify
 from src.agent_core.runtime.run_manager import RunManager
+from src.agent_core.runtime import tracing
 from src.agent_core.schemas.tool import ToolResult, ToolCall
 from src.agent_core.runtime.executor import execute_tool
 from src.agent_core.llm.robust_action import robust_next_action
@@ -28,7 +29,7 @@ def reset(files: list[str]):
             os.remove(f)
 
 
-def run_one(task_text: str, required_files: Optional[List[str]] = None):
+def run_one(task_text: str, required_files: Optional[List[str]] = None, task_id: Optional[str] = None):
     spec = to_spec(task_text)
     if required_files:
         spec.required_files = required_files
@@ -36,13 +37,13 @@ def run_one(task_text: str, required_files: Optional[List[str]] = None):
     reset(spec.required_files or [])
 
     rm = RunManager()
-    ctx = rm.start(tag="agent_day11_robust_action")
+    ctx = rm.start(tag="agent_day11_robust_action", task_id=task_id, strategy="baseline")
     rm.save_text(ctx, "task.txt", task_text)
 
     last: Optional[ToolResult] = None
     hint = "Start."
 
-    for step in range(1, MAX_STEPS + 1):
+    for step in tracing.steps(range(1, MAX_STEPS + 1)):
         obs = (
             f"Task:\n{task_text}\n\n"
             f"Allowed tools: {spec.allowed_tools}\n"
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import argparse
 import os
 from typing import Optional, List
 
@@ -7,13 +8,21 @@ from src.agent_core.bench.tasks import get_task_library, BenchTask
 from src.agent_core.specs.task_spec import TaskSpec
 from src.agent_core.verify.verifier import verify
 from src.agent_core.runtime.run_manager import RunManager
+from src.agent_core.runtime import tracing
+from src.agent_core.llm import usage
 from src.agent_core.schemas.tool import ToolCall, ToolResult
 from src.agent_core.runtime.executor import execute_tool
-from src.agent_core.search.beam import propose_candidates, score_by_gaps
+from src.agent_core.search.beam import evaluate_candidates, propose_candidates
+from src.agent_core.search.beam_search import BeamSearch, artifacts_ok
+from src.agent_core.search.transposition import TranspositionTable
 
 
 MAX_STEPS = 30
 K = 4
+TOP_M = 3  # candidates executed per expansion after static pre-scoring (search/prescore.py)
+WIDTH = 2  # trajectories kept per depth (run)
+MAX_DEPTH = 8
+CANDIDATE_TIMEOUT_S = 30
 
 
 def reset(files: list[str]):
@@ -42,84 +51,109 @@ def allowed_for_phase(artifacts_ok: bool) -> List[str]:
 
 
 def run(bt: BenchTask):
+    """Beam search over trajectories: WIDTH partial trajectories kept per depth, tree in search_tree.json."""
     spec = to_spec(bt)
     reset(spec.required_files or [])
 
-    rm = RunManager()
-    ctx = rm.start(tag=f"agent_day12_beam_{bt.task_id}")
-    rm.save_text(ctx, "task.txt", bt.task)
-    rm.save_json(ctx, "task_spec.json", spec.__dict__)
-
-    last: Optional[ToolResult] = None
-    hint = "Start."
-
-    for step in range(1, MAX_STEPS + 1):
-        v_art = verify(spec, last=None, check_stdout=False)
-        artifacts_ok = v_art.ok
-        allowed = allowed_for_phase(artifacts_ok)
-
-        obs = (
-            f"Task:\n{bt.task}\n\n"
-            f"PHASE: {'COMPUTE' if artifacts_ok else 'ARTIFACTS'}\n"
-            f"Allowed tools THIS STEP: {allowed}\n"
-            f"Hint: {hint}\n"
-            f"GAPS: {v_art.gaps}\n\n"
-            "Return JSON tool call only.\n"
-        )
-        rm.save_text(ctx, f"step_{step:02d}_obs.txt", obs)
-
-        cands = propose_candidates(bt.task, obs, k=K)
-        rm.save_json(ctx, f"step_{step:02d}_candidates.json", {"candidates": cands})
-
-        best_action: Optional[ToolCall] = None
-        best_score = -1e9
-        best_reason = "none"
-
-        # One-step lookahead: execute candidate, verify artifacts/stdout, pick best
-        for i, c in enumerate(cands):
-            if c["name"] not in allowed:
-                continue
-            action = ToolCall.model_validate(c)
-            result = execute_tool(action, task=bt.task)
-
-            v_full = verify(spec, result, check_stdout=True)
-            s = score_by_gaps(v_full.gaps)
-
-            rm.save_json(ctx, f"step_{step:02d}_cand_{i}_eval.json", {
-                "action": action.model_dump(),
-                "result": result.model_dump(),
-                "verify_ok": v_full.ok,
-                "gaps": v_full.gaps,
-                "score": s,
-            })
-
-            if v_full.ok:
-                rm.save_text(ctx, "final.txt", "DONE")
-                print(f"[Day12] OK run_id={ctx.run_id}")
-                return True
-
-            if s > best_score:
-                best_score = s
-                best_action = action
-                best_reason = f"best_score={s}"
-
-        if best_action is None:
-            best_action = ToolCall(name="shell_exec", args={"cmd": "pwd && ls -l"})
-            best_reason = "fallback"
-
-        rm.save_text(ctx, f"step_{step:02d}_chosen.txt", best_reason)
-        last = execute_tool(best_action, task=bt.task)
-        rm.save_json(ctx, f"step_{step:02d}_result.json", last.model_dump())
-
-        v_after = verify(spec, last, check_stdout=True)
-        rm.save_json(ctx, f"step_{step:02d}_verify.json", {"ok": v_after.ok, "hint": v_after.hint, "gaps": v_after.gaps})
-        hint = v_after.hint
-
-    rm.save_text(ctx, "final.txt", "FAILED")
-    print(f"[Day12] FAILED run_id={ctx.run_id}")
-    return False
+    with RunManager(async_writes=True) as rm:
+        ctx = rm.start(tag=f"agent_day12_beam_{bt.task_id}", task_id=bt.task_id, strategy="beam")
+        rm.save_text(ctx, "task.txt", bt.task)
+        rm.save_json(ctx, "task_spec.json", spec.__dict__)
+
+        res = BeamSearch(
+            spec,
+            task=bt.task,
+            width=WIDTH,
+            k=K,
+            top_m=TOP_M,
+            max_depth=MAX_DEPTH,
+            allowed_fn=lambda node: allowed_for_phase(artifacts_ok(node.gaps)),
+            timeout=CANDIDATE_TIMEOUT_S,
+            save=lambda name, obj: rm.save_json(ctx, name, obj),
+        ).run()
+        rm.save_text(ctx, "final.txt", "DONE" if res.ok else "FAILED")
+        print(f"[Day12] {'OK' if res.ok else 'FAILED'} run_id={ctx.run_id} depth={len(res.path)} "
+              f"llm_calls={res.llm_calls} executions={res.executions} avoided={res.avoided}")
+        return res.ok
+
+
+def run_greedy(bt: BenchTask):
+    """One-step lookahead: the best of K candidates is kept at every step."""
+    spec = to_spec(bt)
+    reset(spec.required_files or [])
+
+    with RunManager(async_writes=True) as rm:
+        ctx = rm.start(tag=f"agent_day12_greedy_{bt.task_id}", task_id=bt.task_id, strategy="beam_greedy")
+        rm.save_text(ctx, "task.txt", bt.task)
+        rm.save_json(ctx, "task_spec.json", spec.__dict__)
+
+        last: Optional[ToolResult] = None
+        hint = "Start."
+        table = TranspositionTable()  # re-proposed actions on an unchanged workspace are not re-run
+
+        for step in tracing.steps(range(1, MAX_STEPS + 1)):
+            v_art = verify(spec, last=None, check_stdout=False)
+            artifacts_ok = v_art.ok
+            allowed = allowed_for_phase(artifacts_ok)
+
+            obs = (
+                f"Task:\n{bt.task}\n\n"
+                f"PHASE: {'COMPUTE' if artifacts_ok else 'ARTIFACTS'}\n"
+                f"Allowed tools THIS STEP: {allowed}\n"
+                f"Hint: {hint}\n"
+                f"GAPS: {v_art.gaps}\n\n"
+                "Return JSON tool call only.\n"
+            )
+            rm.save_text(ctx, f"step_{step:02d}_obs.txt", obs)
+
+            with tracing.span("propose", cat="llm", k=K):
+                cands = propose_candidates(bt.task, obs, k=K)
+            rm.save_json(ctx, f"step_{step:02d}_candidates.json", {"candidates": cands})
+
+            # One-step lookahead: all candidates run at once, each in its own workspace;
+            # the first one to pass verify cancels the rest
+            with tracing.span("evaluate", cat="search", k=len(cands)):
+                ev = evaluate_candidates(
+                    cands, spec, task=bt.task, allowed=allowed, concurrency=K, timeout=CANDIDATE_TIMEOUT_S,
+                    table=table, gaps=v_art.gaps, top_m=TOP_M,
+                )
+            try:
+                for e in ev.evals:
+                    rm.save_json(ctx, f"step_{step:02d}_cand_{e.index}_eval.json", e.to_json())
+
+                if ev.winner is not None:
+                    ev.adopt(ev.winner)  # its files become the real ones
+                    rm.save_text(ctx, "final.txt", "DONE")
+                    print(f"[Day12] OK run_id={ctx.run_id} wall={ev.wall_s:.2f}s")
+                    return True
+
+                best = ev.best
+                if best is not None:
+                    # keep what the best candidate did instead of executing it a second time
+                    ev.adopt(best)
+                    last = best.result
+                    rm.save_text(ctx, f"step_{step:02d}_chosen.txt", f"best_score={best.score} cand={best.index}")
+                else:
+                    rm.save_text(ctx, f"step_{step:02d}_chosen.txt", "fallback")
+                    last = execute_tool(ToolCall(name="shell_exec", args={"cmd": "pwd && ls -l"}), task=bt.task)
+            finally:
+                ev.cleanup()
+            rm.save_json(ctx, f"step_{step:02d}_result.json", last.model_dump())
+
+            v_after = verify(spec, last, check_stdout=True)
+            rm.save_json(ctx, f"step_{step:02d}_verify.json", {"ok": v_after.ok, "hint": v_after.hint, "gaps": v_after.gaps})
+            hint = v_after.hint
+
+        rm.save_text(ctx, "final.txt", "FAILED")
+        print(f"[Day12] FAILED run_id={ctx.run_id}")
+        return False
 
 
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--greedy", action="store_true", help="one-step lookahead instead of beam search")
+    args = ap.parse_args()
     bt = get_task_library()[0]
-    run(bt)
\ No newline at end of file
+    before = usage.snapshot()
+    (run_greedy if args.greedy else run)(bt)
+    print(f"[Day12] LLM calls: {usage.delta(before)['calls']}")
\ No newline at end of file
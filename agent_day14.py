@@ -1,16 +1,20 @@
 from __future__ import annotations
 
 import json
+import time
 from typing import Dict, Any
 
 from src.agent_core.bench.tasks import get_task_library, BenchTask
 from src.agent_core.learning.bandit import UCB1
 from src.agent_core.learning.rule_store import RuleStore
+from src.agent_core.llm import usage
+from src.agent_core.runtime import metrics
 
 # Reuse Day12/Day13 runners as "strategies"
 from agent_day12 import run as run_beam
 from agent_day13 import run as run_critic
 from agent_day11 import run_one as run_baseline
+from agent_day19 import run as run_mcts
 
 
 def reward(ok: bool) -> float:
@@ -18,6 +22,8 @@ def reward(ok: bool) -> float:
 
 
 if __name__ == "__main__":
+    exporter = metrics.start_exporter_from_env()  # AGENT_METRICS_PORT / AGENT_METRICS_TEXTFILE
+    arm_mean = metrics.REGISTRY.gauge("agent_bandit_arm_mean", "UCB1 mean reward per arm.", ("arm",))
     tasks = get_task_library()
     store = RuleStore()
     _ = store.load()
@@ -26,6 +32,7 @@ if __name__ == "__main__":
     bandit.add_arm("baseline")
     bandit.add_arm("beam")
     bandit.add_arm("critic")
+    bandit.add_arm("mcts")
 
     results: Dict[str, Any] = {"runs": []}
 
@@ -34,22 +41,35 @@ if __name__ == "__main__":
         bt: BenchTask = tasks[i % len(tasks)]
         arm = bandit.select()
 
-        if arm == "baseline":
-            ok = run_baseline(bt.task, required_files=getattr(bt, "required_files", None))
-        elif arm == "beam":
-            ok = run_beam(bt)
-        else:
-            ok = run_critic(bt)
+        before, t0 = usage.snapshot(), time.perf_counter()
+        with metrics.episode(arm) as ep:
+            if arm == "baseline":
+                ok = run_baseline(bt.task, required_files=getattr(bt, "required_files", None), task_id=bt.task_id)
+            elif arm == "beam":
+                ok = run_beam(bt)
+            elif arm == "mcts":
+                ok = run_mcts(bt)
+            else:
+                ok = run_critic(bt)
+            ep["ok"] = ok
 
         r = reward(ok)
         bandit.update(arm, r)
 
-        results["runs"].append({"i": i, "task_id": bt.task_id, "strategy": arm, "ok": ok, "reward": r})
+        spent = usage.delta(before)
+        results["runs"].append({"i": i, "task_id": bt.task_id, "strategy": arm, "ok": ok, "reward": r,
+                                "llm_calls": spent["calls"],
+                                "tokens": spent["prompt_tokens"] + spent["completion_tokens"],
+                                "seconds": round(time.perf_counter() - t0, 3)})
         results["bandit"] = {k: {"n": st.n, "mean": st.mean} for k, st in bandit.arms.items()}
+        for k, st in bandit.arms.items():
+            arm_mean.set(st.mean, arm=k)
 
         print(f"[Day14] ep={i} task={bt.task_id} arm={arm} ok={ok} bandit={results['bandit']}")
 
     with open("eval_day14_bandit.json", "w", encoding="utf-8") as f:
         json.dump(results, f, ensure_ascii=False, indent=2)
 
-    print("Wrote eval_day14_bandit.json")
\ No newline at end of file
+    print("Wrote eval_day14_bandit.json")
+    if isinstance(exporter, metrics.TextfileExporter):
+        exporter.stop()
\ No newline at end of file
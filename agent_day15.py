@@ -1,31 +1,39 @@
 from __future__ import annotations
 
 import json
+import time
 from collections import defaultdict
 from typing import Dict, Any
 
 from src.agent_core.bench.tasks import get_task_library, BenchTask
 from src.agent_core.learning.curriculum import CurriculumConfig, write_markdown_report
+from src.agent_core.learning.incremental import mine_new_runs
 from src.agent_core.learning.rule_store import RuleStore
+from src.agent_core.llm import usage
+from src.agent_core.runtime import metrics
 
 from agent_day11 import run_one as run_baseline
 from agent_day12 import run as run_beam
 from agent_day13 import run as run_critic
-from agent_day7 import load_success_histories, mine_rules  # 用你 Day7 的规则挖掘
+from agent_day19 import run as run_mcts
+from agent_day7 import open_catalog, load_history, mine_rules  # 用你 Day7 的规则挖掘
 
 
 def run_strategy(bt: BenchTask, strategy: str) -> bool:
     if strategy == "baseline":
-        return run_baseline(bt.task, required_files=getattr(bt, "required_files", None))
+        return run_baseline(bt.task, required_files=getattr(bt, "required_files", None), task_id=bt.task_id)
     if strategy == "beam":
         return run_beam(bt)
     if strategy == "critic":
         return run_critic(bt)
+    if strategy == "mcts":
+        return run_mcts(bt)
     raise ValueError(strategy)
 
 
 if __name__ == "__main__":
-    cfg = CurriculumConfig(episodes_per_task=3, strategies=["baseline", "beam", "critic"])
+    exporter = metrics.start_exporter_from_env()  # AGENT_METRICS_PORT / AGENT_METRICS_TEXTFILE
+    cfg = CurriculumConfig(episodes_per_task=3, strategies=["baseline", "beam", "critic", "mcts"])
     tasks = get_task_library()
 
     results: Dict[str, Any] = {
@@ -34,35 +42,48 @@ if __name__ == "__main__":
         "by_strategy": {},
     }
 
-    by_strategy = defaultdict(lambda: {"ok": 0, "n": 0})
+    by_strategy = defaultdict(lambda: {"ok": 0, "n": 0, "llm_calls": 0, "tokens": 0, "seconds": 0.0})
 
     for bt in tasks:
         bt_res = {"task_id": bt.task_id, "runs": []}
         for strat in cfg.strategies:
             for i in range(cfg.episodes_per_task):
-                ok = run_strategy(bt, strat)
-                bt_res["runs"].append({"strategy": strat, "i": i, "ok": ok})
-                by_strategy[strat]["n"] += 1
-                by_strategy[strat]["ok"] += (1 if ok else 0)
+                before, t0 = usage.snapshot(), time.perf_counter()
+                with metrics.episode(strat) as ep:
+                    ok = ep["ok"] = run_strategy(bt, strat)
+                spent, secs = usage.delta(before), time.perf_counter() - t0
+                bt_res["runs"].append({"strategy": strat, "i": i, "ok": ok, "llm_calls": spent["calls"],
+                                       "seconds": round(secs, 3)})
+                agg = by_strategy[strat]
+                agg["n"] += 1
+                agg["ok"] += (1 if ok else 0)
+                agg["llm_calls"] += spent["calls"]
+                agg["tokens"] += spent["prompt_tokens"] + spent["completion_tokens"]
+                agg["seconds"] += secs
         results["tasks"].append(bt_res)
 
+    # success per unit of compute, so search strategies compare fairly with single-shot ones
     results["by_strategy"] = {
-        k: {"success_rate": (v["ok"] / v["n"] if v["n"] else 0.0), "n": v["n"]}
+        k: {
+            "success_rate": (v["ok"] / v["n"] if v["n"] else 0.0),
+            "n": v["n"],
+            "llm_calls": v["llm_calls"],
+            "successes_per_100_llm_calls": (100.0 * v["ok"] / v["llm_calls"] if v["llm_calls"] else 0.0),
+            "successes_per_1k_tokens": (1000.0 * v["ok"] / v["tokens"] if v["tokens"] else 0.0),
+            "successes_per_minute": (60.0 * v["ok"] / v["seconds"] if v["seconds"] else 0.0),
+        }
         for k, v in by_strategy.items()
     }
 
     with open("eval_day15_curriculum.json", "w", encoding="utf-8") as f:
         json.dump(results, f, ensure_ascii=False, indent=2)
 
-    # ---- 自动更新 compiled rules（从成功 episode 挖掘）----
-    eps = load_success_histories()
-    new_rules = mine_rules(eps) if eps else []
+    # ---- 自动更新 compiled rules（只挖掘上次之后的新成功 run）----
     store = RuleStore()
-    store.load()
-    store.add(new_rules)
-    store.save()
+    mined = mine_new_runs(open_catalog(), load_history, mine_rules, store=store)
 
-    results["mined_rules_added"] = new_rules
+    results["mined_rules_added"] = mined.rules_added
+    results["mined_runs"] = mined.processed
 
     # Markdown report
     write_markdown_report("docs/day15_report.md", results)
@@ -70,4 +91,6 @@ if __name__ == "__main__":
     print(json.dumps(results["by_strategy"], ensure_ascii=False, indent=2))
     print("Wrote eval_day15_curriculum.json")
     print("Wrote docs/day15_report.md")
-    print(f"Updated compiled rules: {store.path}")
\ No newline at end of file
+    print(f"Updated compiled rules: {store.path}")
+    if isinstance(exporter, metrics.TextfileExporter):
+        exporter.stop()
\ No newline at end of file
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import argparse
+import json
+
+from src.agent_core.bench.tasks import get_task_library, BenchTask
+from src.agent_core.llm import usage
+from src.agent_core.runtime.run_manager import RunManager
+from src.agent_core.search.beam_search import artifacts_ok
+from src.agent_core.search.mcts import MCTS
+
+from agent_day12 import CANDIDATE_TIMEOUT_S, K, MAX_DEPTH, TOP_M, allowed_for_phase, reset, to_spec
+
+MAX_LLM_CALLS = 8  # propose calls per episode
+MAX_SECONDS = 300.0
+
+
+def run(bt: BenchTask, max_llm_calls: int = MAX_LLM_CALLS, max_seconds: float = MAX_SECONDS) -> bool:
+    """MCTS over tool calls; drop-in strategy for the Day14 bandit and Day15 curriculum."""
+    spec = to_spec(bt)
+    reset(spec.required_files or [])
+
+    with RunManager(async_writes=True) as rm:
+        ctx = rm.start(tag=f"agent_day19_mcts_{bt.task_id}", task_id=bt.task_id, strategy="mcts")
+        rm.save_text(ctx, "task.txt", bt.task)
+        rm.save_json(ctx, "task_spec.json", spec.__dict__)
+
+        res = MCTS(
+            spec,
+            task=bt.task,
+            k=K,
+            top_m=TOP_M,
+            max_llm_calls=max_llm_calls,
+            max_seconds=max_seconds,
+            max_depth=MAX_DEPTH,
+            allowed_fn=lambda node: allowed_for_phase(artifacts_ok(node.gaps)),
+            timeout=CANDIDATE_TIMEOUT_S,
+            save=lambda name, obj: rm.save_json(ctx, name, obj),
+        ).run()
+        rm.save_text(ctx, "final.txt", "DONE" if res.ok else "FAILED")
+        print(f"[Day19] {'OK' if res.ok else 'FAILED'} run_id={ctx.run_id} depth={len(res.path)} "
+              f"llm_calls={res.llm_calls} executions={res.executions} cache_hits={res.cache_hits} avoided={res.avoided}")
+        return res.ok
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--task", type=int, default=0, help="index into the bench task library")
+    ap.add_argument("--llm-calls", type=int, default=MAX_LLM_CALLS)
+    ap.add_argument("--seconds", type=float, default=MAX_SECONDS)
+    args = ap.parse_args()
+    bt = get_task_library()[args.task]
+    before = usage.snapshot()
+    ok = run(bt, args.llm_calls, args.seconds)
+    print(json.dumps({"ok": ok, "usage": usage.delta(before)}, ensure_ascii=False))
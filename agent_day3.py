@@ -9,12 +9,17 @@ from agent_core.runtime.run_manager import RunManager
 from agent_core.runtime.executor import execute_tool
 from agent_core.llm.action_router import next_action
 from agent_core.memory.episodic import EpisodicMemory
+from agent_core.memory.minhash import episode_actions
+from agent_core.learning.incremental import reflect_new_episodes
+from agent_core.learning.rule_store import RuleStore, SELECT_K
 from agent_core.llm.reflection import reflect
 from agent_core.runtime.guardrails import Guardrails
 from agent_core.schemas.tool import ToolCall, ToolResult
 
 MAX_STEPS = 12
 REPEAT_ACTION_LIMIT = 2  # after 2 repeats, we inject anti-stuck notice (guardrails may also intervene)
+REFLECT_EPISODES = 50  # episodes per reflection call; only those after the watermark are loaded
+SIMILAR_EPISODES = 2  # successful trajectories of near-duplicate tasks shown as extra rules
 
 
 # ---------------- DoneSpec: task-agnostic stop criteria ----------------
@@ -129,6 +134,15 @@ def compile_rules(task: str, learned_rules: List[str]) -> List[str]:
     out = (base + extras)[:10]
     return out
 
+def similar_trajectory_rules(memory: EpisodicMemory, task: str, k: int = SIMILAR_EPISODES) -> List[str]:
+    """Tool sequences that worked on reworded versions of this task (MinHash/LSH lookup)."""
+    out = []
+    for score, ep in memory.similar_episodes(task, k=k, ok=True):
+        actions = episode_actions(ep.get("history") or [])
+        if actions:
+            out.append(f"A similar task ({ep.get('task', '')[:80]!r}) succeeded with: {' -> '.join(actions[-6:])}.")
+    return out
+
 def require_artifacts(task: str) -> list[str]:
     """
     Infer required on-disk artifacts from task text (simple heuristic for Day4 benchmarks).
@@ -270,21 +284,27 @@ if __name__ == "__main__":
 
     # Attempt 1
     hist1, ok1, run_id1 = run_episode(task, rules=None)
-    memory.save_episode(task, hist1)
+    memory.save_episode(task, hist1, meta={"ok": ok1})
     print("attempt1 run_id:", run_id1, "ok:", ok1)
 
-    # Reflection → rules
-    learned = reflect(memory.load_all())
-    Path("memory/reflection_latest.json").write_text(
-        json.dumps(learned, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
-
-    compiled = compile_rules(task, learned.get("rules", []))
-    print("learned rules:", learned.get("rules", []))
+    # Reflection → rules (incremental: only episodes saved since the last reflection)
+    store = RuleStore()
+    inc = reflect_new_episodes(memory, reflect, store=store, batch=REFLECT_EPISODES)
+    if inc.outputs:
+        Path("memory/reflection_latest.json").write_text(
+            json.dumps(inc.outputs[-1], ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+    # a few rules picked for this task (tag overlap + success rate), not every stored rule
+    similar = similar_trajectory_rules(memory, task)
+    selected = store.select(task, k=max(1, SELECT_K - len(similar)))
+
+    compiled = compile_rules(task, similar + selected)
+    print("learned rules:", inc.rules_added)
     print("compiled rules:", compiled)
 
     # Attempt 2 with memory/policy
     hist2, ok2, run_id2 = run_episode(task, rules=compiled)
-    memory.save_episode(task, hist2)
+    memory.save_episode(task, hist2, meta={"ok": ok2})
+    store.update(lambda s: s.record_outcome(selected, ok2))
     print("attempt2 run_id:", run_id2, "ok:", ok2)
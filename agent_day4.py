@@ -14,12 +14,13 @@ def reset_env():
         if os.path.exists(f):
             os.remove(f)
 N = 1
+REFLECT_EPISODES = 50
 
 def run_strategy(task: str, rules, tag: str = "agent_day4", meta: dict | None = None) -> dict:
     reset_env()
     try:
         hist, ok, run_id = run_episode(task, rules=rules, tag=tag, meta=meta)
-        memory.save_episode(task, hist, meta=meta)
+        memory.save_episode(task, hist, meta={**(meta or {}), "ok": ok})
         m = compute_metrics(hist)
         s = score_run(m, ok)
         return {"ok": ok, "run_id": run_id, "metrics": m, "score": s}
@@ -45,9 +46,8 @@ if __name__ == "__main__":
     results["strategies"]["no_rules"] = r1
 
     # reflection from memory so far (optional)
-    episodes = memory.load_all()
     try:
-        learned = reflect(episodes) if episodes else {"rules": []}
+        learned = reflect(memory.iter_episodes(newest_first=True, limit=REFLECT_EPISODES), newest_first=True) if memory.last_id() else {"rules": []}
     except Exception as e:
         print("Reflection failed, fallback to empty rules:", repr(e))
         learned = {"rules": []}
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-import glob
 import json
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from src.agent_core.learning.rule_store import RuleStore
+from src.agent_core.runtime.run_catalog import RunCatalog, RunRecord
+from src.agent_core.runtime.run_log import RunLogReader
 from src.agent_core.llm.client import LLMClient  # 你已有的 client
+from src.agent_core.llm.budget_summary import summary_json
 # 如果你的 client 类名不同，把这一行改掉即可
 
 
@@ -14,30 +16,44 @@ PROMPT_SYSTEM = (
     "You are a rule miner. Extract GENERAL, reusable rules from successful agent episodes.\n"
     "Return STRICT JSON: {\"rules\": [\"...\"]}.\n"
     "Rules must be actionable, short, and not tied to specific file names unless generic (e.g., 'CSV').\n"
-    "Do not include more than 8 rules."
+    "Do not include more than 8 rules.\n"
+    "Steps refer to tracebacks by id; the texts are in the input's \"errors\" map."
 )
+MINE_BUDGET_TOKENS = 3000  # was a 12000-char cut of the raw JSON
 
 
-def load_success_histories(runs_dir: str = "runs") -> List[Dict[str, Any]]:
+def open_catalog(runs_dir: str = "runs") -> RunCatalog:
+    catalog = RunCatalog(os.path.join(runs_dir, "catalog.db"))
+    catalog.ensure_backfilled(runs_dir)  # one-time scan of runs created before the catalog existed
+    return catalog
+
+
+def load_history(rec: RunRecord) -> Optional[Dict[str, Any]]:
+    reader = RunLogReader(rec.run_dir)  # handles both run.jsonl and legacy per-file runs
+    if not reader.has("history.json"):
+        return None
+    obj = reader.read_json("history.json")
+    return {"run": rec.run_id, "history": obj.get("history", [])}
+
+
+def load_success_histories(runs_dir: str = "runs", limit: int = 20) -> List[Dict[str, Any]]:
+    catalog = open_catalog(runs_dir)
+
+    # newest successes first via the (status, started_at) index; skip runs without history.json
     episodes = []
-    for run in sorted(glob.glob(os.path.join(runs_dir, "*"))):
-        final_path = os.path.join(run, "final.txt")
-        hist_path = os.path.join(run, "history.json")
-        if not os.path.exists(final_path) or not os.path.exists(hist_path):
-            continue
-        with open(final_path, "r", encoding="utf-8") as f:
-            final = f.read().strip()
-        if "DONE" not in final:
+    for rec in catalog.iter_latest(status="done"):
+        ep = load_history(rec)
+        if ep is None:
             continue
-        with open(hist_path, "r", encoding="utf-8") as f:
-            obj = json.load(f)
-        episodes.append({"run": os.path.basename(run), "history": obj.get("history", [])})
-    return episodes[-20:]  # 最近20条成功记录
+        episodes.append(ep)
+        if len(episodes) >= limit:
+            break
+    return episodes[::-1]  # 最近20条成功记录 (oldest first, as before)
 
 
 def mine_rules(episodes: List[Dict[str, Any]]) -> List[str]:
     client = LLMClient()
-    payload = json.dumps({"episodes": episodes}, ensure_ascii=False)[:12000]
+    payload = summary_json(episodes, MINE_BUDGET_TOKENS)  # valid JSON, most informative steps first
 
     raw = client.chat(
         messages=[
@@ -62,9 +78,7 @@ if __name__ == "__main__":
 
     rules = mine_rules(eps)
     store = RuleStore()
-    store.load()
-    store.add(rules)
-    store.save()
+    store.update(lambda s: s.add(rules))
 
     print("[Day7] mined rules:")
     for r in rules:
@@ -264,13 +264,16 @@ def run_once(bt: BenchTask, rules: Optional[List[str]], tag: str) -> dict:
 if __name__ == "__main__":
     bt = get_task_library()[0]  # users_events_v1
     store = RuleStore()
-    compiled = store.load()
+    store.load()
+    compiled = store.select(bt.task)  # top-k for this task, not the whole store
 
     results = {"no_rules": [], "compiled_rules": []}
 
     for i in range(N):
         results["no_rules"].append(run_once(bt, rules=None, tag=f"day8_no_rules_{i}"))
         results["compiled_rules"].append(run_once(bt, rules=compiled, tag=f"day8_compiled_rules_{i}"))
+    outcomes = [r["ok"] for r in results["compiled_rules"]]
+    store.update(lambda s: [s.record_outcome(compiled, ok) for ok in outcomes])
 
     summary = {}
     for k, runs in results.items():
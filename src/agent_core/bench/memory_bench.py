@@ -0,0 +1,282 @@
+"""
+Throughput benchmark for the episode memory stores.
+
+    python -m src.agent_core.bench.memory_bench --n 10000 --readers 4
+    python -m src.agent_core.bench.memory_bench --backends --scales 1000 10000 100000
+
+Reports inserts/s for the old access pattern (connect + commit per row, rollback journal),
+single-row inserts on a reused WAL connection and batched add_episodes(), reads/s of
+concurrent reader threads while one writer keeps inserting, and search() latency.
+
+--backends compares EpisodicMemory (json files, jsonl segments) with SQLiteMemoryStore at
+each scale: save, load-recent, by-task and full-scan wall time, peak traced memory of the
+reads (tracemalloc, measured in a second pass), on-disk size, and json -> sqlite import time.
+Every backend runs at the same durability, once per setting in DURABILITY:
+- "durable": each save is on disk when it returns (json/jsonl fsync per episode, SQLite
+  synchronous=FULL)
+- "relaxed": no fsync per save (json/jsonl fsync=False, SQLite synchronous=NORMAL, which
+  in WAL mode syncs only at checkpoints)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from ..memory.episodic import EpisodicMemory
+from ..memory.importer import import_episodic
+from ..memory.sqlite_store import SQLiteMemoryStore
+
+
+DURABILITY = ("durable", "relaxed")
+_SQLITE_SYNC = {"durable": "FULL", "relaxed": "NORMAL"}
+
+_ERRORS = (
+    "ValueError: could not convert string to float: 'n/a'",
+    "KeyError: 'price'",
+    "ModuleNotFoundError: No module named 'pandas'",
+    "FileNotFoundError: [Errno 2] No such file or directory: 'data.csv'",
+    "ZeroDivisionError: division by zero",
+)
+
+
+def make_rows(n: int, steps: int = 8) -> List[Tuple[str, str, bool, Dict[str, Any]]]:
+    rows = []
+    for i in range(n):
+        task = f"task_{i % 50}"
+        history = [
+            {"step": s, "action": {"name": "python_exec", "args": {"code": f"print({s})"}},
+             "result": {"ok": s % 3 != 0, "output": f"row {i} value {s}",
+                        "error": "" if s % 3 else f"Traceback: {_ERRORS[(i + s) % len(_ERRORS)]}"}}
+            for s in range(steps)
+        ]
+        rows.append((f"run_{i}", task, i % 4 != 0, {"task": task, "ok": i % 4 != 0, "history": history}))
+    return rows
+
+
+def _legacy_insert(path: str, rows) -> None:
+    # what SQLiteMemoryStore used to do: new connection and one transaction per row, rollback journal
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS episodes (id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT, task TEXT, ok INTEGER, payload TEXT)")
+    conn.commit()
+    conn.close()
+    for run_id, task, ok, payload in rows:
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "INSERT INTO episodes(run_id, task, ok, payload) VALUES(?,?,?,?)",
+            (run_id, task, 1 if ok else 0, json.dumps(payload, ensure_ascii=False)),
+        )
+        conn.commit()
+        conn.close()
+
+
+def _rate(n: int, fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return n / max(time.perf_counter() - t0, 1e-9)
+
+
+def bench_inserts(n: int = 10000, legacy_n: int = 1000, workdir: str | None = None) -> Dict[str, Any]:
+    rows = make_rows(n)
+    tmp = workdir or tempfile.mkdtemp(prefix="memory_bench_")
+    try:
+        out: Dict[str, Any] = {"settings": {
+            "legacy": "rollback journal, synchronous=FULL (sqlite3 default)",
+            "wal_single_row": "WAL, synchronous=NORMAL",
+            "wal_single_row_full": "WAL, synchronous=FULL (same durability as legacy)",
+            "wal_batch": "WAL, synchronous=NORMAL, 500 rows per transaction",
+        }}
+        # the legacy pattern is slow enough that a smaller sample gives the rate
+        out["legacy_per_row_inserts_per_s"] = _rate(legacy_n, lambda: _legacy_insert(os.path.join(tmp, "legacy.db"), rows[:legacy_n]))
+
+        store = SQLiteMemoryStore(os.path.join(tmp, "single.db"))
+        out["wal_single_row_inserts_per_s"] = _rate(n, lambda: [store.add_episode(*r) for r in rows])
+        store.close()
+
+        store = SQLiteMemoryStore(os.path.join(tmp, "single_full.db"), synchronous="FULL")
+        out["wal_single_row_full_inserts_per_s"] = _rate(
+            legacy_n, lambda: [store.add_episode(*r) for r in rows[:legacy_n]])
+        store.close()
+
+        store = SQLiteMemoryStore(os.path.join(tmp, "batch.db"))
+        out["wal_batch_inserts_per_s"] = _rate(n, lambda: [store.add_episodes(rows[i:i + 500]) for i in range(0, n, 500)])
+        store.close()
+        return out
+    finally:
+        if workdir is None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_concurrent(n: int = 10000, readers: int = 4, seconds: float = 3.0, workdir: str | None = None) -> Dict[str, float]:
+    rows = make_rows(n)
+    tmp = workdir or tempfile.mkdtemp(prefix="memory_bench_")
+    try:
+        store = SQLiteMemoryStore(os.path.join(tmp, "concurrent.db"))
+        store.add_episodes(rows)
+        stop = threading.Event()
+        reads = [0] * readers
+        writes = [0]
+
+        def reader(k: int) -> None:
+            while not stop.is_set():
+                store.by_task(f"task_{reads[k] % 50}", limit=20)
+                reads[k] += 1
+
+        def writer() -> None:
+            i = 0
+            while not stop.is_set():
+                store.add_episodes(rows[i:i + 50])
+                writes[0] += 50
+                i = (i + 50) % n
+
+        threads = [threading.Thread(target=reader, args=(k,)) for k in range(readers)] + [threading.Thread(target=writer)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        dt = time.perf_counter() - t0
+        store.close()
+        return {"readers": readers, "reads_per_s": sum(reads) / dt, "writes_per_s": writes[0] / dt}
+    finally:
+        if workdir is None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_search(n: int = 20000, queries: int = 200, workdir: str | None = None) -> Dict[str, float]:
+    """n episodes x 8 steps; median / p95 search() latency in ms over mixed error queries."""
+    rows = make_rows(n)
+    tmp = workdir or tempfile.mkdtemp(prefix="memory_bench_")
+    try:
+        store = SQLiteMemoryStore(os.path.join(tmp, "search.db"))
+        for i in range(0, n, 1000):
+            store.add_episodes(rows[i:i + 1000])
+        (indexed,) = store._conn().execute("SELECT count(*) FROM steps_fts").fetchone()
+        lat = []
+        for q in range(queries):
+            t0 = time.perf_counter()
+            store.search(_ERRORS[q % len(_ERRORS)], limit=10)
+            lat.append((time.perf_counter() - t0) * 1000)
+        lat.sort()
+        store.close()
+        return {"fts_rows": indexed, "search_ms_p50": lat[len(lat) // 2], "search_ms_p95": lat[int(len(lat) * 0.95)]}
+    finally:
+        if workdir is None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def _peak_mb(fn: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def _disk_mb(path: str) -> float:
+    p = Path(path)
+    files = [p] if p.is_file() else [f for f in p.rglob("*") if f.is_file()]
+    return sum(f.stat().st_size for f in files) / 1e6
+
+
+def bench_backend(backend: str, n: int, workdir: str, steps: int = 8, durability: str = "durable") -> Dict[str, Any]:
+    """
+    backend: "json" | "jsonl" (EpisodicMemory) or "sqlite" (SQLiteMemoryStore, one add_episode
+    per row); durability: one of DURABILITY, applied the same way to every backend.
+    """
+    if durability not in DURABILITY:
+        raise ValueError(f"durability must be one of {DURABILITY}, got {durability!r}")
+    rows = make_rows(n, steps)
+    probe = "task_7"
+    if backend == "sqlite":
+        path = os.path.join(workdir, "sqlite.db")
+        store = SQLiteMemoryStore(path, synchronous=_SQLITE_SYNC[durability])
+        setting = f"synchronous={store.synchronous}"
+        save = lambda: [store.add_episode(*r) for r in rows]
+        reads = {
+            "load_recent": lambda: store.recent(20),
+            "by_task": lambda: store.by_task(probe, limit=50),
+            "full_scan": lambda: sum(1 for _ in store.iter_rows()),
+        }
+    else:
+        path = os.path.join(workdir, backend)
+        mem = EpisodicMemory(path, backend=backend, fsync=durability == "durable")
+        setting = f"fsync={mem.fsync}"
+        save = lambda: [mem.save_episode(task, p["history"], {"ok": ok, "run_id": run_id}) for run_id, task, ok, p in rows]
+        reads = {
+            "load_recent": lambda: list(mem.iter_episodes(newest_first=True, limit=20)),
+            "by_task": lambda: list(mem.iter_episodes(filter=lambda ep: ep["task"] == probe, newest_first=True, limit=50)),
+            "full_scan": lambda: sum(1 for _ in mem.iter_episodes()),
+        }
+    out: Dict[str, Any] = {"durability": durability, "setting": setting, "save_s": _timed(save)}
+    out["saves_per_s"] = n / max(out["save_s"], 1e-9)
+    for name, fn in reads.items():
+        out[f"{name}_s"] = _timed(fn)
+        out[f"{name}_peak_mb"] = _peak_mb(fn)
+    out["disk_mb"] = _disk_mb(path)
+    if backend == "sqlite":
+        store.close()
+    return out
+
+
+def bench_backends(
+    scales: Sequence[int] = (1000, 10000, 100000),
+    backends: Sequence[str] = ("json", "jsonl", "sqlite"),
+    steps: int = 8,
+    durability: Sequence[str] = DURABILITY,
+) -> Dict[str, Dict[str, Any]]:
+    """{scale: {durability: {backend: results}}}, plus the json -> sqlite import per scale."""
+    res: Dict[str, Dict[str, Any]] = {}
+    for n in scales:
+        res[str(n)] = {}
+        for mode in durability:
+            tmp = tempfile.mkdtemp(prefix="memory_bench_")
+            try:
+                res[str(n)][mode] = {b: bench_backend(b, n, tmp, steps, mode) for b in backends}
+                if "json" in backends and "import_json_to_sqlite" not in res[str(n)]:
+                    store = SQLiteMemoryStore(os.path.join(tmp, "imported.db"))
+                    res[str(n)]["import_json_to_sqlite"] = import_episodic(os.path.join(tmp, "json"), store)
+                    store.close()
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+    return res
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark episode memory stores.")
+    ap.add_argument("--n", type=int, default=10000)
+    ap.add_argument("--legacy-n", type=int, default=1000)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--search-n", type=int, default=20000)
+    ap.add_argument("--backends", action="store_true", help="compare json / jsonl / sqlite instead")
+    ap.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--durability", nargs="+", choices=DURABILITY, default=list(DURABILITY))
+    args = ap.parse_args()
+    if args.backends:
+        print(json.dumps(bench_backends(args.scales, durability=args.durability), ensure_ascii=False, indent=2))
+        raise SystemExit(0)
+    res = {
+        "inserts": bench_inserts(args.n, args.legacy_n),
+        "concurrent": bench_concurrent(args.n, args.readers, args.seconds),
+        "search": bench_search(args.search_n),
+    }
+    print(json.dumps(res, ensure_ascii=False, indent=2))
@@ -16,7 +16,7 @@ class CurriculumConfig:
 
     def __post_init__(self):
         if self.strategies is None:
-            self.strategies = ["baseline", "beam", "critic"]
+            self.strategies = ["baseline", "beam", "critic", "mcts"]
 
 
 def write_markdown_report(path: str, summary: Dict[str, Any]):
@@ -0,0 +1,187 @@
+"""
+Incremental reflection / rule mining: only episodes and runs not seen before are sent to the LLM.
+
+A watermark per source lives in memory/learning_state.json:
+- "reflect:episodic" : last EpisodicMemory id reflected on
+- "mine:runs"        : (finished_at, run_id) of the last successful run mined (finish order, so
+                       a long run that started before already-mined ones is still picked up)
+
+Resulting rules are merged into RuleStore with provenance "<source>:<first>-<last>". The LLM
+calls are passed in (reflect_fn / mine_fn), so this module imports no client. rebuild=True is
+the explicit full pass: it drops the source's rules from the store, resets the watermark and
+walks the whole history batch by batch.
+
+    python -m src.agent_core.learning.incremental --rebuild      # re-reflect all episodes
+    python -m src.agent_core.learning.incremental --rebuild --batch 5000 --concurrency 8
+        # same, each batch reflected map-reduce style (llm/reflection_mr.py)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from ..memory.episodic import EpisodicMemory
+from ..runtime.run_catalog import RunCatalog, RunRecord
+from .rule_store import RuleStore
+
+STATE_PATH = "memory/learning_state.json"
+REFLECT_SOURCE = "reflect:episodic"
+MINE_SOURCE = "mine:runs"
+BATCH = 50  # episodes / runs per LLM call
+
+
+class Watermarks:
+    """Small JSON map of source -> watermark, rewritten atomically."""
+
+    def __init__(self, path: str = STATE_PATH):
+        self.path = Path(path)
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+
+    def get(self, source: str, default: Any = None) -> Any:
+        return self._read().get(source, default)
+
+    def set(self, source: str, value: Any) -> None:
+        state = self._read()
+        state[source] = value
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+@dataclass
+class IncrementalResult:
+    processed: int = 0
+    batches: int = 0
+    rules_added: List[str] = field(default_factory=list)
+    watermark: Any = None
+    outputs: List[Dict[str, Any]] = field(default_factory=list)  # raw reflect_fn results, one per batch
+
+
+def _commit(store: RuleStore, marks: Watermarks, source: str, label: str, rules: Iterable[str], mark: Any,
+            res: IncrementalResult) -> None:
+    # rules first: a crash before the watermark moves only repeats a batch, and add() dedupes.
+    # update(): other learners may be adding rules to the same store right now
+    res.rules_added += store.update(lambda s: s.add(list(rules), source=f"{source}:{label}"))
+    marks.set(source, mark)
+    res.watermark = mark
+
+
+def reflect_new_episodes(
+    memory: EpisodicMemory,
+    reflect_fn: Callable[[List[Dict[str, Any]]], Dict[str, Any]],
+    store: Optional[RuleStore] = None,
+    marks: Optional[Watermarks] = None,
+    batch: int = BATCH,
+    rebuild: bool = False,
+) -> IncrementalResult:
+    """
+    Reflect on episodes saved after the watermark, `batch` per reflect_fn call. Without a
+    watermark, only the newest `batch` episodes are used (what reflecting on the latest history
+    used to cost); rebuild=True walks everything from id 1. The watermark stops at
+    memory.settled_id(), before an episode whose id is allocated but not written yet.
+    """
+    store = store or RuleStore()
+    store.load()
+    marks = marks or Watermarks()
+    res = IncrementalResult()
+    last = memory.settled_id()
+    if rebuild:
+        store.update(lambda s: s.drop_source(REFLECT_SOURCE + ":"))
+        after = 0
+    else:
+        after = marks.get(REFLECT_SOURCE)
+        after = max(0, last - batch) if after is None else int(after)
+    res.watermark = after
+    while after < last:
+        upto = min(after + batch, last)
+        eps = [ep for ep in map(memory.load, range(after + 1, upto + 1)) if ep is not None]
+        if eps:
+            out = reflect_fn(eps)
+            res.outputs.append(out)
+            res.processed += len(eps)
+            res.batches += 1
+            _commit(store, marks, REFLECT_SOURCE, f"{eps[0]['id']}-{eps[-1]['id']}", out.get("rules", []), upto, res)
+        else:
+            marks.set(REFLECT_SOURCE, upto)
+            res.watermark = upto
+        after = upto
+    return res
+
+
+def mine_new_runs(
+    catalog: RunCatalog,
+    load_episode: Callable[[RunRecord], Optional[Dict[str, Any]]],
+    mine_fn: Callable[[List[Dict[str, Any]]], List[str]],
+    store: Optional[RuleStore] = None,
+    marks: Optional[Watermarks] = None,
+    batch: int = BATCH,
+    rebuild: bool = False,
+) -> IncrementalResult:
+    """
+    Mine rules from successful runs finished after the watermark, in finish order, `batch`
+    runs per mine_fn call. load_episode(rec) returns the episode dict or None to skip the run.
+    Without a watermark, only the newest `batch` successful runs are mined.
+    """
+    store = store or RuleStore()
+    store.load()
+    marks = marks or Watermarks()
+    res = IncrementalResult()
+    if rebuild:
+        store.update(lambda s: s.drop_source(MINE_SOURCE + ":"))
+        mark = {"finished_at": 0.0, "run_id": ""}
+    else:
+        mark = marks.get(MINE_SOURCE)
+        if mark is None:
+            newest = catalog.latest_finished(status="done", limit=batch)
+            # just before the oldest of them: finished_since() includes equal finished_at with run_id > ""
+            mark = {"finished_at": newest[-1].finished_at if newest else 0.0, "run_id": ""}
+        elif "finished_at" not in mark:
+            # (started_at, run_id) watermark from before: everything finished after that start
+            # (a few runs are mined again; RuleStore.add dedupes their rules)
+            mark = {"finished_at": mark["started_at"], "run_id": ""}
+    res.watermark = mark
+    while True:
+        recs = catalog.finished_since(mark["finished_at"], mark["run_id"], status="done", limit=batch)
+        if not recs:
+            return res
+        eps = [ep for ep in map(load_episode, recs) if ep]
+        mark = {"finished_at": recs[-1].finished_at, "run_id": recs[-1].run_id}
+        rules = mine_fn(eps) if eps else []
+        res.processed += len(eps)
+        res.batches += 1
+        _commit(store, marks, MINE_SOURCE, f"{recs[0].run_id}-{recs[-1].run_id}", rules, mark, res)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Reflect on new episodes (or all of them with --rebuild).")
+    ap.add_argument("--memory", default="memory")
+    ap.add_argument("--rebuild", action="store_true")
+    ap.add_argument("--batch", type=int, default=BATCH)
+    ap.add_argument("--concurrency", type=int, default=0, help="> 0: map-reduce reflection per batch")
+    args = ap.parse_args()
+    # both need model settings; keep the module import LLM-free
+    if args.concurrency > 0:
+        from ..llm.reflection_mr import reflect_map_reduce
+
+        def reflect(eps):
+            mr = reflect_map_reduce(eps, concurrency=args.concurrency, state_dir=os.path.join(args.memory, "reflect_mr"))
+            if mr.failed:
+                raise RuntimeError(f"{len(mr.failed)} shard(s) failed; rerun to retry them: {mr.failed}")
+            return mr.as_reflection()
+    else:
+        from ..llm.reflection import reflect
+
+    r = reflect_new_episodes(EpisodicMemory(args.memory), reflect, batch=args.batch, rebuild=args.rebuild)
+    print(json.dumps({"processed": r.processed, "batches": r.batches, "rules_added": r.rules_added,
+                      "watermark": r.watermark}, ensure_ascii=False, indent=2))
@@ -1,32 +1,382 @@
 from __future__ import annotations
 
 import json
+import math
 import os
-from dataclasses import dataclass, field
-from typing import List
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: fall back to the in-process lock only
+    fcntl = None
+
+from ..memory.minhash import jaccard, task_features
+
+NEAR_DUP = 0.7  # word-shingle Jaccard above which a new rule merges into an existing one
+MAX_RULES = 60  # add() evicts down to this many
+SELECT_K = 5  # rules per prompt
+MIN_TRIALS = 5  # injections before a rule can be evicted for a poor success rate
+MIN_SUCCESS = 0.2
+
+_WS = re.compile(r"\s+")
+_TAG_WORD = re.compile(r"[a-z][a-z0-9_]{2,}")
+_STOP = frozenset(
+    "the and for with then that this when use using before after into from your you are not any all "
+    "always never must should only each file's".split()
+)
+
+
+def normalize_rule(rule: str) -> str:
+    return _WS.sub(" ", rule).strip().rstrip(".").lower()
+
+
+def _content_words(text: str) -> List[str]:
+    """Content words in order, crudely singularized ("files" -> "file")."""
+    out = []
+    for w in _TAG_WORD.findall(text.lower()):
+        if w not in _STOP:
+            out.append(w[:-1] if w.endswith("s") and not w.endswith("ss") and len(w) > 3 else w)
+    return out
+
+
+def tags_for(text: str) -> Set[str]:
+    """Content words of a rule or task (rule retrieval)."""
+    return set(_content_words(text))
+
+
+class RuleKey:
+    """
+    What near-duplicate detection compares: normalized text and word shingles. A shared
+    opening ("Use pandas to read users.csv ...") is not enough: rules often differ only after it.
+    """
+
+    __slots__ = ("norm", "feats")
+
+    def __init__(self, rule: str):
+        self.norm = normalize_rule(rule)
+        self.feats = task_features(self.norm)
+
+    def same(self, other: "RuleKey", threshold: float = NEAR_DUP) -> bool:
+        return self.norm == other.norm or jaccard(self.feats, other.feats) >= threshold
+
+
+@dataclass
+class RuleRecord:
+    text: str
+    tags: List[str] = field(default_factory=list)
+    injected: int = 0  # episodes whose prompt carried the rule
+    successes: int = 0  # ... of which succeeded
+    added_at: float = 0.0
+    last_used: Optional[float] = None
+    aliases: List[str] = field(default_factory=list)  # near-duplicates merged into this rule
+    provenance: List[Dict[str, object]] = field(default_factory=list)  # [{"source", "at"}]
+
+    @property
+    def success_rate(self) -> float:
+        """Smoothed (Laplace) success rate when injected: 0.5 for a rule never used."""
+        return (self.successes + 1) / (self.injected + 2)
+
+
+_THREAD_LOCKS: Dict[str, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+def _thread_lock(path: str) -> threading.Lock:
+    # flock() does not exclude threads of one process that open the lock file separately
+    key = os.path.abspath(path)
+    with _THREAD_LOCKS_GUARD:
+        return _THREAD_LOCKS.setdefault(key, threading.Lock())
 
 
 @dataclass
 class RuleStore:
+    """
+    memory/compiled_rules.json: {"rules": [...], "records": {rule: RuleRecord fields}}.
+
+    - "rules" keeps its original shape, so older readers still work; files with only "rules"
+      (or the older "provenance" map) load fine, near-duplicates in them are merged on load
+    - add() merges near-duplicates (RuleKey: word-shingle Jaccard >= NEAR_DUP) into the
+      existing rule, tags rules by content words and evicts low-value rules past MAX_RULES
+    - select(task, k) picks the k rules for a prompt: tag overlap with the task, plus the
+      rule's success rate when it was injected (record_outcome())
+    - provenance records which reflection / mining pass produced each rule
+      (learning/incremental.py passes e.g. "reflect:episodic:41-57")
+
+    Concurrency: save() writes a temp file and renames it into place under an exclusive lock
+    on <path>.lock, so readers never see partial JSON. Writers that may run in parallel
+    (curriculum workers, several learners) use update(fn): lock, reload from disk, apply fn,
+    save, unlock. Changes made by other processes since this one loaded are kept, and fn is
+    applied on top of them. A plain load/add/save cycle can still overwrite those changes.
+    """
+
     path: str = "memory/compiled_rules.json"
     rules: List[str] = field(default_factory=list)
+    records: Dict[str, RuleRecord] = field(default_factory=dict)
+    _keys: Dict[str, RuleKey] = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def provenance(self) -> Dict[str, List[Dict[str, object]]]:
+        return {r: self.records[r].provenance for r in self.rules if self.records[r].provenance}
+
+    def _record(self, rule: str) -> RuleRecord:
+        rec = self.records.get(rule)
+        if rec is None:
+            rec = self.records[rule] = RuleRecord(rule, sorted(tags_for(rule)), added_at=time.time())
+        return rec
 
     def load(self) -> List[str]:
         if os.path.exists(self.path):
             with open(self.path, "r", encoding="utf-8") as f:
-                obj = json.load(f)
-            self.rules = list(obj.get("rules", []))
+                self._from_obj(json.load(f))
         return self.rules
 
+    def _from_obj(self, obj: Dict[str, Any]) -> None:
+        self.rules, self.records = [], {}
+        stored, old_prov = obj.get("records", {}), obj.get("provenance", {})
+        for r in obj.get("rules", []):
+            if r in stored:
+                rec = RuleRecord(**stored[r])
+            else:
+                rec = RuleRecord(r, sorted(tags_for(r)), provenance=list(old_prov.get(r, [])))
+            same = self._near_duplicate(r)
+            if same is None:
+                self.rules.append(r)
+                self.records[r] = rec
+            else:
+                self._merge(self.records[same], rec)
+
+    def _merge(self, into: RuleRecord, rec: RuleRecord) -> None:
+        into.injected += rec.injected
+        into.successes += rec.successes
+        into.aliases += [a for a in [rec.text] + rec.aliases if a != into.text and a not in into.aliases]
+        into.provenance += [p for p in rec.provenance if p not in into.provenance]
+
     def save(self):
-        os.makedirs(os.path.dirname(self.path), exist_ok=True)
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump({"rules": self.rules}, f, ensure_ascii=False, indent=2)
+        with self._locked():
+            self._write()
+
+    def _write(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        obj = {"rules": self.rules, "records": {r: asdict(self.records[r]) for r in self.rules}}
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
 
-    def add(self, new_rules: List[str]):
-        s = set(self.rules)
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with _thread_lock(self.path), open(self.path + ".lock", "a") as lf:
+            if fcntl is not None:
+                fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def update(self, fn: Callable[["RuleStore"], Any]) -> Any:
+        """
+        Read-modify-write under the store lock: reload, fn(self), save. Returns fn's result.
+
+            added = store.update(lambda s: s.add(rules, source="mine:runs:..."))
+        """
+        with self._locked():
+            self.load()
+            out = fn(self)
+            self._write()
+        return out
+
+    # ---- writes ----
+    def _key(self, rule: str) -> RuleKey:
+        key = self._keys.get(rule)
+        if key is None:
+            key = self._keys[rule] = RuleKey(rule)
+        return key
+
+    def _near_duplicate(self, rule: str) -> Optional[str]:
+        key = RuleKey(rule)
+        for r in self.rules:
+            if key.same(self._key(r)):
+                return r
+        return None
+
+    def add(self, new_rules: List[str], source: Optional[str] = None, max_rules: int = MAX_RULES) -> List[str]:
+        """
+        Append unseen rules (near-duplicates merge into the rule already stored); with `source`,
+        record it on the new or merged rule. Returns the rules that were actually new.
+        """
+        added = []
         for r in new_rules:
             r = (r or "").strip()
-            if r and r not in s:
+            if not r:
+                continue
+            same = self._near_duplicate(r)
+            if same is None:
                 self.rules.append(r)
-                s.add(r)
\ No newline at end of file
+                rec = self._record(r)
+                added.append(r)
+            else:
+                rec = self._record(same)
+                if r != same and r not in rec.aliases:
+                    rec.aliases.append(r)
+            if source is not None and not any(p.get("source") == source for p in rec.provenance):
+                rec.provenance.append({"source": source, "at": time.time()})
+        self.evict(max_rules)
+        return [r for r in added if r in self.records]
+
+    def drop_source(self, prefix: str) -> List[str]:
+        """
+        Forget provenance entries whose source starts with `prefix`; rules left with no
+        provenance from any source are removed (rules added without a source are kept).
+        Used before a full rebuild. Returns the removed rules.
+        """
+        removed = []
+        for r in list(self.rules):
+            rec = self.records[r]
+            if not rec.provenance:
+                continue
+            rec.provenance = [p for p in rec.provenance if not str(p.get("source", "")).startswith(prefix)]
+            if not rec.provenance:
+                self._remove(r)
+                removed.append(r)
+        return removed
+
+    def _remove(self, rule: str) -> None:
+        self.rules.remove(rule)
+        del self.records[rule]
+        self._keys.pop(rule, None)
+
+    def record_outcome(self, used: Iterable[str], ok: bool) -> None:
+        """Count one episode whose prompt carried `used` (as returned by select())."""
+        now = time.time()
+        for r in used:
+            rec = self.records.get(r)
+            if rec is None:
+                continue
+            rec.injected += 1
+            rec.successes += 1 if ok else 0
+            rec.last_used = now
+
+    def evict(self, max_rules: int = MAX_RULES, min_trials: int = MIN_TRIALS, min_success: float = MIN_SUCCESS) -> List[str]:
+        """Drop rules that keep failing once tried enough, then the lowest-value ones past max_rules."""
+        gone = [r for r in self.rules
+                if self.records[r].injected >= min_trials and self.records[r].success_rate < min_success]
+        for r in gone:
+            self._remove(r)
+        if len(self.rules) > max_rules:
+            # newest rules win ties: they have not had a chance to prove themselves yet
+            ranked = sorted(self.rules, key=lambda r: (self.records[r].success_rate, self.records[r].added_at))
+            for r in ranked[: len(self.rules) - max_rules]:
+                self._remove(r)
+                gone.append(r)
+        return gone
+
+    # ---- reads ----
+    def select(self, task: str, k: int = SELECT_K) -> List[str]:
+        """
+        Top-k rules for `task`: (1 + tag overlap with the task, normalized by the rule's tag
+        count) times the smoothed success rate, so a relevant rule that keeps failing loses to
+        an untried one; ties keep store order.
+        """
+        words = tags_for(task)
+
+        def score(r: str) -> float:
+            rec = self.records[r]
+            overlap = len(words & set(rec.tags)) / math.sqrt(len(rec.tags)) if rec.tags else 0.0
+            return (1.0 + overlap) * rec.success_rate
+
+        ranked = sorted(self.rules, key=score, reverse=True)
+        return ranked[:k]
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    pos    INTEGER NOT NULL,
+    rule   TEXT PRIMARY KEY,
+    record TEXT NOT NULL
+);
+"""
+
+
+@dataclass
+class SQLiteRuleStore(RuleStore):
+    """
+    RuleStore kept in a SQLite file: same API, for many writer processes. update() runs inside
+    BEGIN IMMEDIATE, so SQLite serializes the read-modify-write instead of a lock file.
+
+        store = SQLiteRuleStore("memory/compiled_rules.db")
+        store.update(lambda s: s.add(rules, source=...))
+
+    from_json() seeds it from an existing compiled_rules.json.
+    """
+
+    path: str = "memory/compiled_rules.db"
+    timeout: float = 30.0
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SQLITE_SCHEMA)
+        return conn
+
+    def _read(self, conn: sqlite3.Connection) -> None:
+        rows = conn.execute("SELECT rule, record FROM rules ORDER BY pos").fetchall()
+        self._from_obj({"rules": [r for r, _ in rows], "records": {r: json.loads(rec) for r, rec in rows}})
+
+    def _replace_rows(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM rules")
+        conn.executemany(
+            "INSERT INTO rules(pos, rule, record) VALUES (?, ?, ?)",
+            [(i, r, json.dumps(asdict(self.records[r]), ensure_ascii=False)) for i, r in enumerate(self.rules)],
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def load(self) -> List[str]:
+        conn = self._connect()
+        try:
+            self._read(conn)
+        finally:
+            conn.close()
+        return self.rules
+
+    def save(self):
+        with self._transaction() as conn:
+            self._replace_rows(conn)
+
+    def update(self, fn: Callable[["RuleStore"], Any]) -> Any:
+        with self._transaction() as conn:
+            self._read(conn)
+            out = fn(self)
+            self._replace_rows(conn)
+        return out
+
+    @classmethod
+    def from_json(cls, json_path: str, path: str = "memory/compiled_rules.db") -> "SQLiteRuleStore":
+        src = RuleStore(json_path)
+        src.load()
+        store = cls(path)
+        store.update(lambda s: s._from_obj({"rules": src.rules, "records": {r: asdict(src.records[r]) for r in src.rules}}))
+        return store
@@ -35,6 +35,8 @@ SYSTEM = (
 
 )
 
+MAX_PROMPT_RULES = 10  # callers pick rules per task (RuleStore.select); this only bounds the block
+
 FALLBACK = ToolCall(name="shell_exec", args={"cmd": "pwd && ls"})
 
 def _parse_toolcall(s: str) -> ToolCall:
@@ -42,7 +44,7 @@ def _parse_toolcall(s: str) -> ToolCall:
 
 @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
 def next_action(task: str, observation: str, rules: list[str] | None = None) -> ToolCall:
-    policy = "" if not rules else "\nLEARNED RULES:\n" + "\n".join(rules)
+    policy = "" if not rules else "\nLEARNED RULES:\n" + "\n".join(rules[:MAX_PROMPT_RULES])
 
     raw = client.chat(
         [{"role": "system", "content": SYSTEM},
@@ -0,0 +1,202 @@
+"""
+Token-budgeted episode summaries for reflection and rule mining.
+
+Kept free of any LLM/client imports (like usage.py) so it can be tested and reused offline.
+
+    text = summary_json(episodes, budget_tokens=3000)   # always valid JSON, within budget
+
+Per episode, steps are ranked and kept greedily until the budget is spent:
+- the winning (last) step and the first failure first, then error-class transitions
+  (the error changed, or a failure turned into a success), then the first step, then the rest
+- runs of identical consecutive actions collapse into one step with "repeat": n
+- identical tracebacks across episodes are stored once in "errors" and referenced by id
+- output/error text (and action args, at twice the length) is clipped head + tail, so the
+  exception line at the end survives
+Steps compete across episodes by priority, newest episode first, so a tight budget still
+shows the winning step of many episodes. Input is oldest first by default (and then read
+whole); pass newest_first=True with e.g. EpisodicMemory.iter_episodes(newest_first=True) and
+episodes are read lazily, stopping once the winning steps of those read already fill the budget.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..utils.text import error_class, normalize_text
+
+DEFAULT_BUDGET_TOKENS = 3000
+MAX_FIELD_CHARS = 300
+
+# step priorities (higher is kept first)
+_WINNING = 5
+_FIRST_FAILURE = 4
+_TRANSITION = 3
+_FIRST = 2
+_OTHER = 1
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token for ASCII, one token per non-ASCII character (CJK)."""
+    ascii_n = sum(1 for c in text if ord(c) < 128)
+    return (ascii_n + 3) // 4 + (len(text) - ascii_n)
+
+
+def _clip(text: Any, n: int) -> str:
+    text = text if isinstance(text, str) else ("" if text is None else str(text))
+    if len(text) <= n:
+        return text
+    head = n * 2 // 3
+    return text[:head] + " ... " + text[-(n - head):]
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _collapse(history: List[Any]) -> List[Tuple[Dict[str, Any], int]]:
+    """[(step, repeat)] with consecutive steps that repeat the same action and result merged."""
+    out: List[Tuple[Dict[str, Any], int]] = []
+    prev_key = None
+    for h in history:
+        if not isinstance(h, dict):
+            continue
+        res = h.get("result") if isinstance(h.get("result"), dict) else {}
+        key = _dumps([h.get("action"), res.get("ok"), res.get("error")])
+        if out and key == prev_key:
+            out[-1] = (out[-1][0], out[-1][1] + 1)
+        else:
+            out.append((h, 1))
+        prev_key = key
+    return out
+
+
+def _ranked(steps: List[Tuple[Dict[str, Any], int]]) -> List[int]:
+    """Priority per collapsed step."""
+    prio = [_OTHER] * len(steps)
+    if not steps:
+        return prio
+    prio[0] = _FIRST
+    seen_failure = False
+    prev_cls: Optional[str] = None
+    for i, (h, _) in enumerate(steps):
+        res = h.get("result") if isinstance(h.get("result"), dict) else {}
+        failed = res.get("ok") is False
+        cls = error_class(res.get("error")) if failed else None
+        if failed and not seen_failure:
+            prio[i] = max(prio[i], _FIRST_FAILURE)
+            seen_failure = True
+        elif i > 0 and cls != prev_cls:
+            prio[i] = max(prio[i], _TRANSITION)
+        prev_cls = cls
+    prio[-1] = _WINNING
+    return prio
+
+
+def _clip_action(action: Any, max_chars: int) -> Any:
+    # code args are the most useful part of an action: give them twice the field budget
+    if not isinstance(action, dict) or not isinstance(action.get("args"), dict):
+        return action if action is not None else {}
+    args = {k: _clip(v, 2 * max_chars) if isinstance(v, str) else v for k, v in action["args"].items()}
+    return dict(action, args=args)
+
+
+def _slim(h: Dict[str, Any], repeat: int, err_id: Optional[str], max_chars: int) -> Dict[str, Any]:
+    res = h.get("result") if isinstance(h.get("result"), dict) else {}
+    step = {
+        "step": h.get("step"),
+        "action": _clip_action(h.get("action"), max_chars),
+        "result": {"name": res.get("name"), "ok": res.get("ok"), "output": _clip(res.get("output"), max_chars)},
+    }
+    if err_id:
+        step["result"]["error"] = err_id
+    if repeat > 1:
+        step["repeat"] = repeat
+    return step
+
+
+def summarize_episodes(
+    episodes: Iterable[Dict[str, Any]],
+    budget_tokens: int = DEFAULT_BUDGET_TOKENS,
+    max_chars: int = MAX_FIELD_CHARS,
+    newest_first: bool = False,
+) -> Dict[str, Any]:
+    """
+    {"episodes": [...], "errors": {"E1": "...traceback..."}} whose JSON fits budget_tokens.
+    `episodes` may be a lazy iterator; it is consumed once (oldest first unless newest_first).
+    Steps reference errors by id; episodes keep "task"/"run"/"ok" when present, plus "n_steps"
+    and "omitted" step counts. An episode is included once one of its steps fits; the rest are
+    counted in "omitted_episodes". With newest_first, reading stops once the winning steps of
+    the episodes read so far fill the budget; "unread_episodes": true then says older ones exist.
+    """
+    # newest first: they get the budget before older ones
+    source = iter(episodes) if newest_first else reversed(list(episodes))
+    heads: List[Dict[str, Any]] = []
+    candidates: List[Tuple[int, int, int, Dict[str, Any], int]] = []  # (-prio, ep, i, step, repeat)
+    # 40: slack for the wrapper object, "omitted" counts and separators
+    base = estimate_tokens(_dumps({"episodes": [], "errors": {}, "omitted_episodes": 0, "unread_episodes": True})) + 40
+    floor = base  # cost of every episode read so far with only its winning step
+    unread = False
+    for e, ep in enumerate(source):
+        if newest_first and floor > budget_tokens:
+            unread = True  # older episodes could only get steps the newer ones' winners did not take
+            break
+        hist = ep.get("history") or []
+        head = {k: ep[k] for k in ("run", "task", "ok") if k in ep}
+        if "ok" not in head and isinstance(ep.get("meta"), dict) and "ok" in ep["meta"]:
+            head["ok"] = ep["meta"]["ok"]
+        head["n_steps"] = len(hist)
+        heads.append(head)
+        steps = _collapse(hist)
+        for i, (p, (h, repeat)) in enumerate(zip(_ranked(steps), steps)):
+            candidates.append((-p, e, i, h, repeat))
+        if steps:
+            floor += estimate_tokens(_dumps(heads[e])) + 8 + estimate_tokens(_dumps(_slim(*steps[-1], None, max_chars))) + 1
+
+    errors: Dict[str, str] = {}
+    err_ids: Dict[str, str] = {}
+    kept: Dict[int, Dict[int, Dict[str, Any]]] = {}
+    used = base
+    # best steps first; within a priority, newer episodes and later steps first
+    candidates.sort(key=lambda c: (c[0], c[1], -c[2]))
+    for _, e, i, h, repeat in candidates:
+        res = h.get("result") if isinstance(h.get("result"), dict) else {}
+        err = res.get("error")
+        err_id, err_text = None, ""
+        if isinstance(err, str) and err.strip():
+            key = normalize_text(err)
+            err_id = err_ids.get(key)
+            if err_id is None:
+                err_id, err_text = f"E{len(err_ids) + 1}", _clip(key, max_chars)
+        step = _slim(h, repeat, err_id, max_chars)
+        cost = estimate_tokens(_dumps(step)) + 1
+        if err_text:
+            cost += estimate_tokens(_dumps({err_id: err_text}))
+        if e not in kept:
+            cost += estimate_tokens(_dumps(heads[e])) + 8
+        if used + cost > budget_tokens:
+            continue  # a smaller, lower-priority step may still fit
+        used += cost
+        if err_text:
+            err_ids[normalize_text(err)] = err_id
+            errors[err_id] = err_text
+        kept.setdefault(e, {})[i] = step
+
+    summary = []
+    for e in sorted(kept, reverse=True):  # back to oldest first
+        steps = [kept[e][i] for i in sorted(kept[e])]
+        head = dict(heads[e], history=steps)
+        omitted = head["n_steps"] - sum(s.get("repeat", 1) for s in steps)
+        if omitted > 0:
+            head["omitted"] = omitted
+        summary.append(head)
+    out: Dict[str, Any] = {"episodes": summary, "errors": errors}
+    if len(kept) < len(heads):
+        out["omitted_episodes"] = len(heads) - len(kept)
+    if unread:
+        out["unread_episodes"] = True
+    return out
+
+
+def summary_json(episodes: Iterable[Dict[str, Any]], budget_tokens: int = DEFAULT_BUDGET_TOKENS, **kwargs: Any) -> str:
+    return _dumps(summarize_episodes(episodes, budget_tokens, **kwargs))
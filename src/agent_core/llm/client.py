@@ -1,5 +1,7 @@
 from openai import OpenAI
 from .settings import OPENAI_API_BASE, OPENAI_API_KEY, CHAT_MODEL, DEFAULT_TEMP
+from . import usage
+from ..runtime import metrics, tracing
 import json
 
 class LLMClient:
@@ -23,7 +25,20 @@ class LLMClient:
         if response_format is not None:
             kwargs["response_format"] = response_format
 
-        r = self.client.chat.completions.create(**kwargs)
+        with tracing.span("llm.chat", cat="llm", model=self.model, messages=len(messages)) as sp:
+            try:
+                with metrics.LLM_LATENCY.time():
+                    r = self.client.chat.completions.create(**kwargs)
+            except Exception:
+                metrics.LLM_CALLS.inc(outcome="error")
+                raise
+            metrics.LLM_CALLS.inc(outcome="ok")
+            u = getattr(r, "usage", None)
+            pt, ct = getattr(u, "prompt_tokens", 0) or 0, getattr(u, "completion_tokens", 0) or 0
+            usage.record(pt, ct)
+            metrics.LLM_TOKENS.inc(pt, kind="prompt")
+            metrics.LLM_TOKENS.inc(ct, kind="completion")
+            sp.set(prompt_tokens=pt, completion_tokens=ct)
         msg = r.choices[0].message
 
         # 1) normal content
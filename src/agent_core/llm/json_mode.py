@@ -4,6 +4,7 @@ import json
 from typing import Any, Dict, Optional
 
 from ..llm.client import LLMClient
+from ..runtime import metrics, tracing
 
 
 _REPAIR_SYS = (
@@ -27,15 +28,22 @@ BAD:
 
 
 def repair_to_toolcall_json(raw: str) -> Dict[str, Any]:
-    client = LLMClient()
-    fixed = client.chat(
-        messages=[
-            {"role": "system", "content": _REPAIR_SYS},
-            {"role": "user", "content": _REPAIR_USER.format(bad=raw or "")},
-        ],
-        temperature=0,
-    )
-    return json.loads(fixed)
+    with tracing.span("json_repair", cat="llm", raw_len=len(raw or "")):
+        client = LLMClient()
+        fixed = client.chat(
+            messages=[
+                {"role": "system", "content": _REPAIR_SYS},
+                {"role": "user", "content": _REPAIR_USER.format(bad=raw or "")},
+            ],
+            temperature=0,
+        )
+        try:
+            obj = json.loads(fixed)
+        except ValueError:
+            metrics.REPAIRS.inc(outcome="invalid_json")
+            raise
+        metrics.REPAIRS.inc(outcome="ok")
+        return obj
 
 
 def try_parse_json(raw: str) -> Optional[Dict[str, Any]]:
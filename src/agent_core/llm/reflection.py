@@ -4,9 +4,11 @@ from tenacity import retry, stop_after_attempt, wait_fixed
 from pydantic import BaseModel, Field
 from typing import List, Any
 
+from .budget_summary import summarize_episodes
 from .client import LLMClient
 
 client = LLMClient()
+REFLECT_BUDGET_TOKENS = 3000  # prompt budget for the episode summary
 
 class ReflectionOut(BaseModel):
     success_patterns: List[str] = Field(default_factory=list)
@@ -16,37 +18,26 @@ class ReflectionOut(BaseModel):
 SYSTEM = (
     "You are an agent learning from experience.\n"
     "Extract concise, actionable, generalizable rules.\n"
+    "Steps refer to tracebacks by id; the texts are in the input's \"errors\" map.\n"
     "Return ONLY valid JSON.\n"
     f"Schema: {ReflectionOut.model_json_schema()}\n"
 )
 
-def _summarize_episodes(episodes: Any, max_steps_per_episode: int = 8):
+def _summarize_episodes(episodes: Any, budget_tokens: int = REFLECT_BUDGET_TOKENS, newest_first: bool = False):
     """
-    Reduce token load: keep only the last N steps of each episode, and only key fields.
+    Reduce token load: the most informative steps per episode within one overall token budget
+    (llm/budget_summary.py). `episodes` may be a lazy iterator (EpisodicMemory.iter_episodes);
+    it is consumed once, and only as far as the budget needs when newest_first.
     """
-    out = []
-    for ep in episodes:
-        hist = ep.get("history", [])
-        hist = hist[-max_steps_per_episode:]
-        slim = []
-        for h in hist:
-            slim.append({
-                "step": h.get("step"),
-                "action": h.get("action", {}),
-                "result": {
-                    "name": h.get("result", {}).get("name"),
-                    "ok": h.get("result", {}).get("ok"),
-                    "output": (h.get("result", {}).get("output") or "")[:300],
-                    "error": (h.get("result", {}).get("error") or "")[:300],
-                }
-            })
-        out.append({"task": ep.get("task", ""), "history": slim})
-    return out
+    return summarize_episodes(episodes, budget_tokens, newest_first=newest_first)
+
+def reflect(episodes, newest_first: bool = False) -> dict:
+    # summarize before retrying: a generator of episodes can only be consumed once
+    return _reflect_slim(_summarize_episodes(episodes, newest_first=newest_first))
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
-def reflect(episodes) -> dict:
-    slim = _summarize_episodes(episodes)
 
+@retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
+def _reflect_slim(slim) -> dict:
     raw = client.chat(
         [{"role": "system", "content": SYSTEM},
          {"role": "user", "content": json.dumps(slim, ensure_ascii=False)}],
@@ -0,0 +1,224 @@
+"""
+Map-reduce reflection for large episode sets.
+
+    out = reflect_map_reduce(memory.iter_episodes(), concurrency=8, state_dir="memory/reflect_mr")
+
+- shard: episodes are grouped by task (by="task") or by the first error class they hit
+  (by="error"); groups larger than shard_size are split, so every map call fits the
+  summary budget of llm/budget_summary.py
+- map: one reflection per shard (reflection._reflect_slim on its budgeted summary), at most
+  `concurrency` in flight on a thread pool
+- reduce: rules from all shards are deduped (learning/rule_store.RuleKey: normalized text,
+  word-shingle Jaccard, leading content words) and, when more than max_rules remain, merged
+  by an LLM pass over chunks of reduce_chunk rules, repeated until they fit
+- resume: with state_dir, each finished shard is saved as <shard_id>.json (id = hash of the
+  shard's episode ids and contents); a rerun skips saved shards and retries failed ones
+
+reflect_fn / reduce_fn default to the LLM calls (imported lazily, so this module loads
+without model settings) and can be replaced for offline runs and tests.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..learning.rule_store import RuleKey, normalize_rule
+from ..utils.text import error_class, task_hash
+from ..runtime import tracing
+from .budget_summary import summarize_episodes
+
+SHARD_SIZE = 40  # episodes per map call
+MAX_RULES = 12  # rules left after reduce
+REDUCE_CHUNK = 60  # rules per reduce call
+MAP_BUDGET_TOKENS = 3000
+
+REDUCE_SYSTEM = (
+    "You merge rules learned by an agent from different groups of episodes.\n"
+    "Combine duplicates and near-duplicates, drop rules specific to one file or value, keep the\n"
+    "most actionable wording. Return ONLY valid JSON: {\"rules\": [\"...\"]} with at most {n} rules."
+)
+
+
+@dataclass
+class Shard:
+    key: str
+    episodes: List[Dict[str, Any]]
+
+    @property
+    def id(self) -> str:
+        h = hashlib.sha1(self.key.encode("utf-8"))
+        for ep in self.episodes:
+            h.update(json.dumps(ep, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+        return h.hexdigest()[:16]
+
+
+@dataclass
+class MapReduceResult:
+    success_patterns: List[str] = field(default_factory=list)
+    failure_patterns: List[str] = field(default_factory=list)
+    rules: List[str] = field(default_factory=list)
+    shards: int = 0
+    resumed: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)  # shard id -> error; rerun to retry
+
+    def as_reflection(self) -> Dict[str, List[str]]:
+        """Same shape as reflection.reflect() (ReflectionOut)."""
+        return {"success_patterns": self.success_patterns, "failure_patterns": self.failure_patterns, "rules": self.rules}
+
+
+# ---- shard ----
+def shard_key(ep: Dict[str, Any], by: str = "task") -> str:
+    if by == "error":
+        for h in ep.get("history") or []:
+            res = h.get("result") if isinstance(h, dict) and isinstance(h.get("result"), dict) else {}
+            if res.get("ok") is False:
+                return "error:" + (error_class(res.get("error")) or "error")
+        return "error:none"
+    if by != "task":
+        raise ValueError(f"by must be 'task' or 'error', got {by!r}")
+    return "task:" + task_hash(ep.get("task") or "")
+
+
+def shard_episodes(episodes: Iterable[Dict[str, Any]], by: str = "task", shard_size: int = SHARD_SIZE) -> List[Shard]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for ep in episodes:
+        groups.setdefault(shard_key(ep, by), []).append(ep)
+    shards = []
+    for key, eps in groups.items():
+        for i in range(0, len(eps), shard_size):
+            shards.append(Shard(f"{key}#{i // shard_size}", eps[i:i + shard_size]))
+    return shards
+
+
+# ---- reduce helpers ----
+def dedupe_rules(rules: Iterable[str]) -> List[str]:
+    """First occurrence wins; later near-duplicates (RuleStore's RuleKey) are dropped."""
+    kept: List[Tuple[str, RuleKey]] = []
+    for r in rules:
+        r = (r or "").strip()
+        if not r:
+            continue
+        key = RuleKey(r)
+        if not any(key.same(k) for _, k in kept):
+            kept.append((r, key))
+    return [r for r, _ in kept]
+
+
+def _ranked_rules(outputs: List[Dict[str, Any]]) -> List[str]:
+    # rules proposed by more shards first; ties keep shard order
+    count: Dict[str, int] = {}
+    first: Dict[str, str] = {}
+    for out in outputs:
+        for r in dedupe_rules(out.get("rules") or []):
+            n = normalize_rule(r)
+            count[n] = count.get(n, 0) + 1
+            first.setdefault(n, r)
+    order = sorted(first, key=lambda n: -count[n])
+    return dedupe_rules(first[n] for n in order)
+
+
+# ---- default LLM calls (lazy imports: need model settings) ----
+def _llm_reflect(episodes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    from .reflection import _reflect_slim
+
+    return _reflect_slim(summarize_episodes(episodes, MAP_BUDGET_TOKENS))
+
+
+def _llm_reduce(rules: List[str], n: int) -> List[str]:
+    from .client import LLMClient
+
+    raw = LLMClient().chat(
+        [{"role": "system", "content": REDUCE_SYSTEM.replace("{n}", str(n))},
+         {"role": "user", "content": json.dumps({"rules": rules}, ensure_ascii=False)}],
+        temperature=0,
+    )
+    out = json.loads(raw or "{}").get("rules", [])
+    return [str(r).strip() for r in out if str(r).strip()]
+
+
+def reduce_rules(
+    rules: List[str],
+    max_rules: int = MAX_RULES,
+    chunk: int = REDUCE_CHUNK,
+    reduce_fn: Optional[Callable[[List[str], int], List[str]]] = None,
+    concurrency: int = 4,
+) -> List[str]:
+    """Dedupe, then merge chunks with reduce_fn (in parallel) until at most max_rules are left."""
+    reduce_fn = reduce_fn or _llm_reduce
+    rules = dedupe_rules(rules)
+    while len(rules) > max_rules:
+        chunks = [rules[i:i + chunk] for i in range(0, len(rules), chunk)]
+        per = max_rules if len(chunks) == 1 else max(max_rules, chunk // 3)
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(chunks)))) as pool:
+            merged = list(pool.map(tracing.propagate(lambda c: reduce_fn(c, per)), chunks))
+        new = dedupe_rules(r for m in merged for r in m)
+        if len(new) >= len(rules):  # the reducer did not shrink anything: cut rather than loop
+            new = new[:max_rules]
+        rules = new
+    return rules
+
+
+# ---- map + reduce ----
+def reflect_map_reduce(
+    episodes: Iterable[Dict[str, Any]],
+    by: str = "task",
+    concurrency: int = 4,
+    shard_size: int = SHARD_SIZE,
+    max_rules: int = MAX_RULES,
+    state_dir: Optional[str] = None,
+    reflect_fn: Optional[Callable[[List[Dict[str, Any]]], Dict[str, Any]]] = None,
+    reduce_fn: Optional[Callable[[List[str], int], List[str]]] = None,
+) -> MapReduceResult:
+    """
+    Reflect on every episode, `concurrency` shards at a time. Failed shards are reported in
+    result.failed (their rules are missing from the result); with state_dir, rerunning the
+    same call only redoes those.
+    """
+    reflect_fn = reflect_fn or _llm_reflect
+    shards = shard_episodes(episodes, by, shard_size)
+    state = Path(state_dir) if state_dir else None
+    if state is not None:
+        state.mkdir(parents=True, exist_ok=True)
+    res = MapReduceResult(shards=len(shards))
+    outputs: Dict[str, Dict[str, Any]] = {}
+    todo = []
+    for sh in shards:
+        saved = state / f"{sh.id}.json" if state is not None else None
+        if saved is not None and saved.exists():
+            outputs[sh.id] = json.loads(saved.read_text(encoding="utf-8"))
+            res.resumed += 1
+        else:
+            todo.append(sh)
+
+    def run(sh: Shard) -> Dict[str, Any]:
+        with tracing.span("reflect_shard", shard=sh.key, episodes=len(sh.episodes)):
+            out = reflect_fn(sh.episodes)
+        if state is not None:
+            tmp = state / f".{sh.id}.{os.getpid()}.tmp"
+            tmp.write_text(json.dumps(out, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, state / f"{sh.id}.json")
+        return out
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        # copy_context: spans from worker threads land in the caller's tracer
+        futs = {pool.submit(contextvars.copy_context().run, run, sh): sh for sh in todo}
+        for fut in as_completed(futs):
+            sh = futs[fut]
+            try:
+                outputs[sh.id] = fut.result()
+            except Exception as e:
+                res.failed[sh.id] = repr(e)
+
+    ordered = [outputs[sh.id] for sh in shards if sh.id in outputs]
+    res.success_patterns = dedupe_rules(p for o in ordered for p in o.get("success_patterns") or [])[: 2 * max_rules]
+    res.failure_patterns = dedupe_rules(p for o in ordered for p in o.get("failure_patterns") or [])[: 2 * max_rules]
+    with tracing.span("reflect_reduce", rules=sum(len(o.get("rules") or []) for o in ordered)):
+        res.rules = reduce_rules(_ranked_rules(ordered), max_rules, reduce_fn=reduce_fn, concurrency=concurrency)
+    return res
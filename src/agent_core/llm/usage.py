@@ -0,0 +1,31 @@
+"""
+Process-wide token counters fed by LLMClient.chat.
+
+Kept free of any LLM/client imports so runtime code (RunManager, catalog) can read totals
+without requiring model settings.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict
+
+_lock = threading.Lock()
+_totals: Dict[str, int] = {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0}
+
+
+def record(prompt_tokens: int, completion_tokens: int) -> None:
+    with _lock:
+        _totals["prompt_tokens"] += int(prompt_tokens or 0)
+        _totals["completion_tokens"] += int(completion_tokens or 0)
+        _totals["calls"] += 1
+
+
+def snapshot() -> Dict[str, int]:
+    with _lock:
+        return dict(_totals)
+
+
+def delta(since: Dict[str, int]) -> Dict[str, int]:
+    now = snapshot()
+    return {k: now[k] - since.get(k, 0) for k in now}
@@ -1,23 +1,252 @@
 import json
+import os
+import re
+import sqlite3
+import threading
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: fall back to the in-process lock only
+    fcntl = None
+
+from .jsonl_store import JsonlEpisodeStore
+from .minhash import LSHIndex, episode_actions
+
+COUNTER_NAME = "episodes.counter"
+LSH_NAME = "lsh.db"
+PENDING_WINDOW = 64  # a missing episode this close to the newest id may still be being written
+BACKENDS = ("json", "jsonl")
+_EPISODE_RE = re.compile(r"^episode_(\d+)\.json$")
+
 
 class EpisodicMemory:
-    def __init__(self, root: str = "memory"):
+    """
+    One JSON file per episode: <root>/episode_0001.json, episode_0002.json, ...
+
+    - IDs come from <root>/episodes.counter, bumped under an exclusive file lock, so concurrent
+      writers (threads or processes) never reuse an ID and saving never lists the directory
+    - episodes are written to a temp file and renamed into place: readers never see partial JSON;
+      fsync=True (default) makes every save durable, False leaves flushing to the OS
+    - iter_episodes() walks IDs from the counter and parses one file at a time
+
+    backend="jsonl" appends new episodes to the offset-indexed store in <root>/jsonl/
+    (memory/jsonl_store.py) instead; IDs and the interface stay the same, and episodes saved
+    earlier as JSON files are still read (compact() folds them into the store).
+
+    similar_episodes() looks tasks up in a MinHash/LSH index (<root>/lsh.db, memory/minhash.py).
+    save_episode() does not touch it: each query first indexes the episodes saved since the
+    last one (by any process), so the save path stays one file write.
+    """
+
+    def __init__(self, root: str = "memory", backend: str = "json", fsync: bool = True):
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {BACKENDS}, got {backend!r}")
         self.root = Path(root)
         self.root.mkdir(exist_ok=True)
+        self._counter = self.root / COUNTER_NAME
+        self._lock = threading.Lock()
+        self.backend = backend
+        self.fsync = fsync
+        self.store = JsonlEpisodeStore(self.root / "jsonl", fsync=fsync) if backend == "jsonl" else None
+        self._lsh = LSHIndex()
+        self._lsh_db: Optional[sqlite3.Connection] = None
+        self._lsh_lock = threading.Lock()  # separate from _lock: the backfill reads the counter
+
+    # ---- ids ----
+    def _locked(self, fn: Callable[[], int]) -> int:
+        with self._lock:
+            with open(self.root / (COUNTER_NAME + ".lock"), "a") as lf:
+                if fcntl is not None:
+                    fcntl.flock(lf, fcntl.LOCK_EX)
+                try:
+                    return fn()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _read_counter(self) -> int:
+        try:
+            return int(self._counter.read_text().strip() or 0)
+        except FileNotFoundError:
+            # first use on an existing directory: one scan to continue after the highest episode
+            ids = [int(m.group(1)) for m in map(_EPISODE_RE.match, os.listdir(self.root)) if m]
+            return max(ids, default=0)
+
+    def _allocate_id(self) -> int:
+        def bump() -> int:
+            idx = self._read_counter() + 1
+            _atomic_write(self._counter, str(idx), self.fsync)
+            return idx
+
+        return self._locked(bump)
+
+    def last_id(self) -> int:
+        return self._locked(self._read_counter)
+
+    def path_for(self, idx: int) -> Path:
+        return self.root / f"episode_{idx:04d}.json"
 
-    def save_episode(self, task: str, history: List[Dict[str, Any]], meta: dict | None = None):
-        idx = len(list(self.root.glob("episode_*.json"))) + 1
-        p = self.root / f"episode_{idx:04d}.json"
-        p.write_text(json.dumps({
-           "task": task, 
-           "history": history, 
-           "meta": meta or {}
-        }, ensure_ascii=False, indent=2))
+    def exists(self, idx: int) -> bool:
+        return (self.store is not None and idx in self.store) or self.path_for(idx).exists()
+
+    def settled_id(self, last: Optional[int] = None) -> int:
+        """
+        Highest id up to which every episode is saved or given up on. IDs are allocated before
+        the episode is written, so one missing within PENDING_WINDOW of the newest id may still
+        appear: watermarks that must not skip episodes advance at most to here.
+        """
+        last = self.last_id() if last is None else last
+        for idx in range(max(1, last - PENDING_WINDOW + 1), last + 1):
+            if not self.exists(idx):
+                return idx - 1
+        return last
+
+    # ---- write ----
+    def save_episode(self, task: str, history: List[Dict[str, Any]], meta: dict | None = None) -> int:
+        idx = self._allocate_id()
+        if self.store is not None:
+            self.store.append(idx, task, history, meta)
+        else:
+            _atomic_write(self.path_for(idx), json.dumps({
+                "id": idx,
+                "task": task,
+                "history": history,
+                "meta": meta or {}
+            }, ensure_ascii=False, indent=2), self.fsync)
+        return idx
+
+    # ---- read ----
+    def load(self, idx: int) -> Optional[Dict[str, Any]]:
+        if self.store is not None and idx in self.store:
+            return self.store.load(idx)
+        try:
+            ep = json.loads(self.path_for(idx).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None  # ID allocated by a writer that has not finished (or failed)
+        ep.setdefault("id", idx)
+        return ep
+
+    def iter_episodes(
+        self,
+        filter: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        newest_first: bool = False,
+        limit: Optional[int] = None,
+        after: int = 0,
+        upto: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield episodes with after < id <= upto (default: the newest id), at most `limit`
+        that pass `filter`; one is held at a time.
+        """
+        last = self.last_id() if upto is None else upto
+        ids = range(last, after, -1) if newest_first else range(after + 1, last + 1)
+        n = 0
+        for idx in ids:
+            if limit is not None and n >= limit:
+                return
+            ep = self.load(idx)
+            if ep is None or (filter is not None and not filter(ep)):
+                continue
+            n += 1
+            yield ep
+
+    def last_steps(self, idx: int, n: int) -> List[Dict[str, Any]]:
+        """Last n steps of one episode; the jsonl backend reads only those steps."""
+        if self.store is not None and idx in self.store:
+            return self.store.last_steps(idx, n)
+        ep = self.load(idx)
+        return ep["history"][-n:] if ep and n > 0 else []
+
+    def compact(self) -> Dict[str, int]:
+        """jsonl backend: merge sealed segments and fold legacy episode_*.json files in."""
+        if self.store is None:
+            return {}
+        return self.store.compact(legacy_dir=self.root)
+
+    def start_compactor(self, interval_s: float = 600.0) -> None:
+        if self.store is not None:
+            self.store.start_compactor(interval_s, legacy_dir=self.root)
+
+    # ---- similar tasks ----
+    def _lsh_conn(self) -> sqlite3.Connection:
+        """Open (and on first use create) lsh.db; caller holds self._lsh_lock."""
+        if self._lsh_db is not None:
+            return self._lsh_db
+        conn = sqlite3.connect(self.root / LSH_NAME, timeout=30.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")  # derived data: rebuilt from the episodes if lost
+        with conn:
+            self._lsh.create(conn)
+            conn.execute("CREATE TABLE IF NOT EXISTS lsh_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._lsh_db = conn
+        return conn
+
+    def _sync_lsh(self, conn: sqlite3.Connection) -> int:
+        """
+        Index episodes saved since the last sync; caller holds self._lsh_lock. The watermark
+        (lsh_state "indexed_upto") stops before an episode that is missing but within
+        PENDING_WINDOW of the newest id: its writer may not have finished yet.
+        """
+        last = self.last_id()
+
+        def watermark() -> int:
+            row = conn.execute("SELECT value FROM lsh_state WHERE key='indexed_upto'").fetchone()
+            return row[0] if row else 0
+
+        if watermark() >= last:
+            return 0
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")  # one process catches up at a time
+        try:
+            start, upto, rows = watermark(), None, []
+            for idx in range(start + 1, last + 1):
+                ep = self.load(idx)
+                if ep is None:
+                    if upto is None and last - idx < PENDING_WINDOW:
+                        upto = idx - 1  # retry from here next time
+                    continue
+                rows.append((idx, ep.get("task", ""), episode_actions(ep.get("history") or []),
+                             (ep.get("meta") or {}).get("ok")))
+            self._lsh.add(conn, rows)
+            conn.execute("INSERT OR REPLACE INTO lsh_state(key, value) VALUES('indexed_upto', ?)",
+                         (last if upto is None else upto,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.isolation_level = ""
+        return len(rows)
+
+    def similar_episodes(
+        self, task: str, k: int = 5, ok: Optional[bool] = None, actions: Sequence[str] = (), min_similarity: float = 0.2
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Up to k episodes whose task reads like `task`, best first, as (similarity, episode).
+        ok filters on meta["ok"] (episodes saved without it only match ok=None).
+        """
+        with self._lsh_lock:
+            conn = self._lsh_conn()
+            self._sync_lsh(conn)
+            hits = self._lsh.query(conn, task, actions, k=k, ok=ok, min_similarity=min_similarity)
+        out = []
+        for idx, score in hits:
+            ep = self.load(idx)
+            if ep is not None:
+                out.append((score, ep))
+        return out
 
     def load_all(self) -> List[Dict[str, Any]]:
-        episodes = []
-        for f in sorted(self.root.glob("episode_*.json")):
-            episodes.append(json.loads(f.read_text()))
-        return episodes
+        return list(self.iter_episodes())
+
+
+def _atomic_write(path: Path, text: str, fsync: bool = True) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
@@ -0,0 +1,58 @@
+"""
+Move EpisodicMemory episodes (memory/episode_*.json or the jsonl backend) into SQLiteMemoryStore.
+
+    python -m src.agent_core.memory.importer --src memory --db memory/learnagent.db
+
+- streaming: episodes are read one at a time (EpisodicMemory.iter_episodes) and inserted
+  --batch per transaction
+- deduplicated: episodes whose task+history+meta hash is already in the store are skipped
+- resumable: the store keeps a watermark per source directory, committed with each batch;
+  rerunning continues after the last committed episode. Only ids up to
+  EpisodicMemory.settled_id() are read, so an episode whose id is allocated but whose file is
+  not written yet is imported by a later run instead of being skipped
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from .episodic import EpisodicMemory
+from .sqlite_store import SQLiteMemoryStore
+
+
+def source_key(src_root: str, backend: str = "json") -> str:
+    return f"episodic:{backend}:{Path(src_root).resolve()}"
+
+
+def import_episodic(
+    src_root: str,
+    store: SQLiteMemoryStore,
+    backend: str = "json",
+    batch: int = 1000,
+    limit: Optional[int] = None,
+) -> Dict[str, float]:
+    src = EpisodicMemory(src_root, backend=backend)
+    source = source_key(src_root, backend)
+    t0 = time.perf_counter()
+    stats = store.import_episodes(
+        source, src.iter_episodes(after=store.import_watermark(source), upto=src.settled_id(), limit=limit),
+        batch=batch,
+    )
+    return {**stats, "seconds": time.perf_counter() - t0}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Import EpisodicMemory episodes into the SQLite memory store.")
+    ap.add_argument("--src", default="memory")
+    ap.add_argument("--backend", default="json", choices=("json", "jsonl"))
+    ap.add_argument("--db", default="memory/learnagent.db")
+    ap.add_argument("--batch", type=int, default=1000)
+    ap.add_argument("--limit", type=int, default=None, help="stop after this many episodes (resume later)")
+    args = ap.parse_args()
+    store = SQLiteMemoryStore(args.db)
+    print(json.dumps(import_episodic(args.src, store, args.backend, args.batch, args.limit), indent=2))
+    store.close()
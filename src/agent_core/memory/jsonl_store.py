@@ -0,0 +1,375 @@
+"""
+Append-only JSONL episode store with byte-offset indexes and mmap reads.
+
+Layout under <root> (EpisodicMemory(backend="jsonl") uses memory/jsonl/):
+- seg_000001.jsonl : one compact line per record; an episode is a header line
+                     {"id", "task", "meta", "n"} followed by one line per step {"id", "i", "data"}
+- episodes.idx     : fixed-size records <id, seg, offset, header_len, step_base, n_steps>
+- steps.idx        : fixed-size records <offset, length>, one per step; an episode's steps are
+                     step_base .. step_base + n_steps - 1 (in the episode's segment)
+
+Reads map segments with mmap and slice exactly the lines they need, so last_steps(id, 3)
+parses three small JSON objects no matter how long the episode is. Data is written before
+the index records that point at it; a crash leaves unindexed bytes, which compaction drops.
+
+compact() merges sealed segments (everything but the one being appended to), drops
+unreferenced bytes and can fold legacy episode_*.json files in; start_compactor() runs it
+on a background thread. It rewrites steps.idx with only the live step records, then swaps
+both index files while holding compact.lock exclusively; reads hold it shared, so readers in
+other processes never pair one generation of episodes.idx with another of steps.idx.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+_EP = struct.Struct("<QIQIQI")  # id, seg, offset, header_len, step_base, n_steps
+_STEP = struct.Struct("<QI")  # offset, length
+_SEG_RE = re.compile(r"^seg_(\d{6})\.jsonl$")
+_LEGACY_RE = re.compile(r"^episode_(\d+)\.json$")
+
+EPISODES_IDX = "episodes.idx"
+STEPS_IDX = "steps.idx"
+COMPACT_LOCK = "compact.lock"
+SEG_MAX_BYTES = 64 << 20
+
+
+def _seg_name(seg: int) -> str:
+    return f"seg_{seg:06d}.jsonl"
+
+
+def _line(obj: Dict[str, Any]) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class JsonlEpisodeStore:
+    def __init__(self, root: str | Path, seg_max_bytes: int = SEG_MAX_BYTES, fsync: bool = True):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.seg_max_bytes = seg_max_bytes
+        self.fsync = fsync
+        self._tlock = threading.RLock()
+        # in-memory view of episodes.idx, refreshed from the file tail (or fully after compaction)
+        self._episodes: Dict[int, Tuple[int, int, int, int, int]] = {}
+        self._idx_read = 0
+        self._idx_ino: Optional[int] = None
+        self._maps: Dict[int, Tuple[Any, mmap.mmap]] = {}
+        self._steps_map: Optional[Tuple[Any, mmap.mmap]] = None
+        self._compact_lf: Optional[Any] = None  # compact.lock, held shared while reading
+        self._compactor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._locked(self._recover)
+
+    # ---- locking (threads + processes) ----
+    def _locked(self, fn):
+        with self._tlock:
+            with open(self.root / "store.lock", "a") as lf:
+                if fcntl is not None:
+                    fcntl.flock(lf, fcntl.LOCK_EX)
+                try:
+                    return fn()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _index_lock(self, shared: bool) -> Callable[[], None]:
+        """flock compact.lock (shared for reads, exclusive for the index swap); returns the release."""
+        if fcntl is None:
+            return lambda: None
+        if self._compact_lf is None:
+            self._compact_lf = open(self.root / COMPACT_LOCK, "a")
+        lf = self._compact_lf
+        fcntl.flock(lf, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        return lambda: fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _segments(self) -> List[int]:
+        return sorted(int(m.group(1)) for m in map(_SEG_RE.match, os.listdir(self.root)) if m)
+
+    # ---- write ----
+    def append(self, idx: int, task: str, history: List[Dict[str, Any]], meta: Optional[dict] = None) -> None:
+        header = _line({"id": idx, "task": task, "meta": meta or {}, "n": len(history)})
+        steps = [_line({"id": idx, "i": i, "data": h}) for i, h in enumerate(history)]
+        self._locked(lambda: self._append_locked(idx, header, steps))
+
+    def _append_locked(self, idx: int, header: bytes, steps: List[bytes]) -> None:
+        segs = self._segments()
+        seg = segs[-1] if segs else 1
+        seg_path = self.root / _seg_name(seg)
+        if seg_path.exists() and seg_path.stat().st_size >= self.seg_max_bytes:
+            seg += 1
+            seg_path = self.root / _seg_name(seg)
+
+        with open(seg_path, "ab") as f:
+            off = f.seek(0, os.SEEK_END)
+            f.write(header + b"".join(steps))
+            self._sync(f)
+        recs, pos = [], off + len(header)
+        for s in steps:
+            recs.append(_STEP.pack(pos, len(s)))
+            pos += len(s)
+        with open(self.root / STEPS_IDX, "ab") as f:
+            base = f.seek(0, os.SEEK_END) // _STEP.size
+            f.write(b"".join(recs))
+            self._sync(f)
+        with open(self.root / EPISODES_IDX, "ab") as f:
+            f.write(_EP.pack(idx, seg, off, len(header), base, len(steps)))
+            self._sync(f)
+
+    def _sync(self, f) -> None:
+        if self.fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ---- index ----
+    def _refresh(self) -> None:
+        p = self.root / EPISODES_IDX
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._idx_ino or st.st_size < self._idx_read:
+            # compaction swapped the index: start over and drop maps of replaced segments
+            self._episodes, self._idx_read, self._idx_ino = {}, 0, st.st_ino
+            self._close_maps()
+        if st.st_size - self._idx_read >= _EP.size:
+            with open(p, "rb") as f:
+                f.seek(self._idx_read)
+                n = (st.st_size - self._idx_read) // _EP.size  # ignore a torn trailing record
+                buf = f.read(n * _EP.size)
+            for rec in _EP.iter_unpack(buf):
+                self._episodes[rec[0]] = rec[1:]
+            self._idx_read += n * _EP.size
+
+    def _map(self, path: Path, need: int, cached: Optional[Tuple[Any, mmap.mmap]]) -> Tuple[Any, mmap.mmap]:
+        if cached is not None and len(cached[1]) >= need:
+            return cached
+        if cached is not None:
+            cached[1].close()
+            cached[0].close()
+        f = open(path, "rb")
+        return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _seg_bytes(self, seg: int, off: int, length: int) -> bytes:
+        self._maps[seg] = self._map(self.root / _seg_name(seg), off + length, self._maps.get(seg))
+        return self._maps[seg][1][off:off + length]
+
+    def _read(self, fn):
+        # another process compacted the segment away after we loaded the index: reload once
+        with self._tlock:
+            release = self._index_lock(shared=True)
+            try:
+                self._refresh()
+                try:
+                    return fn()
+                except FileNotFoundError:
+                    self._idx_ino = None
+                    self._refresh()
+                    return fn()
+            finally:
+                release()
+
+    def _step_recs(self, base: int, start: int, stop: int) -> List[Tuple[int, int]]:
+        if stop <= start:
+            return []
+        self._steps_map = self._map(self.root / STEPS_IDX, (base + stop) * _STEP.size, self._steps_map)
+        mm = self._steps_map[1]
+        return [_STEP.unpack_from(mm, (base + i) * _STEP.size) for i in range(start, stop)]
+
+    def _close_maps(self) -> None:
+        for f, mm in list(self._maps.values()) + ([self._steps_map] if self._steps_map else []):
+            mm.close()
+            f.close()
+        self._maps, self._steps_map = {}, None
+
+    def close(self) -> None:
+        self.stop_compactor()
+        with self._tlock:
+            self._close_maps()
+            if self._compact_lf is not None:
+                self._compact_lf.close()
+                self._compact_lf = None
+
+    # ---- read ----
+    def ids(self) -> List[int]:
+        with self._tlock:
+            self._refresh()
+            return sorted(self._episodes)
+
+    def __contains__(self, idx: int) -> bool:
+        with self._tlock:
+            self._refresh()
+            return idx in self._episodes
+
+    def header(self, idx: int) -> Optional[Dict[str, Any]]:
+        def read():
+            rec = self._episodes.get(idx)
+            if rec is None:
+                return None
+            seg, off, hlen, _base, _n = rec
+            return json.loads(self._seg_bytes(seg, off, hlen))
+
+        return self._read(read)
+
+    def steps(self, idx: int, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Steps [start, stop) of an episode; negative indexes count from the end."""
+        def read():
+            rec = self._episodes.get(idx)
+            if rec is None:
+                return []
+            seg, _off, _hlen, base, n = rec
+            lo, hi, _ = slice(start, stop).indices(n)
+            return [
+                json.loads(self._seg_bytes(seg, off, length))["data"]
+                for off, length in self._step_recs(base, lo, max(lo, hi))
+            ]
+
+        return self._read(read)
+
+    def last_steps(self, idx: int, n: int) -> List[Dict[str, Any]]:
+        return self.steps(idx, -n) if n > 0 else []
+
+    def load(self, idx: int) -> Optional[Dict[str, Any]]:
+        h = self.header(idx)
+        if h is None:
+            return None
+        return {"id": idx, "task": h["task"], "history": self.steps(idx), "meta": h["meta"]}
+
+    def iter_episodes(self, newest_first: bool = False) -> Iterator[Dict[str, Any]]:
+        for idx in (reversed(self.ids()) if newest_first else self.ids()):
+            ep = self.load(idx)
+            if ep is not None:
+                yield ep
+
+    # ---- compaction ----
+    def compact(self, legacy_dir: Optional[str | Path] = None, min_segments: int = 2) -> Dict[str, int]:
+        """
+        Merge sealed segments into one, dropping unreferenced bytes; optionally fold legacy
+        episode_*.json files from legacy_dir in (and delete them). Returns counters.
+        """
+        return self._locked(lambda: self._compact_locked(Path(legacy_dir) if legacy_dir else None, min_segments))
+
+    def _recover(self) -> None:
+        """Finish an index swap a crashed compaction started; drop one it never started. Caller holds the store lock."""
+        ts, te = self.root / (STEPS_IDX + ".tmp"), self.root / (EPISODES_IDX + ".tmp")
+        if not te.exists():
+            return
+        release = self._index_lock(shared=False)
+        try:
+            if ts.exists():
+                ts.unlink()
+                te.unlink()
+            else:
+                os.replace(te, self.root / EPISODES_IDX)
+        finally:
+            release()
+
+    def _compact_locked(self, legacy_dir: Optional[Path], min_segments: int) -> Dict[str, int]:
+        self._recover()
+        self._refresh()
+        segs = self._segments()
+        sealed = set(segs[:-1])
+        legacy = []
+        if legacy_dir is not None and legacy_dir.is_dir():
+            for name in os.listdir(legacy_dir):
+                m = _LEGACY_RE.match(name)
+                if m and int(m.group(1)) not in self._episodes:
+                    legacy.append((int(m.group(1)), legacy_dir / name))
+        if len(sealed) < min_segments and not legacy:
+            return {"segments_merged": 0, "legacy_imported": 0, "bytes_reclaimed": 0}
+
+        before = sum((self.root / _seg_name(s)).stat().st_size for s in sealed)
+        new_seg = (segs[-1] if segs else 0) + 1
+        tmp = self.root / (_seg_name(new_seg) + ".tmp")
+        # steps.idx is rebuilt from the live records only (renumbered), so it shrinks with the data
+        next_base = 0
+        ep_recs: Dict[int, bytes] = {}
+        new_steps: List[bytes] = []
+
+        with open(tmp, "wb") as out:
+            for idx in sorted(self._episodes):
+                seg, off, hlen, base, n = self._episodes[idx]
+                if seg not in sealed:
+                    new_steps += [_STEP.pack(*r) for r in self._step_recs(base, 0, n)]
+                    ep_recs[idx] = _EP.pack(idx, seg, off, hlen, next_base, n)
+                    next_base += n
+                    continue
+                new_off = out.tell()
+                out.write(self._seg_bytes(seg, off, hlen))
+                for s_off, s_len in self._step_recs(base, 0, n):
+                    new_steps.append(_STEP.pack(out.tell(), s_len))
+                    out.write(self._seg_bytes(seg, s_off, s_len))
+                ep_recs[idx] = _EP.pack(idx, new_seg, new_off, hlen, next_base, n)
+                next_base += n
+            for idx, path in sorted(legacy):
+                ep = json.loads(path.read_text(encoding="utf-8"))
+                history = ep.get("history", [])
+                header = _line({"id": idx, "task": ep.get("task", ""), "meta": ep.get("meta") or {}, "n": len(history)})
+                ep_recs[idx] = _EP.pack(idx, new_seg, out.tell(), len(header), next_base, len(history))
+                next_base += len(history)
+                out.write(header)
+                for i, h in enumerate(history):
+                    line = _line({"id": idx, "i": i, "data": h})
+                    new_steps.append(_STEP.pack(out.tell(), len(line)))
+                    out.write(line)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, self.root / _seg_name(new_seg))
+
+        ts, te = self.root / (STEPS_IDX + ".tmp"), self.root / (EPISODES_IDX + ".tmp")
+        for path, data in ((ts, new_steps), (te, [ep_recs[i] for i in sorted(ep_recs)])):
+            with open(path, "wb") as f:
+                f.write(b"".join(data))
+                f.flush()
+                os.fsync(f.fileno())
+        # both tmp files are complete before either rename; no reader (shared lock) runs between
+        # the renames, and a crash between them is finished by _recover() (episodes.idx.tmp left
+        # behind without steps.idx.tmp)
+        self._close_maps()
+        release = self._index_lock(shared=False)
+        try:
+            os.replace(ts, self.root / STEPS_IDX)
+            os.replace(te, self.root / EPISODES_IDX)
+        finally:
+            release()
+        for s in sealed:
+            (self.root / _seg_name(s)).unlink()
+        for _, path in legacy:
+            path.unlink()
+        after = (self.root / _seg_name(new_seg)).stat().st_size
+        return {"segments_merged": len(sealed), "legacy_imported": len(legacy), "bytes_reclaimed": before - after}
+
+    def start_compactor(self, interval_s: float = 600.0, legacy_dir: Optional[str | Path] = None) -> None:
+        if self._compactor is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval_s):
+                try:
+                    self.compact(legacy_dir=legacy_dir)
+                except Exception:  # keep the agent running; the next tick retries
+                    log.exception("episode compaction failed in %s", self.root)
+
+        self._compactor = threading.Thread(target=loop, name="episode-compactor", daemon=True)
+        self._compactor.start()
+
+    def stop_compactor(self) -> None:
+        if self._compactor is not None:
+            self._stop.set()
+            self._compactor.join()
+            self._compactor = None
@@ -0,0 +1,172 @@
+"""
+MinHash signatures + LSH banding over episode task text and action sequences.
+
+Finds reworded near-duplicates of a task without embeddings or network:
+
+- features: word unigrams/bigrams of the task; tool names and tool bigrams of the action
+  sequence ("file_write>python_exec") form a second, separate set
+- signature: NUM_PERM min-hashes; each feature's NUM_PERM hash values are one SHAKE-128
+  digest (cached per feature), and the per-slot minimum is taken in C via zip/min
+- index: the task signature is cut into BANDS bands of ROWS rows; an episode is a candidate
+  when any band collides, so a query costs BANDS index lookups instead of a scan. Candidates
+  are re-ranked by estimated Jaccard (share of equal signature slots), blended with action
+  similarity when the query has actions too (ACTION_WEIGHT).
+
+Tables live in whatever SQLite database the caller hands in (SQLiteMemoryStore keeps them
+in learnagent.db, EpisodicMemory in <root>/lsh.db). Both stores index lazily: saving an
+episode does not touch them, the next query indexes whatever was saved since.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import struct
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS  # 4 rows/band: pairs above ~0.45 Jaccard are very likely to collide
+ACTION_WEIGHT = 0.3
+_MASK = (1 << 32) - 1
+_SIG = struct.Struct(f"<{NUM_PERM}I")
+
+_WORD = re.compile(r"[a-z0-9_.]+")
+_STOP = frozenset("a an the and or of to in on for with then it is be if as by at from".split())
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lsh_sigs (
+  episode_id INTEGER PRIMARY KEY,
+  ok INTEGER,
+  sig BLOB NOT NULL,
+  act_sig BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lsh_bands (
+  band INTEGER NOT NULL,
+  bucket INTEGER NOT NULL,
+  episode_id INTEGER NOT NULL,
+  PRIMARY KEY (band, bucket, episode_id)
+) WITHOUT ROWID;
+"""
+
+
+def task_features(task: str) -> Set[str]:
+    words = [w for w in _WORD.findall(task.lower()) if w not in _STOP]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def action_features(actions: Sequence[str]) -> Set[str]:
+    acts = [a for a in actions if a]
+    return set(acts) | {f"{a}>{b}" for a, b in zip(acts, acts[1:])}
+
+
+@lru_cache(maxsize=65536)
+def _slots(feature: str) -> Tuple[int, ...]:
+    return _SIG.unpack(hashlib.shake_128(feature.encode("utf-8")).digest(_SIG.size))
+
+
+def signature(feats: Iterable[str]) -> Tuple[int, ...]:
+    vectors = [_slots(f) for f in feats]
+    if not vectors:
+        return (_MASK,) * NUM_PERM
+    return tuple(map(min, zip(*vectors)))
+
+
+def similarity(s1: Sequence[int], s2: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of the two feature sets."""
+    return sum(x == y for x, y in zip(s1, s2)) / NUM_PERM
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """Exact Jaccard similarity (for small sets where signatures are not worth it)."""
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def bands(sig: Sequence[int]) -> List[Tuple[int, int]]:
+    # one 63-bit bucket id per band (fits an SQLite INTEGER); blake2b keeps it stable across versions
+    out = []
+    for b in range(BANDS):
+        digest = hashlib.blake2b(struct.pack(f"<{ROWS}I", *sig[b * ROWS:(b + 1) * ROWS]), digest_size=8).digest()
+        out.append((b, int.from_bytes(digest, "little") >> 1))
+    return out
+
+
+def episode_actions(history: Iterable[object]) -> List[str]:
+    """Tool names of an episode's steps, in order (same shapes _step_row accepts)."""
+    out = []
+    for h in history:
+        if not isinstance(h, dict):
+            continue
+        action = h.get("action") if isinstance(h.get("action"), dict) else {}
+        result = h.get("result") if isinstance(h.get("result"), dict) else {}
+        name = action.get("name") or result.get("name")
+        if isinstance(name, str):
+            out.append(name)
+    return out
+
+
+class LSHIndex:
+    """
+    Banded MinHash index stored in an SQLite database. Methods take the connection so the
+    caller controls transactions (add() joins the caller's transaction).
+    """
+
+    def create(self, conn: sqlite3.Connection) -> None:
+        for stmt in _SCHEMA.split(";"):
+            if stmt.strip():
+                conn.execute(stmt)
+
+    def max_id(self, conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT coalesce(max(episode_id), 0) FROM lsh_sigs").fetchone()[0]
+
+    def add(self, conn: sqlite3.Connection, rows: Iterable[Tuple[int, str, Sequence[str], Optional[bool]]]) -> None:
+        """rows: (episode_id, task, actions, ok)."""
+        sigs, band_rows = [], []
+        for eid, task, actions, ok in rows:
+            sig = signature(task_features(task))
+            act = signature(action_features(actions))
+            sigs.append((eid, None if ok is None else int(bool(ok)), _SIG.pack(*sig), _SIG.pack(*act)))
+            band_rows += [(b, bucket, eid) for b, bucket in bands(sig)]
+        conn.executemany("INSERT OR REPLACE INTO lsh_sigs(episode_id, ok, sig, act_sig) VALUES(?,?,?,?)", sigs)
+        conn.executemany("INSERT OR IGNORE INTO lsh_bands(band, bucket, episode_id) VALUES(?,?,?)", band_rows)
+
+    def query(
+        self,
+        conn: sqlite3.Connection,
+        task: str,
+        actions: Sequence[str] = (),
+        k: int = 5,
+        ok: Optional[bool] = None,
+        min_similarity: float = 0.2,
+        max_candidates: int = 1000,
+    ) -> List[Tuple[int, float]]:
+        """
+        (episode_id, similarity) best first. min_similarity applies to the task part; ok=True
+        keeps successful episodes only; max_candidates caps colliding episodes that pass the ok
+        filter (newest kept).
+        """
+        sig = signature(task_features(task))
+        act = signature(action_features(actions)) if actions else None
+        where = " OR ".join(["(band=? AND bucket=?)"] * BANDS)
+        params: list = [x for pair in bands(sig) for x in pair]
+        # the ok filter goes inside the candidate query, before LIMIT: otherwise the newest
+        # colliding episodes could fill max_candidates and then all be filtered out
+        ok_join = "JOIN lsh_sigs o ON o.episode_id = b.episode_id AND o.ok = ?" if ok is not None else ""
+        sql = (
+            f"SELECT s.episode_id, s.sig, s.act_sig FROM lsh_sigs s WHERE s.episode_id IN "
+            f"(SELECT DISTINCT b.episode_id FROM lsh_bands b {ok_join} WHERE {where} "
+            f"ORDER BY b.episode_id DESC LIMIT ?)"
+        )
+        params = ([int(ok)] if ok is not None else []) + params + [max_candidates]
+        scored = []
+        for eid, blob, act_blob in conn.execute(sql, params):
+            score = similarity(sig, _SIG.unpack(blob))
+            if score < min_similarity:
+                continue
+            if act is not None:
+                score = (1 - ACTION_WEIGHT) * score + ACTION_WEIGHT * similarity(act, _SIG.unpack(act_blob))
+            scored.append((eid, score))
+        scored.sort(key=lambda x: (-x[1], -x[0]))  # ties: newest first
+        return scored[:k]
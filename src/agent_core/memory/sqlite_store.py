@@ -1,9 +1,114 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import os
+import re
 import sqlite3
+import threading
+import time
+import zlib
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from ..utils.text import error_class, normalize_text, task_hash
+from .minhash import LSHIndex
+
+SYNCHRONOUS = ("OFF", "NORMAL", "FULL")
+SCHEMA_VERSION = 2
+COMPRESS_MIN_BYTES = 256  # blobs at least this long are zlib-compressed
+
+# v2: one row per episode (task text + short hash, summary columns, compressed remainder of the
+# payload) and one row per step with the columns analytical queries filter on; step outputs,
+# errors and the rest of the step dict live in blob columns that are decoded only on demand.
+_SCHEMA_V2 = """
+CREATE TABLE IF NOT EXISTS episodes (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  run_id TEXT,
+  task TEXT,
+  task_hash TEXT,
+  ok INTEGER,
+  n_steps INTEGER,
+  created_at REAL,
+  extra BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_episodes_task_hash ON episodes(task_hash, id);
+CREATE INDEX IF NOT EXISTS idx_episodes_ok ON episodes(ok, id);
+CREATE TABLE IF NOT EXISTS steps (
+  episode_id INTEGER NOT NULL,
+  idx INTEGER NOT NULL,
+  step INTEGER,
+  tool TEXT,
+  ok INTEGER,
+  error_class TEXT,
+  duration_s REAL,
+  output_len INTEGER,
+  body BLOB,
+  output BLOB,
+  error BLOB,
+  PRIMARY KEY (episode_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_steps_tool ON steps(tool, episode_id, ok);
+CREATE INDEX IF NOT EXISTS idx_steps_error_class ON steps(error_class, episode_id);
+"""
+
+# Full-text index over what a stuck loop wants to look up: tool errors, outputs, critic
+# instructions. One row per (step, kind); text is normalized so the same failure in another
+# checkout or process matches. Kept outside user_version: created/backfilled whenever missing
+# and the SQLite build has FTS5.
+_FTS = """
+CREATE VIRTUAL TABLE steps_fts USING fts5(
+  text, kind UNINDEXED, episode_id UNINDEXED, idx UNINDEXED,
+  tokenize = "unicode61 tokenchars '_'"
+)
+"""
+FTS_KINDS = ("error", "output", "critic")
+
+_WORD = re.compile(r"\w+")
+
+# Bulk imports (memory/importer.py): content hashes for dedupe and a per-source watermark,
+# both written in the same transaction as the episodes they describe.
+_IMPORT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS import_hashes (
+  content_hash TEXT PRIMARY KEY,
+  episode_id INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS import_state (
+  source TEXT PRIMARY KEY,
+  last_id INTEGER NOT NULL,
+  updated_at REAL
+);
+"""
+
+def fts_query(text: str, max_terms: int = 32) -> str:
+    """Free text (e.g. a traceback) -> FTS5 query OR-ing its distinct words; BM25 does the ranking."""
+    seen: List[str] = []
+    for w in _WORD.findall(normalize_text(text)):
+        if len(w) > 1 and w.lower() not in seen:
+            seen.append(w.lower())
+        if len(seen) >= max_terms:
+            break
+    return " OR ".join(f'"{w}"' for w in seen)
+
+
+def content_hash(task: str, history: Any, meta: Any) -> str:
+    blob = json.dumps({"task": task, "history": history, "meta": meta}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def _z(text: Optional[str]) -> Optional[bytes]:
+    # 1-byte tag so short values skip compression: b"z" + zlib data, b"r" + raw utf-8
+    if text is None:
+        return None
+    raw = text.encode("utf-8")
+    return b"z" + zlib.compress(raw, 6) if len(raw) >= COMPRESS_MIN_BYTES else b"r" + raw
+
+
+def _unz(blob: Optional[bytes]) -> Optional[str]:
+    if blob is None:
+        return None
+    data = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+    return data.decode("utf-8")
 
 
 @dataclass
@@ -15,55 +120,486 @@ class EpisodeRow:
 
 
 class SQLiteMemoryStore:
-    def __init__(self, path: str = "memory/learnagent.db"):
+    """
+    Episode store on SQLite, safe to share between worker threads.
+
+    - one persistent connection per thread (threading.local); statements are cached per connection
+    - WAL journal: readers never block the writer and vice versa
+    - synchronous=NORMAL by default: durable at checkpoints, no fsync per commit (WAL stays consistent)
+    - busy_timeout: concurrent writers wait for the lock instead of failing with "database is locked"
+    - add_episodes() inserts many rows in one transaction: one executemany per table for the batch
+
+    Schema (PRAGMA user_version=2): normalized episodes + steps tables, see _SCHEMA_V2. Databases
+    from the payload-blob schema are migrated in place on open. Payloads are rebuilt from the
+    tables when EpisodeRows are read, so callers see the same dicts they stored.
+
+    search() ranks past steps by BM25 over the steps_fts index (see _FTS), maintained on insert.
+    similar_episodes() finds reworded tasks through the MinHash/LSH tables of memory/minhash.py;
+    inserts leave those alone and the first query after them indexes the new episodes.
+    """
+
+    def __init__(
+        self,
+        path: str = "memory/learnagent.db",
+        synchronous: str = "NORMAL",
+        busy_timeout_ms: int = 30000,
+        cached_statements: int = 256,
+    ):
+        if synchronous not in SYNCHRONOUS:
+            raise ValueError(f"synchronous must be one of {SYNCHRONOUS}, got {synchronous!r}")
         self.path = path
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._all: List[sqlite3.Connection] = []
+        self._all_lock = threading.Lock()
+        self.fts = False  # set by _init once steps_fts exists (migration inserts are backfilled)
+        self.lsh: Optional[LSHIndex] = None  # lsh_* tables, filled lazily by _sync_lsh()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
         self._init()
 
+    # ---- connections ----
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout_ms / 1000.0,
+                cached_statements=self.cached_statements,
+                check_same_thread=False,  # only the owning thread uses it; close() may run elsewhere
+            )
+            conn.execute(f"PRAGMA synchronous={self.synchronous};")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)};")
+            self._local.conn = conn
+            with self._all_lock:
+                self._all.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close every thread's connection (call once workers are done)."""
+        with self._all_lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
     def _init(self):
-        conn = sqlite3.connect(self.path)
-        cur = conn.cursor()
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS episodes (
-          id INTEGER PRIMARY KEY AUTOINCREMENT,
-          run_id TEXT,
-          task TEXT,
-          ok INTEGER,
-          payload TEXT
-        );
-        """)
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_episodes_task ON episodes(task);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_episodes_ok ON episodes(ok);")
-        conn.commit()
-        conn.close()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL;")  # persistent: stored in the database file
+        (version,) = conn.execute("PRAGMA user_version").fetchone()
+        if version < SCHEMA_VERSION:
+            self._migrate(conn)
+        self.fts = self._ensure_fts(conn)
+        self.lsh = self._ensure_lsh(conn)
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(episodes)")}
+        conn.execute("BEGIN IMMEDIATE")  # one writer migrates; others wait on busy_timeout
+        try:
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version < SCHEMA_VERSION:
+                if "payload" in cols:
+                    self._migrate_v1(conn)
+                else:
+                    _create_v2(conn)
+                conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
 
+    def _migrate_v1(self, conn: sqlite3.Connection, batch: int = 500) -> None:
+        """payload-blob table -> normalized tables, keeping episode ids; runs inside the caller's transaction."""
+        conn.execute("ALTER TABLE episodes RENAME TO episodes_v1")
+        conn.execute("DROP INDEX IF EXISTS idx_episodes_task")
+        conn.execute("DROP INDEX IF EXISTS idx_episodes_ok")
+        _create_v2(conn)
+        last = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, run_id, task, ok, payload FROM episodes_v1 WHERE id > ? ORDER BY id LIMIT ?", (last, batch)
+            ).fetchall()
+            if not rows:
+                break
+            self._insert_many(conn, [
+                (run_id, task or "", bool(ok), json.loads(payload or "{}"), eid) for eid, run_id, task, ok, payload in rows
+            ])
+            last = rows[-1][0]
+        conn.execute("DROP TABLE episodes_v1")
+
+    def _ensure_fts(self, conn: sqlite3.Connection, batch: int = 1000) -> bool:
+        """Create steps_fts and index existing steps if it is missing. False if SQLite lacks FTS5."""
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name='steps_fts'").fetchone():
+            return True
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE name='steps_fts'").fetchone():
+                try:
+                    conn.execute(_FTS)
+                except sqlite3.OperationalError as e:
+                    if "fts5" not in str(e):
+                        raise
+                    conn.execute("ROLLBACK")
+                    return False
+                last = (0, -1)
+                while True:
+                    rows = conn.execute(
+                        "SELECT episode_id, idx, body, output, error FROM steps WHERE (episode_id, idx) > (?, ?) "
+                        "ORDER BY episode_id, idx LIMIT ?", last + (batch,)
+                    ).fetchall()
+                    if not rows:
+                        break
+                    fts = []
+                    for eid, i, body, output, error in rows:
+                        h = json.loads(_unz(body))
+                        fts += _fts_rows(eid, i, h.get("critic_instruction") if isinstance(h, dict) else None,
+                                         _unz(output), _unz(error))
+                    conn.executemany("INSERT INTO steps_fts(text, kind, episode_id, idx) VALUES(?,?,?,?)", fts)
+                    last = (rows[-1][0], rows[-1][1])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def _ensure_lsh(self, conn: sqlite3.Connection) -> LSHIndex:
+        """Create the lsh_* tables if they are missing; _sync_lsh() fills them."""
+        lsh = LSHIndex()
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name='lsh_sigs'").fetchone():
+            with conn:
+                lsh.create(conn)
+        return lsh
+
+    def _sync_lsh(self, conn: sqlite3.Connection, batch: int = 1000) -> int:
+        """
+        Index episodes newer than the LSH tables (inserts do not touch them). Ids only grow
+        (AUTOINCREMENT, one writer at a time), so the highest indexed id is the watermark.
+        Returns how many episodes were indexed.
+        """
+        (newest,) = conn.execute("SELECT coalesce(max(id), 0) FROM episodes").fetchone()
+        if newest <= self.lsh.max_id(conn):
+            return 0
+        n = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            last = self.lsh.max_id(conn)  # another connection may have caught up meanwhile
+            while True:
+                rows = conn.execute(
+                    "SELECT id, task, ok FROM episodes WHERE id > ? ORDER BY id LIMIT ?", (last, batch)
+                ).fetchall()
+                if not rows:
+                    break
+                lo, hi = rows[0][0], rows[-1][0]
+                tools: Dict[int, List[str]] = {}
+                for eid, tool in conn.execute(
+                    "SELECT episode_id, tool FROM steps WHERE episode_id BETWEEN ? AND ? AND tool IS NOT NULL "
+                    "ORDER BY episode_id, idx", (lo, hi)
+                ):
+                    tools.setdefault(eid, []).append(tool)
+                self.lsh.add(conn, [(eid, task or "", tools.get(eid, []), bool(ok)) for eid, task, ok in rows])
+                n += len(rows)
+                last = hi
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return n
+
+    # ---- writes ----
     def add_episode(self, run_id: str, task: str, ok: bool, payload: Dict[str, Any]) -> None:
-        conn = sqlite3.connect(self.path)
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO episodes(run_id, task, ok, payload) VALUES(?,?,?,?)",
-            (run_id, task, 1 if ok else 0, json.dumps(payload, ensure_ascii=False)),
+        self.add_episodes([(run_id, task, ok, payload)])
+
+    def add_episodes(self, rows: Iterable[Union[EpisodeRow, Tuple[str, str, bool, Dict[str, Any]]]]) -> int:
+        """Insert rows (EpisodeRow or (run_id, task, ok, payload) tuples) in one transaction."""
+        params = []
+        for r in rows:
+            if isinstance(r, EpisodeRow):
+                r = (r.run_id, r.task, r.ok, r.payload)
+            run_id, task, ok, payload = r
+            params.append((run_id, task, ok, payload, None))
+        conn = self._conn()
+        with conn:
+            self._insert_many(conn, params)
+        return len(params)
+
+    # ---- bulk import ----
+    def _import_tables(self, conn: sqlite3.Connection) -> None:
+        for stmt in _IMPORT_SCHEMA.split(";"):
+            if stmt.strip():
+                conn.execute(stmt)
+
+    def import_watermark(self, source: str) -> int:
+        """Highest source id already imported from `source` (0 if none)."""
+        conn = self._conn()
+        with conn:
+            self._import_tables(conn)
+        row = conn.execute("SELECT last_id FROM import_state WHERE source=?", (source,)).fetchone()
+        return row[0] if row else 0
+
+    def import_episodes(self, source: str, episodes: Iterable[Dict[str, Any]], batch: int = 1000) -> Dict[str, int]:
+        """
+        Insert EpisodicMemory-shaped dicts ({"id", "task", "history", "meta"}), `batch` per
+        transaction. Episodes whose content hash is already stored are skipped; each commit also
+        moves the source's watermark to the last id in the batch, so an interrupted import resumes
+        from import_watermark(source) without duplicates.
+        """
+        conn = self._conn()
+        with conn:
+            self._import_tables(conn)
+        stats = {"scanned": 0, "imported": 0, "duplicates": 0, "last_id": self.import_watermark(source)}
+        chunk: List[Dict[str, Any]] = []
+
+        def flush() -> None:
+            with conn:
+                hashes: List[str] = []  # in insert order, for import_hashes
+                seen: Set[str] = set()  # the same episode twice in one chunk
+                new: List[tuple] = []
+                for ep in chunk:
+                    task, history, meta = ep.get("task") or "", ep.get("history") or [], ep.get("meta") or {}
+                    h = content_hash(task, history, meta)
+                    if h in seen or conn.execute("SELECT 1 FROM import_hashes WHERE content_hash=?", (h,)).fetchone():
+                        stats["duplicates"] += 1
+                        continue
+                    run_id = meta.get("run_id") or f"{source}#{ep.get('id')}"
+                    ok = bool(meta.get("ok", False))
+                    hashes.append(h)
+                    seen.add(h)
+                    new.append((run_id, task, ok,
+                                {"task": task, "ok": ok, "history": history, "meta": meta, "source_id": ep.get("id")}, None))
+                ids = self._insert_many(conn, new)
+                conn.executemany("INSERT INTO import_hashes(content_hash, episode_id) VALUES(?,?)", list(zip(hashes, ids)))
+                stats["imported"] += len(ids)
+                stats["last_id"] = max(stats["last_id"], max(int(ep.get("id") or 0) for ep in chunk))
+                conn.execute(
+                    "INSERT INTO import_state(source, last_id, updated_at) VALUES(?,?,?) "
+                    "ON CONFLICT(source) DO UPDATE SET last_id=excluded.last_id, updated_at=excluded.updated_at",
+                    (source, stats["last_id"], time.time()),
+                )
+            chunk.clear()
+
+        for ep in episodes:
+            stats["scanned"] += 1
+            chunk.append(ep)
+            if len(chunk) >= batch:
+                flush()
+        if chunk:
+            flush()
+        return stats
+
+    def iter_rows(self, batch: int = 500) -> Iterable[EpisodeRow]:
+        """Every episode, oldest first, fetched `batch` at a time (keyset pagination)."""
+        conn = self._conn()
+        last = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, run_id, task, ok, extra, n_steps FROM episodes WHERE id > ? ORDER BY id LIMIT ?", (last, batch)
+            ).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield self._row(conn, r)
+            last = rows[-1][0]
+
+    def _insert(
+        self, conn: sqlite3.Connection, run_id: str, task: str, ok: bool, payload: Dict[str, Any], eid: Optional[int] = None
+    ) -> int:
+        return self._insert_many(conn, [(run_id, task, ok, payload, eid)])[0]
+
+    def _insert_many(
+        self, conn: sqlite3.Connection, rows: Sequence[Tuple[str, str, bool, Dict[str, Any], Optional[int]]]
+    ) -> List[int]:
+        """
+        Insert (run_id, task, ok, payload, eid) rows inside the caller's transaction; eid None = next id.
+        One INSERT per episode (for its id), then one executemany each for the steps and FTS rows.
+        """
+        ins = (
+            "INSERT INTO episodes(id, run_id, task, task_hash, ok, n_steps, created_at, extra) VALUES(?,?,?,?,?,?,?,?)"
+        )
+        now = time.time()
+        ids: List[int] = []
+        steps: List[tuple] = []
+        fts: List[tuple] = []
+        for run_id, task, ok, payload, eid in rows:
+            history = payload.get("history") or []
+            extra = {k: v for k, v in payload.items() if k != "history"}
+            # n_steps NULL = payload had no history key (rebuilt without one)
+            eid = conn.execute(ins, (
+                eid, run_id, task, task_hash(task), 1 if ok else 0, len(history) if "history" in payload else None, now,
+                _z(json.dumps(extra, ensure_ascii=False)),
+            )).lastrowid
+            ids.append(eid)
+            ep_steps = [_step_row(eid, i, h) for i, h in enumerate(history)]
+            steps += ep_steps
+            if self.fts:
+                for i, h in enumerate(history):
+                    if isinstance(h, dict):
+                        res = h.get("result") if isinstance(h.get("result"), dict) else {}
+                        fts += _fts_rows(eid, i, h.get("critic_instruction"), res.get("output"), res.get("error"))
+        conn.executemany(
+            "INSERT INTO steps(episode_id, idx, step, tool, ok, error_class, duration_s, output_len, body, output, error) "
+            "VALUES(?,?,?,?,?,?,?,?,?,?,?)",
+            steps,
         )
-        conn.commit()
-        conn.close()
+        if fts:
+            conn.executemany("INSERT INTO steps_fts(text, kind, episode_id, idx) VALUES(?,?,?,?)", fts)
+        return ids
+
+    # ---- reads ----
+    def _rows(self, where: str, params: tuple, limit: int) -> List[EpisodeRow]:
+        conn = self._conn()
+        rows = conn.execute(
+            f"SELECT id, run_id, task, ok, extra, n_steps FROM episodes {where} ORDER BY id DESC LIMIT ?",
+            params + (limit,),
+        ).fetchall()
+        return [self._row(conn, r) for r in rows]
+
+    def _row(self, conn: sqlite3.Connection, r: tuple) -> EpisodeRow:
+        # r: id, run_id, task, ok, extra, n_steps
+        return EpisodeRow(run_id=r[1], task=r[2], ok=bool(r[3]), payload=self._payload(conn, r[0], r[4], r[5] is not None))
+
+    def _payload(self, conn: sqlite3.Connection, eid: int, extra: Optional[bytes], has_history: bool) -> Dict[str, Any]:
+        payload = json.loads(_unz(extra) or "{}")
+        if not has_history:
+            return payload
+        history = []
+        for body, output, error in conn.execute(
+            "SELECT body, output, error FROM steps WHERE episode_id=? ORDER BY idx", (eid,)
+        ):
+            h = json.loads(_unz(body))
+            res = h.get("result") if isinstance(h, dict) else None
+            if isinstance(res, dict):
+                if output is not None:
+                    res["output"] = _unz(output)
+                if error is not None:
+                    res["error"] = _unz(error)
+            history.append(h)
+        payload["history"] = history
+        return payload
 
     def recent(self, limit: int = 20) -> List[EpisodeRow]:
-        conn = sqlite3.connect(self.path)
-        cur = conn.cursor()
-        cur.execute("SELECT run_id, task, ok, payload FROM episodes ORDER BY id DESC LIMIT ?", (limit,))
-        rows = cur.fetchall()
-        conn.close()
-        out = []
-        for r in rows:
-            out.append(EpisodeRow(run_id=r[0], task=r[1], ok=bool(r[2]), payload=json.loads(r[3] or "{}")))
-        return out
+        return self._rows("", (), limit)
 
     def by_task(self, task: str, limit: int = 50) -> List[EpisodeRow]:
-        conn = sqlite3.connect(self.path)
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT run_id, task, ok, payload FROM episodes WHERE task=? ORDER BY id DESC LIMIT ?",
-            (task, limit),
-        )
-        rows = cur.fetchall()
-        conn.close()
-        return [EpisodeRow(run_id=r[0], task=r[1], ok=bool(r[2]), payload=json.loads(r[3] or "{}")) for r in rows]
\ No newline at end of file
+        # the index holds the 16-char hash, not the task text; task= guards against collisions
+        return self._rows("WHERE task_hash=? AND task=?", (task_hash(task), task), limit)
+
+    def step_output(self, episode_id: int, idx: int) -> Tuple[Optional[str], Optional[str]]:
+        """(output, error) of one step, decompressed on demand."""
+        row = self._conn().execute(
+            "SELECT output, error FROM steps WHERE episode_id=? AND idx=?", (episode_id, idx)
+        ).fetchone()
+        return (_unz(row[0]), _unz(row[1])) if row else (None, None)
+
+    def failure_rate(self, tool: str, last_n: int = 1000) -> List[Dict[str, Any]]:
+        """Per-task failure rate of one tool over the last `last_n` episodes (idx_steps_tool)."""
+        rows = self._conn().execute(
+            """
+            SELECT e.task, e.task_hash, COUNT(*) AS n, SUM(s.ok = 0) AS failures
+            FROM steps s JOIN episodes e ON e.id = s.episode_id
+            WHERE s.tool = ?
+              AND s.episode_id > COALESCE((SELECT id FROM episodes ORDER BY id DESC LIMIT 1 OFFSET ?), 0)
+            GROUP BY e.task_hash, e.task
+            ORDER BY failures * 1.0 / n DESC, n DESC
+            """,
+            (tool, last_n),
+        ).fetchall()
+        return [{"task": t, "task_hash": h, "n": n, "failures": f, "rate": f / n} for t, h, n, f in rows]
+
+    def search(self, query: str, limit: int = 10, kind: Optional[str] = None, raw: bool = False) -> List[Dict[str, Any]]:
+        """
+        Past steps whose error/output/critic text matches `query`, best BM25 first.
+        query is free text (e.g. the current traceback) unless raw=True (FTS5 syntax).
+        Returns dicts: episode_id, idx, kind, task, tool, ok, snippet, score (lower = better).
+        """
+        if not self.fts:
+            raise RuntimeError("SQLite build has no FTS5; search() is unavailable")
+        match = query if raw else fts_query(query)
+        if not match:
+            return []
+        rows = self._conn().execute(
+            """
+            SELECT f.episode_id, f.idx, f.kind, f.score, f.snip, e.task, s.tool, s.ok
+            FROM (
+              SELECT episode_id, idx, kind, rank AS score,
+                     snippet(steps_fts, 0, '[', ']', '...', 16) AS snip
+              FROM steps_fts WHERE steps_fts MATCH ? AND (? IS NULL OR kind = ?)
+              ORDER BY rank LIMIT ?
+            ) f
+            JOIN episodes e ON e.id = f.episode_id
+            LEFT JOIN steps s ON s.episode_id = f.episode_id AND s.idx = f.idx
+            ORDER BY f.score
+            """,
+            (match, kind, kind, limit),
+        ).fetchall()
+        return [
+            {"episode_id": eid, "idx": i, "kind": k, "score": sc, "snippet": sn, "task": t, "tool": tool,
+             "ok": None if ok is None else bool(ok)}
+            for eid, i, k, sc, sn, t, tool, ok in rows
+        ]
+
+    def similar_episodes(
+        self, task: str, k: int = 5, ok: Optional[bool] = True, actions: Sequence[str] = (), min_similarity: float = 0.2
+    ) -> List[Tuple[float, EpisodeRow]]:
+        """
+        Up to k episodes whose task reads like `task` (reworded near-duplicates included), best
+        first, as (similarity, row). ok=True: successful ones only; None: any outcome.
+        """
+        conn = self._conn()
+        self._sync_lsh(conn)
+        hits = self.lsh.query(conn, task, actions, k=k, ok=ok, min_similarity=min_similarity)
+        if not hits:
+            return []
+        ids = [eid for eid, _ in hits]
+        rows = {
+            r[0]: self._row(conn, r)
+            for r in conn.execute(
+                f"SELECT id, run_id, task, ok, extra, n_steps FROM episodes WHERE id IN ({','.join('?' * len(ids))})", ids
+            )
+        }
+        return [(score, rows[eid]) for eid, score in hits if eid in rows]
+
+    def count(self) -> int:
+        (n,) = self._conn().execute("SELECT COUNT(*) FROM episodes").fetchone()
+        return n
+
+
+def _create_v2(conn: sqlite3.Connection) -> None:
+    # statement by statement: executescript() would commit the caller's transaction
+    for stmt in _SCHEMA_V2.split(";"):
+        if stmt.strip():
+            conn.execute(stmt)
+
+
+def _fts_rows(eid: int, i: int, critic: Any, output: Any, error: Any) -> List[tuple]:
+    rows = []
+    for kind, text in (("error", error), ("output", output), ("critic", critic)):
+        if isinstance(text, str) and text.strip():
+            rows.append((normalize_text(text, kind), kind, eid, i))
+    return rows
+
+
+def _step_row(eid: int, i: int, h: Any) -> tuple:
+    if not isinstance(h, dict):
+        return (eid, i, None, None, None, None, None, None, _z(json.dumps(h, ensure_ascii=False)), None, None)
+    result = h.get("result") if isinstance(h.get("result"), dict) else {}
+    action = h.get("action") if isinstance(h.get("action"), dict) else {}
+    output, error = result.get("output"), result.get("error")
+    # only string outputs / errors move to their own columns (NULL = still in the body, or absent)
+    split = [k for k in ("output", "error") if isinstance(result.get(k), str)]
+    body = dict(h)
+    if split:
+        body["result"] = {k: v for k, v in result.items() if k not in split}
+    ok = result.get("ok")
+    step = h.get("step")
+    return (
+        eid, i, step if isinstance(step, int) else None,
+        action.get("name") or result.get("name"),
+        None if ok is None else int(bool(ok)),
+        None if ok else error_class(error),
+        result.get("duration_s", h.get("duration_s")),
+        len(output) if isinstance(output, str) else None,
+        _z(json.dumps(body, ensure_ascii=False)),
+        _z(output) if isinstance(output, str) else None,
+        _z(error) if isinstance(error, str) else None,
+    )
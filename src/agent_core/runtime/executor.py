@@ -1,8 +1,26 @@
 from ..schemas.tool import ToolCall, ToolResult
 from ..tools import TOOLS
+from . import metrics, tracing
+import time
 import traceback
 
-def execute_tool(call: ToolCall, task: str | None = None) -> ToolResult:
+def execute_tool(
+    call: ToolCall, task: str | None = None, cwd: str | None = None, timeout: float | None = None
+) -> ToolResult:
+    """Run one tool call; cwd / timeout (seconds) override the tool's defaults when given."""
+    with tracing.span("tool", cat="tool", tool=call.name) as sp:
+        t0 = time.perf_counter()
+        result = _execute_tool(call, task, cwd, timeout)
+        result.duration_s = time.perf_counter() - t0
+        metrics.TOOL_LATENCY.observe(result.duration_s, tool=call.name)
+        metrics.TOOL_CALLS.inc(tool=call.name, ok=str(result.ok).lower())
+        sp.set(ok=result.ok)
+        return result
+
+
+def _execute_tool(
+    call: ToolCall, task: str | None = None, cwd: str | None = None, timeout: float | None = None
+) -> ToolResult:
     args = dict(call.args)
 
     # expand LLM-generated sample placeholder
@@ -22,8 +40,9 @@ def execute_tool(call: ToolCall, task: str | None = None) -> ToolResult:
             error=f"Unknown tool: {call.name}. Available: {sorted(TOOLS.keys())}"
         )
 
+    kwargs = {k: v for k, v in (("cwd", cwd), ("timeout", timeout)) if v is not None}
     try:
-        out = fn(args)
+        out = fn(args, **kwargs)
         return ToolResult(name=call.name, ok=True, output=out, error=None)
     except Exception:
         return ToolResult(name=call.name, ok=False, output="", error=traceback.format_exc())
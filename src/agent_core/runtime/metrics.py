@@ -0,0 +1,293 @@
+"""
+In-process live metrics for long-running jobs (day14 bandit, day15 curriculum).
+
+Counters, gauges and fixed-bucket histograms in one registry, rendered in the Prometheus
+text format and exposed either over HTTP or as a textfile rewritten periodically (for the
+node_exporter textfile collector, or just `watch cat`):
+
+    metrics.start_exporter(port=9108)                  # http://127.0.0.1:9108/metrics
+    metrics.start_exporter(textfile="metrics.prom")    # rewritten every interval_s
+
+start_exporter_from_env() reads AGENT_METRICS_PORT / AGENT_METRICS_TEXTFILE. Recording is
+always on; it costs one lock and a dict update per event.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+EPISODE_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 3600.0)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _labelstr(self, key: Tuple[str, ...], extra: str = "") -> str:
+        parts = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: object) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._labelstr(k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels: object) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (non-cumulative, last = +Inf), sum]
+        self._data: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        with self._lock:
+            counts, total = self._data.get(key) or self._data.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[i] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def count(self, **labels: object) -> int:
+        data = self._data.get(self._key(labels))
+        return sum(data[0]) if data else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._data.items())
+        out = []
+        for key, (counts, total) in items:
+            cum = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                cum += c
+                le_label = 'le="%s"' % _fmt(le)
+                out.append(f"{self.name}_bucket{self._labelstr(key, le_label)} {cum}")
+            out.append(f"{self.name}_sum{self._labelstr(key)} {_fmt(total)}")
+            out.append(f"{self.name}_count{self._labelstr(key)} {cum}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_add(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(m, cls):
+                raise ValueError(f"metric {name} already registered as {m.kind}")
+            return m
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_add(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_add(Gauge, name, help, labelnames)
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._get_or_add(Histogram, name, help, labelnames, buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines += m.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---- agent metrics ----
+LLM_CALLS = REGISTRY.counter("agent_llm_calls_total", "LLM chat calls by outcome.", ("outcome",))
+LLM_LATENCY = REGISTRY.histogram("agent_llm_latency_seconds", "LLM chat call latency.")
+LLM_TOKENS = REGISTRY.counter("agent_llm_tokens_total", "LLM tokens by kind.", ("kind",))
+REPAIRS = REGISTRY.counter("agent_json_repairs_total", "Tool-call JSON repairs by outcome.", ("outcome",))
+TOOL_CALLS = REGISTRY.counter("agent_tool_calls_total", "Tool executions by tool and result.", ("tool", "ok"))
+TOOL_LATENCY = REGISTRY.histogram("agent_tool_latency_seconds", "Tool execution latency.", ("tool",))
+EXECUTIONS_AVOIDED = REGISTRY.counter(
+    "agent_search_executions_avoided_total", "Search candidates not executed, by reason.", ("reason",)
+)
+VERIFY = REGISTRY.counter("agent_verify_total", "Verifier outcomes.", ("mode", "ok"))
+EPISODES = REGISTRY.counter("agent_episodes_total", "Finished episodes by strategy and result.", ("strategy", "ok"))
+EPISODE_LATENCY = REGISTRY.histogram(
+    "agent_episode_duration_seconds", "Episode wall time by strategy.", ("strategy",), EPISODE_BUCKETS
+)
+EPISODES_RUNNING = REGISTRY.gauge("agent_episodes_running", "Episodes currently running by strategy.", ("strategy",))
+
+
+@contextmanager
+def episode(strategy: str) -> Iterator[Dict[str, bool]]:
+    """
+    with metrics.episode("beam") as ep:
+        ep["ok"] = run_beam(bt)
+    """
+    ep = {"ok": False}
+    EPISODES_RUNNING.inc(strategy=strategy)
+    t0 = time.perf_counter()
+    try:
+        yield ep
+    finally:
+        EPISODES_RUNNING.dec(strategy=strategy)
+        EPISODE_LATENCY.observe(time.perf_counter() - t0, strategy=strategy)
+        EPISODES.inc(strategy=strategy, ok=str(bool(ep["ok"])).lower())
+
+
+# ---- exporters ----
+class _Handler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:  # keep the agent's stdout clean
+        return None
+
+
+def serve_http(port: int, addr: str = "127.0.0.1", registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+    server = ThreadingHTTPServer((addr, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class TextfileExporter:
+    """Rewrites `path` atomically (tmp + rename) every interval_s seconds and on stop()."""
+
+    def __init__(self, path: str, interval_s: float = 10.0, registry: Registry = REGISTRY):
+        self.path = Path(path)
+        self.interval_s = interval_s
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="metrics-textfile", daemon=True)
+
+    def start(self) -> "TextfileExporter":
+        self._thread.start()
+        return self
+
+    def write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(self.registry.render(), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.write()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.write()
+            except OSError:
+                pass  # next tick retries
+
+
+def start_exporter(
+    port: Optional[int] = None, textfile: Optional[str] = None, interval_s: float = 10.0
+) -> Optional[object]:
+    if port is not None:
+        return serve_http(port)
+    if textfile is not None:
+        return TextfileExporter(textfile, interval_s).start()
+    return None
+
+
+def start_exporter_from_env() -> Optional[object]:
+    port = os.environ.get("AGENT_METRICS_PORT")
+    return start_exporter(
+        port=int(port) if port else None,
+        textfile=os.environ.get("AGENT_METRICS_TEXTFILE") or None,
+        interval_s=float(os.environ.get("AGENT_METRICS_INTERVAL_S", "10")),
+    )
@@ -0,0 +1,235 @@
+"""
+Retention for the runs/ tree: compress finished runs, delete expired ones, cap total size.
+
+Work lists come from the run catalog (runtime/run_catalog.py), never from walking runs/, and
+each pass handles at most `max_runs` runs, so it can run incrementally in the background next
+to live agents. Running runs are never touched, except that a run still "running" after
+abandon_after_s is marked incomplete first (its process crashed before finishing it).
+
+Rules, in order:
+1. age: delete runs older than their limit; failed/incomplete runs use failed_max_age_days,
+   tag_max_age_days overrides both by tag substring (None = keep forever)
+2. pack: runs finished more than compress_after_s ago -> one compressed archive
+   (run_log.pack_run_dir), still readable in place through RunManager.reader(). Writes that land
+   after packing (trace.json re-exported on close) go to a new run.jsonl that readers merge over
+   the archive, and the next pack_run_dir folds in
+3. size: while the catalog total exceeds max_total_bytes, delete the oldest deletable runs,
+   successes before failures
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .run_catalog import RunCatalog, RunRecord
+from .run_log import dir_bytes, pack_run_dir
+
+DAY = 86400.0
+
+
+@dataclass
+class RetentionPolicy:
+    max_age_days: Optional[float] = 30.0
+    failed_max_age_days: Optional[float] = 90.0  # failures are the interesting ones: keep them longer
+    tag_max_age_days: Dict[str, Optional[float]] = field(default_factory=dict)
+    max_total_bytes: Optional[int] = None
+    compress_after_s: float = 3600.0
+    abandon_after_s: Optional[float] = 2 * DAY  # "running" rows older than this are abandoned
+    codec: str = "gzip"
+
+    def max_age_s(self, rec: RunRecord) -> Optional[float]:
+        """Age limit for one run in seconds (None = never delete by age)."""
+        for needle, days in self.tag_max_age_days.items():
+            if needle in (rec.tag or ""):
+                return None if days is None else days * DAY
+        days = self.max_age_days if rec.status == "done" else self.failed_max_age_days
+        return None if days is None else days * DAY
+
+    def deletable(self, rec: RunRecord) -> bool:
+        """Tags pinned with None are never deleted, not even to meet the size cap."""
+        return not any(needle in (rec.tag or "") and days is None for needle, days in self.tag_max_age_days.items())
+
+
+@dataclass
+class RetentionReport:
+    packed: int = 0
+    deleted: int = 0
+    abandoned: int = 0
+    bytes_reclaimed: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def add(self, other: "RetentionReport") -> None:
+        self.packed += other.packed
+        self.abandoned += other.abandoned
+        self.deleted += other.deleted
+        self.bytes_reclaimed += other.bytes_reclaimed
+        self.errors = (self.errors + other.errors)[-20:]
+
+
+class Retention:
+    def __init__(self, root: str = "runs", policy: Optional[RetentionPolicy] = None, catalog: Optional[RunCatalog] = None):
+        self.root = Path(root)
+        self.policy = policy or RetentionPolicy()
+        self.catalog = catalog or RunCatalog(str(self.root / "catalog.db"))
+        self.catalog.ensure_backfilled(str(self.root))
+
+    def run_once(self, max_runs: int = 50, now: Optional[float] = None) -> RetentionReport:
+        """One incremental pass touching at most max_runs runs."""
+        now = time.time() if now is None else now
+        rep = RetentionReport()
+        budget = max_runs
+        if self.policy.abandon_after_s is not None:
+            rep.abandoned = self.catalog.abandon_stale(now - self.policy.abandon_after_s, now=now)
+
+        # ---- age ----
+        # the smallest limit bounds the candidate query; each row is then checked against its own limit
+        limits = [d for d in (self.policy.max_age_days, self.policy.failed_max_age_days) if d is not None]
+        limits += [d for d in self.policy.tag_max_age_days.values() if d is not None]
+        if limits:
+            offset = 0
+            while budget > 0:
+                page = self.catalog.finished(now - min(limits) * DAY, limit=100, offset=offset)
+                kept = 0
+                for rec in page:
+                    limit = self.policy.max_age_s(rec)
+                    if budget > 0 and limit is not None and now - rec.started_at > limit:
+                        self._delete(rec, rep)
+                        budget -= 1
+                    else:
+                        kept += 1
+                if len(page) < 100:
+                    break
+                offset += kept
+
+        # ---- pack ----
+        if budget > 0:
+            grace = now - self.policy.compress_after_s  # from the finish: late writes land before it
+            for rec in self.catalog.finished(now, packed=False, limit=budget, finished_before=grace):
+                self._pack(rec, rep)
+                budget -= 1
+
+        # ---- size cap ----
+        if self.policy.max_total_bytes is not None and budget > 0:
+            budget = self._enforce_size(rep, budget)
+        return rep
+
+    def _pack(self, rec: RunRecord, rep: RetentionReport) -> None:
+        run_dir = Path(rec.run_dir)
+        try:
+            if not run_dir.is_dir():
+                self.catalog.delete(rec.run_id)
+                return
+            before, after = pack_run_dir(run_dir, self.policy.codec)
+            self.catalog.set_storage(rec.run_id, after, packed=True)
+            rep.packed += 1
+            rep.bytes_reclaimed += before - after
+        except Exception as e:  # one bad run must not stop the pass
+            rep.errors.append(f"pack {rec.run_id}: {e!r}")
+            # mark it packed anyway so the same broken run is not retried on every pass
+            self.catalog.set_storage(rec.run_id, dir_bytes(run_dir) if run_dir.is_dir() else 0, packed=True)
+
+    def _delete(self, rec: RunRecord, rep: RetentionReport) -> None:
+        run_dir = Path(rec.run_dir)
+        try:
+            size = dir_bytes(run_dir) if run_dir.is_dir() else 0
+            shutil.rmtree(run_dir, ignore_errors=True)
+            self.catalog.delete(rec.run_id)
+            rep.deleted += 1
+            rep.bytes_reclaimed += size
+        except Exception as e:
+            rep.errors.append(f"delete {rec.run_id}: {e!r}")
+
+    def _enforce_size(self, rep: RetentionReport, budget: int) -> int:
+        total, unmeasured = self.catalog.total_bytes()
+        if unmeasured:
+            # finished runs not packed yet: a stat per file, cheap enough to do inline
+            for rec in self.catalog.finished(time.time(), unmeasured=True, limit=unmeasured):
+                run_dir = Path(rec.run_dir)
+                self.catalog.set_storage(rec.run_id, dir_bytes(run_dir) if run_dir.is_dir() else 0, rec.packed)
+            total, _ = self.catalog.total_bytes()
+        if total <= self.policy.max_total_bytes:
+            return budget
+        # successes first, then failures; oldest first within each
+        for status_first in (True, False):
+            offset = 0
+            while budget > 0 and total > self.policy.max_total_bytes:
+                page = self.catalog.finished(time.time(), limit=100, offset=offset)
+                if not page:
+                    break
+                skipped = 0
+                for rec in page:
+                    if total <= self.policy.max_total_bytes or budget <= 0:
+                        break
+                    if (rec.status == "done") != status_first or not self.policy.deletable(rec):
+                        skipped += 1
+                        continue
+                    total -= rec.disk_bytes or 0
+                    self._delete(rec, rep)
+                    budget -= 1
+                offset += skipped
+                if len(page) < 100:
+                    break
+        return budget
+
+
+class RetentionWorker:
+    """
+    Background thread running Retention.run_once() every interval_s seconds.
+    `totals` accumulates across passes; `last` is the most recent pass.
+    """
+
+    def __init__(self, retention: Retention, interval_s: float = 300.0, max_runs: int = 50):
+        self.retention = retention
+        self.interval_s = interval_s
+        self.max_runs = max_runs
+        self.totals = RetentionReport()
+        self.last = RetentionReport()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="run-retention", daemon=True)
+
+    def start(self) -> "RetentionWorker":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.last = self.retention.run_once(self.max_runs)
+            except Exception as e:
+                self.last = RetentionReport(errors=[repr(e)])
+            self.totals.add(self.last)
+            # a full pass means more work is queued: go again right away
+            busy = self.last.packed + self.last.deleted >= self.max_runs
+            self._stop.wait(0 if busy else self.interval_s)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Apply retention rules to a runs/ tree.")
+    ap.add_argument("root", nargs="?", default="runs")
+    ap.add_argument("--max-age-days", type=float, default=30.0)
+    ap.add_argument("--failed-max-age-days", type=float, default=90.0)
+    ap.add_argument("--max-total-mb", type=float, default=None)
+    ap.add_argument("--abandon-after-days", type=float, default=2.0)
+    ap.add_argument("--codec", choices=("gzip", "lzma"), default="gzip")
+    ap.add_argument("--max-runs", type=int, default=1000)
+    args = ap.parse_args()
+    policy = RetentionPolicy(
+        max_age_days=args.max_age_days,
+        failed_max_age_days=args.failed_max_age_days,
+        max_total_bytes=int(args.max_total_mb * 1024 * 1024) if args.max_total_mb else None,
+        abandon_after_s=args.abandon_after_days * DAY,
+        codec=args.codec,
+    )
+    print(json.dumps(asdict(Retention(args.root, policy).run_once(args.max_runs)), ensure_ascii=False))
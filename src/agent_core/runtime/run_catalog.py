@@ -0,0 +1,347 @@
+"""
+SQLite catalog of runs, so queries over past runs never glob the runs/ tree.
+
+RunManager inserts a row when a run starts and updates it when the run finishes (each in its
+own transaction). Typical query: "latest 20 successes for task X" is served by
+idx_runs_task_status (task_id, status, started_at).
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from .run_ids import iter_run_dirs, parse_run_id
+from .run_log import RunLogReader, step_of
+
+STATUSES = ("running", "done", "failed", "incomplete")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+  run_id TEXT PRIMARY KEY,
+  tag TEXT,
+  task_id TEXT,
+  strategy TEXT,
+  status TEXT,
+  run_dir TEXT,
+  started_at REAL,
+  finished_at REAL,
+  duration_s REAL,
+  steps INTEGER,
+  prompt_tokens INTEGER,
+  completion_tokens INTEGER,
+  disk_bytes INTEGER,
+  packed INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_runs_task_status ON runs(task_id, status, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_status ON runs(status, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_strategy ON runs(strategy, status, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_tag ON runs(tag, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_packed ON runs(packed, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_finished ON runs(status, finished_at, run_id);
+CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_COLUMNS = (
+    "run_id, tag, task_id, strategy, status, run_dir, started_at, finished_at, "
+    "duration_s, steps, prompt_tokens, completion_tokens, disk_bytes, packed"
+)
+_PLACEHOLDERS = ",".join("?" * len(_COLUMNS.split(",")))
+
+# columns added after the first release: (name, type) -> ALTER TABLE on older catalogs
+_ADDED_COLUMNS = (("disk_bytes", "INTEGER"), ("packed", "INTEGER DEFAULT 0"))
+
+
+@dataclass
+class RunRecord:
+    run_id: str
+    tag: str
+    task_id: Optional[str]
+    strategy: Optional[str]
+    status: str
+    run_dir: str
+    started_at: float
+    finished_at: Optional[float] = None
+    duration_s: Optional[float] = None
+    steps: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    disk_bytes: Optional[int] = None  # measured by retention; None = not measured yet
+    packed: int = 0
+
+    def row(self) -> tuple:
+        return (self.run_id, self.tag, self.task_id, self.strategy, self.status, self.run_dir, self.started_at,
+                self.finished_at, self.duration_s, self.steps, self.prompt_tokens, self.completion_tokens,
+                self.disk_bytes, self.packed)
+
+
+def status_from_final(text: str) -> str:
+    """final.txt content -> catalog status ("DONE via ..." -> done, anything else -> failed)."""
+    return "done" if "DONE" in (text or "") else "failed"
+
+
+_STRATEGY_HINTS = (("beam", "beam"), ("critic", "critic"), ("robust_action", "baseline"), ("baseline", "baseline"))
+
+
+def infer_strategy(tag: str) -> Optional[str]:
+    for needle, strategy in _STRATEGY_HINTS:
+        if needle in tag:
+            return strategy
+    return None
+
+
+def infer_task_id(tag: str) -> Optional[str]:
+    from ..bench.tasks import get_task_library
+
+    for bt in get_task_library():
+        if tag.endswith(bt.task_id):
+            return bt.task_id
+    return None
+
+
+class RunCatalog:
+    def __init__(self, path: str = "runs/catalog.db"):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL;")  # concurrent workers: readers never block the writer
+        have = {r[1] for r in conn.execute("PRAGMA table_info(runs)")}
+        if have:
+            for name, typ in _ADDED_COLUMNS:
+                if name not in have:
+                    conn.execute(f"ALTER TABLE runs ADD COLUMN {name} {typ}")
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    # ---- writes (one transaction each) ----
+    def start_run(self, rec: RunRecord) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute(f"INSERT OR REPLACE INTO runs({_COLUMNS}) VALUES({_PLACEHOLDERS})", rec.row())
+        conn.close()
+
+    def finish_run(
+        self,
+        run_id: str,
+        status: str,
+        steps: int = 0,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        finished_at: Optional[float] = None,
+    ) -> None:
+        finished_at = time.time() if finished_at is None else finished_at
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE runs SET status=?, finished_at=?, duration_s=? - started_at, steps=?, "
+                "prompt_tokens=?, completion_tokens=? WHERE run_id=?",
+                (status, finished_at, finished_at, steps, prompt_tokens, completion_tokens, run_id),
+            )
+        conn.close()
+
+    def abandon_stale(self, started_before: float, now: Optional[float] = None) -> int:
+        """Mark "running" rows started before started_before as incomplete (their process is gone)."""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        with conn:
+            n = conn.execute(
+                "UPDATE runs SET status='incomplete', finished_at=?, duration_s=? - started_at "
+                "WHERE status='running' AND started_at < ?",
+                (now, now, started_before),
+            ).rowcount
+        conn.close()
+        return n
+
+    def set_storage(self, run_id: str, disk_bytes: int, packed: bool) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE runs SET disk_bytes=?, packed=? WHERE run_id=?", (disk_bytes, int(packed), run_id))
+        conn.close()
+
+    def delete(self, run_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM runs WHERE run_id=?", (run_id,))
+        conn.close()
+
+    # ---- reads ----
+    def _query(self, where: str, params: tuple, order: str, limit: int, offset: int = 0) -> List[RunRecord]:
+        conn = self._connect()
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM runs {where} ORDER BY {order} LIMIT ? OFFSET ?",
+            params + (limit, offset),
+        ).fetchall()
+        conn.close()
+        return [RunRecord(*r) for r in rows]
+
+    def get(self, run_id: str) -> Optional[RunRecord]:
+        rows = self._query("WHERE run_id=?", (run_id,), "run_id", 1)
+        return rows[0] if rows else None
+
+    def latest(
+        self,
+        status: Optional[str] = "done",
+        task_id: Optional[str] = None,
+        strategy: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[RunRecord]:
+        """Newest first. Each filter combination is covered by one of the indexes above."""
+        conds, params = [], []
+        if task_id is not None:
+            conds.append("task_id=?")
+            params.append(task_id)
+        if status is not None:
+            conds.append("status=?")
+            params.append(status)
+        if strategy is not None:
+            conds.append("strategy=?")
+            params.append(strategy)
+        where = ("WHERE " + " AND ".join(conds)) if conds else ""
+        return self._query(where, tuple(params), "started_at DESC", limit, offset)
+
+    def iter_latest(self, page_size: int = 50, **filters) -> Iterator[RunRecord]:
+        """Page through latest() lazily, for callers that skip some rows."""
+        offset = 0
+        while True:
+            page = self.latest(limit=page_size, offset=offset, **filters)
+            yield from page
+            if len(page) < page_size:
+                return
+            offset += page_size
+
+    def since(
+        self, started_at: float = 0.0, run_id: str = "", status: Optional[str] = "done", limit: int = 100
+    ) -> List[RunRecord]:
+        """Runs after the (started_at, run_id) watermark, oldest first (incremental consumers)."""
+        where, params = "WHERE (started_at > ? OR (started_at = ? AND run_id > ?))", [started_at, started_at, run_id]
+        if status is not None:
+            where += " AND status=?"
+            params.append(status)
+        return self._query(where, tuple(params), "started_at, run_id", limit)
+
+    def finished_since(
+        self, finished_at: float = 0.0, run_id: str = "", status: str = "done", limit: int = 100
+    ) -> List[RunRecord]:
+        """
+        Runs that finished after the (finished_at, run_id) watermark, in finish order. Unlike
+        since(), a run that started early but finished late is never behind the watermark.
+        """
+        return self._query(
+            "WHERE status=? AND (finished_at > ? OR (finished_at = ? AND run_id > ?))",
+            (status, finished_at, finished_at, run_id), "finished_at, run_id", limit,
+        )
+
+    def latest_finished(self, status: str = "done", limit: int = 20) -> List[RunRecord]:
+        """Most recently finished runs first."""
+        return self._query("WHERE status=? AND finished_at IS NOT NULL", (status,), "finished_at DESC, run_id DESC", limit)
+
+    def finished(
+        self,
+        older_than: float,
+        packed: Optional[bool] = None,
+        unmeasured: bool = False,
+        limit: int = 100,
+        offset: int = 0,
+        finished_before: Optional[float] = None,
+    ) -> List[RunRecord]:
+        """
+        Non-running runs started before older_than, oldest first (retention work lists).
+        finished_before also requires the run to have finished (rows without finished_at: started) before it.
+        """
+        where, params = "WHERE status != 'running' AND started_at < ?", [older_than]
+        if finished_before is not None:
+            where += " AND COALESCE(finished_at, started_at) < ?"
+            params.append(finished_before)
+        if packed is not None:
+            where += " AND packed=?"
+            params.append(int(packed))
+        if unmeasured:
+            where += " AND disk_bytes IS NULL"
+        return self._query(where, tuple(params), "started_at", limit, offset)
+
+    def total_bytes(self) -> Tuple[int, int]:
+        """(sum of measured disk_bytes, number of finished runs not measured yet); running runs excluded."""
+        conn = self._connect()
+        total, unmeasured = conn.execute(
+            "SELECT COALESCE(SUM(disk_bytes), 0), SUM(disk_bytes IS NULL) FROM runs WHERE status != 'running'"
+        ).fetchone()
+        conn.close()
+        return total, unmeasured or 0
+
+    def count(self) -> int:
+        conn = self._connect()
+        (n,) = conn.execute("SELECT COUNT(*) FROM runs").fetchone()
+        conn.close()
+        return n
+
+    # ---- one-time backfill ----
+    def backfill(self, root: str = "runs") -> int:
+        """
+        Scan an existing runs/ tree once and insert rows for runs the catalog does not know.
+        Returns the number of rows inserted.
+        """
+        conn = self._connect()
+        known = {r[0] for r in conn.execute("SELECT run_id FROM runs")}
+        conn.close()
+
+        recs = []
+        for run_dir in iter_run_dirs(root):
+            if run_dir.name in known:
+                continue
+            recs.append(record_from_dir(run_dir))
+
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO runs({_COLUMNS}) VALUES({_PLACEHOLDERS})", [r.row() for r in recs]
+            )
+            conn.execute("INSERT OR REPLACE INTO catalog_meta(key, value) VALUES('backfilled_at', ?)", (str(time.time()),))
+        conn.close()
+        return len(recs)
+
+    def ensure_backfilled(self, root: str = "runs") -> int:
+        """Run backfill() once per catalog; later calls are a single indexed lookup."""
+        conn = self._connect()
+        row = conn.execute("SELECT value FROM catalog_meta WHERE key='backfilled_at'").fetchone()
+        conn.close()
+        return 0 if row else self.backfill(root)
+
+
+def record_from_dir(run_dir: Path) -> RunRecord:
+    """Reconstruct a catalog row from what is on disk (used by backfill)."""
+    run_id = run_dir.name
+    started_at, tag = parse_run_id(run_id)
+    if started_at is None:
+        started_at = run_dir.stat().st_mtime
+
+    reader = RunLogReader(run_dir)
+    names = reader.names()
+    disk = sum(p.stat().st_size for p in run_dir.iterdir() if p.is_file())
+    status = "incomplete"
+    if reader.has("final.txt"):
+        status = status_from_final(reader.read_text("final.txt"))
+    steps = max([s for s in (step_of(n) for n in names) if s is not None], default=0)
+    finished_at = max((os.path.getmtime(p) for p in run_dir.iterdir() if p.is_file()), default=started_at)
+
+    return RunRecord(
+        run_id=run_id,
+        tag=tag,
+        task_id=infer_task_id(tag),
+        strategy=infer_strategy(tag),
+        status=status,
+        run_dir=str(run_dir),
+        started_at=started_at,
+        finished_at=finished_at if status != "incomplete" else None,
+        duration_s=(finished_at - started_at) if status != "incomplete" else None,
+        steps=steps,
+        disk_bytes=disk,
+        packed=int(reader.packed is not None),
+    )
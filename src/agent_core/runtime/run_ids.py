@@ -0,0 +1,97 @@
+"""
+Collision-free, sortable run IDs and the sharded runs/ layout.
+
+- new_ulid(): 26 chars of Crockford base32 = 48-bit millisecond timestamp + 80 random bits.
+  Within one process IDs are strictly increasing even inside the same millisecond; across
+  processes uniqueness comes from the random part, so no coordination is needed.
+- run_id = "<ulid>_<tag>", stored under runs/YYYY/MM/DD/<run_id> (UTC date of the ULID time).
+- run_dir_for() maps a run_id back to its directory without listing anything; legacy
+  "YYYYMMDD_HHMMSS_<tag>" IDs keep living directly under runs/.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {c: i for i, c in enumerate(_CROCKFORD)}
+_ULID_RE = re.compile(r"^([0-9A-HJKMNP-TV-Z]{26})(?:_(.*))?$")
+_LEGACY_RE = re.compile(r"^(\d{8}_\d{6})_(.*)$")
+_SHARD_PART = re.compile(r"^\d+$")
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_rand = 0
+
+
+def _encode(value: int, length: int) -> str:
+    out = []
+    for _ in range(length):
+        out.append(_CROCKFORD[value & 31])
+        value >>= 5
+    return "".join(reversed(out))
+
+
+def new_ulid(now_ms: Optional[int] = None) -> str:
+    global _last_ms, _last_rand
+    ms = int(time.time() * 1000) if now_ms is None else now_ms
+    with _lock:
+        if ms <= _last_ms:
+            # same (or earlier, clock went back) millisecond: bump the random part to stay monotonic
+            ms = _last_ms
+            rand = (_last_rand + 1) & ((1 << 80) - 1)
+        else:
+            rand = int.from_bytes(os.urandom(10), "big")
+        _last_ms, _last_rand = ms, rand
+    return _encode(ms, 10) + _encode(rand, 16)
+
+
+def new_run_id(tag: str = "run") -> str:
+    return f"{new_ulid()}_{tag}"
+
+
+def parse_run_id(run_id: str) -> Tuple[Optional[float], str]:
+    """run_id -> (start unix time or None, tag). Understands ULID and legacy timestamp IDs."""
+    m = _ULID_RE.match(run_id)
+    if m:
+        ms = 0
+        for c in m.group(1)[:10]:
+            ms = (ms << 5) | _DECODE[c]
+        return ms / 1000.0, m.group(2) or ""
+    m = _LEGACY_RE.match(run_id)
+    if m:
+        return datetime.strptime(m.group(1), "%Y%m%d_%H%M%S").timestamp(), m.group(2)
+    return None, run_id
+
+
+def run_dir_for(root: str | Path, run_id: str) -> Path:
+    """Stable run_id -> directory mapping (runs/YYYY/MM/DD/<run_id> for ULID IDs)."""
+    root = Path(root)
+    if not _ULID_RE.match(run_id):
+        return root / run_id
+    ts, _ = parse_run_id(run_id)
+    d = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return root / f"{d.year:04d}" / f"{d.month:02d}" / f"{d.day:02d}" / run_id
+
+
+def iter_run_dirs(root: str | Path = "runs") -> Iterator[Path]:
+    """Every run directory under root: sharded YYYY/MM/DD/<id> dirs and legacy flat dirs."""
+    root = Path(root)
+    if not root.is_dir():
+        return
+    for p in sorted(root.iterdir()):
+        if not p.is_dir():
+            continue
+        if not _SHARD_PART.match(p.name):
+            yield p  # legacy flat run dir
+            continue
+        for month in sorted(x for x in p.iterdir() if x.is_dir() and _SHARD_PART.match(x.name)):
+            for day in sorted(x for x in month.iterdir() if x.is_dir() and _SHARD_PART.match(x.name)):
+                for run in sorted(x for x in day.iterdir() if x.is_dir()):
+                    yield run
@@ -0,0 +1,445 @@
+"""
+Append-only run log: one JSONL segment per run instead of one file per artifact.
+
+Layout inside a run directory:
+- run.jsonl : one record per saved artifact
+              {"name": "step_03_obs.txt", "step": 3, "kind": "text"|"json", "ts": ..., "data": ...}
+- run.idx   : compact offset index, one line per record: "<offset>\\t<length>\\t<step>\\t<name>"
+
+Artifacts are never rewritten in place; saving the same name again appends a newer record and
+readers return the latest one. The index is only an accelerator: if it is missing or behind the
+segment (e.g. after a crash), readers rebuild it by scanning the tail of the segment.
+
+Finished runs can be packed (pack_run_dir): superseded records are dropped, plain files
+(including binary ones, base64 "bytes" records) are folded in, and the segment is compressed to
+run.jsonl.gz / run.jsonl.xz with its own index. RunLogReader reads packed runs in place; records
+appended after packing go to a new run.jsonl that it merges over the archive.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import gzip
+import json
+import lzma
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, IO, List, Optional, Tuple
+
+SEGMENT_NAME = "run.jsonl"
+INDEX_NAME = "run.idx"
+PACKED_NAMES = {"gzip": "run.jsonl.gz", "lzma": "run.jsonl.xz"}
+_OPENERS = {"run.jsonl.gz": gzip.open, "run.jsonl.xz": lzma.open}
+_RESERVED = {SEGMENT_NAME, INDEX_NAME} | set(_OPENERS) | {n + ".idx" for n in _OPENERS}
+
+_STEP_RE = re.compile(r"^(?:step|iter)_(\d+)_")
+
+
+def step_of(name: str) -> Optional[int]:
+    """step_03_obs.txt -> 3, iter_02_code.py -> 2, final.txt -> None"""
+    m = _STEP_RE.match(name)
+    return int(m.group(1)) if m else None
+
+
+class RunLogWriter:
+    """
+    Appends records to <run_dir>/run.jsonl and <run_dir>/run.idx.
+
+    keep_open=False opens/closes the files per append (safe for short-lived callers);
+    keep_open=True keeps handles until close() (used by the background writer).
+    """
+
+    def __init__(self, run_dir: Path, keep_open: bool = False):
+        self.run_dir = Path(run_dir)
+        self.keep_open = keep_open
+        self._seg_path = self.run_dir / SEGMENT_NAME
+        self._idx_path = self.run_dir / INDEX_NAME
+        self._offset = 0
+        self._seg: Optional[IO[bytes]] = None
+        self._idx: Optional[IO[bytes]] = None
+
+    def append(self, name: str, kind: str, data: Any) -> Tuple[int, int]:
+        step = step_of(name)
+        rec = {"name": name, "step": step, "kind": kind, "ts": time.time(), "data": data}
+        line = json.dumps(rec, ensure_ascii=False).encode("utf-8") + b"\n"
+
+        self._open()
+        offset = self._offset
+        self._seg.write(line)
+        self._idx.write(f"{offset}\t{len(line)}\t{'' if step is None else step}\t{name}\n".encode("utf-8"))
+        self._offset += len(line)
+        if not self.keep_open:
+            self.close()
+        return offset, len(line)
+
+    @property
+    def paths(self) -> Tuple[Path, Path]:
+        return self._seg_path, self._idx_path
+
+    def sync(self) -> None:
+        if self._seg is None:
+            return
+        for f in (self._seg, self._idx):
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self) -> None:
+        for f in (self._seg, self._idx):
+            if f is not None:
+                f.close()
+        self._seg = None
+        self._idx = None
+
+    def _open(self) -> None:
+        if self._seg is None:
+            self._seg = open(self._seg_path, "ab")
+            self._idx = open(self._idx_path, "ab")
+            # re-read the end offset on every open so several writers appending in turn stay consistent
+            self._offset = self._seg.seek(0, os.SEEK_END)
+
+
+class RunLogReader:
+    """
+    Random access to a run's artifacts by name or step.
+
+    Works on both layouts: run-log directories (run.jsonl) and legacy per-file directories,
+    so callers do not need to know how a run was written.
+    """
+
+    def __init__(self, run_dir: Path):
+        self.run_dir = Path(run_dir)
+        self._seg_path = self.run_dir / SEGMENT_NAME
+        self.packed: Optional[Path] = next(
+            (self.run_dir / n for n in _OPENERS if (self.run_dir / n).exists()), None
+        )
+        self.is_log = self.packed is not None or self._seg_path.exists()
+        self._packed_f: Optional[IO[bytes]] = None  # open decompressing stream, positioned by _raw()
+        self._index: Dict[str, Tuple[int, int, bool]] = {}  # name -> (offset, length, in the archive)
+        self._steps: Dict[int, List[str]] = {}
+        if self.packed is not None:
+            self._load_index(packed=True)
+        # a plain segment next to an archive holds writes made after packing (or, after a crash
+        # past pack_run_dir's commit point, the records already packed): its records are newer
+        if self._seg_path.exists():
+            self._load_index(packed=False)
+
+    @property
+    def has_segment(self) -> bool:
+        """True if some records live in a plain run.jsonl (always, for an unpacked run log)."""
+        return any(not packed for _, _, packed in self._index.values())
+
+    # ---- index ----
+    def _add(self, name: str, offset: int, length: int, packed: bool) -> None:
+        if name not in self._index:
+            step = step_of(name)
+            if step is not None:
+                self._steps.setdefault(step, []).append(name)
+        self._index[name] = (offset, length, packed)
+
+    def _load_index(self, packed: bool) -> None:
+        covered = 0
+        idx_path = self.run_dir / (self.packed.name + ".idx" if packed else INDEX_NAME)
+        if idx_path.exists():
+            with open(idx_path, "rb") as f:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break  # torn last line
+                    off, length, _step, name = raw[:-1].decode("utf-8").split("\t", 3)
+                    off, length = int(off), int(length)
+                    self._add(name, off, length, packed)
+                    covered = max(covered, off + length)
+        if packed and covered:
+            return  # packed index is written before the pack is committed, so it is complete
+
+        # index behind the segment (crash between the two writes): scan the tail; an archive
+        # without its index is streamed once from the start
+        if packed or covered < self._seg_path.stat().st_size:
+            with self._open_segment(packed) as f:
+                f.seek(covered)
+                off = covered
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break
+                    try:
+                        name = json.loads(raw)["name"]
+                    except (ValueError, KeyError):
+                        break
+                    self._add(name, off, len(raw), packed)
+                    off += len(raw)
+
+    # ---- segment access ----
+    def _open_segment(self, packed: bool) -> IO[bytes]:
+        if packed:
+            return _OPENERS[self.packed.name](self.packed, "rb")
+        return open(self._seg_path, "rb")
+
+    def _raw(self, name: str) -> bytes:
+        off, length, packed = self._index[name]
+        if packed:
+            # seeking a gzip / xz stream decompresses up to the offset without keeping it: reads in
+            # offset order cost one pass over the archive, a backward seek restarts from its start
+            if self._packed_f is None:
+                self._packed_f = self._open_segment(True)
+            self._packed_f.seek(off)
+            return self._packed_f.read(length)
+        with open(self._seg_path, "rb") as f:
+            f.seek(off)
+            return f.read(length)
+
+    def _in_offset_order(self, names: List[str]) -> List[str]:
+        # archive records, then segment records, each by offset; plain files last
+        def key(n: str) -> Tuple[int, int]:
+            if n not in self._index:
+                return 2, 0
+            off, _, packed = self._index[n]
+            return (0 if packed else 1), off
+
+        return sorted(names, key=key)
+
+    def close(self) -> None:
+        if self._packed_f is not None:
+            self._packed_f.close()
+            self._packed_f = None
+
+    def __enter__(self) -> "RunLogReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    # ---- queries ----
+    def _files(self) -> List[str]:
+        # plain files next to the log (binary artifacts, legacy runs); the log itself is not an artifact
+        if not self.run_dir.is_dir():
+            return []
+        return [
+            p.name for p in self.run_dir.iterdir()
+            if p.is_file() and p.name not in _RESERVED and not p.name.endswith(".tmp")
+        ]
+
+    def names(self) -> List[str]:
+        return sorted(set(self._index) | set(self._files()))
+
+    def has(self, name: str) -> bool:
+        return name in self._index or (self.run_dir / name).is_file()
+
+    def in_log(self, name: str) -> bool:
+        return name in self._index
+
+    def steps(self) -> List[int]:
+        return sorted({s for s in (step_of(n) for n in self.names()) if s is not None})
+
+    def record(self, name: str) -> Dict[str, Any]:
+        """Raw record {"name","step","kind","ts","data"} for a run-log artifact."""
+        return json.loads(self._raw(name))
+
+    def read(self, name: str) -> Any:
+        """Parsed artifact: dict/list for JSON artifacts, str for text, bytes for packed binary files."""
+        if name in self._index:
+            rec = self.record(name)
+            return base64.b64decode(rec["data"]) if rec["kind"] == "bytes" else rec["data"]
+        text = (self.run_dir / name).read_text(encoding="utf-8")
+        if name.endswith(".json"):
+            try:
+                return json.loads(text)
+            except ValueError:
+                pass
+        return text
+
+    def read_text(self, name: str) -> str:
+        if name not in self._index:
+            return (self.run_dir / name).read_text(encoding="utf-8")
+        rec = self.record(name)
+        if rec["kind"] == "json":
+            return json.dumps(rec["data"], ensure_ascii=False, indent=2)
+        if rec["kind"] == "bytes":
+            raise ValueError(f"{name} is a binary artifact; use read_bytes()")
+        return rec["data"]
+
+    def read_bytes(self, name: str) -> bytes:
+        if name not in self._index:
+            return (self.run_dir / name).read_bytes()
+        rec = self.record(name)
+        if rec["kind"] == "bytes":
+            return base64.b64decode(rec["data"])
+        return self.read_text(name).encode("utf-8")
+
+    def read_json(self, name: str) -> Any:
+        if name not in self._index:
+            return json.loads((self.run_dir / name).read_text(encoding="utf-8"))
+        rec = self.record(name)
+        return rec["data"] if rec["kind"] == "json" else json.loads(rec["data"])
+
+    def step_artifacts(self, step: int) -> Dict[str, Any]:
+        names = list(self._steps.get(step, []))
+        names += [n for n in self._files() if step_of(n) == step and n not in self._index]
+        return {n: self.read(n) for n in self._in_offset_order(names)}
+
+    def materialize(self, out_dir: Optional[Path] = None) -> Path:
+        """Write the old per-file view (one file per artifact) for debugging."""
+        out = Path(out_dir) if out_dir is not None else self.run_dir / "materialized"
+        out.mkdir(parents=True, exist_ok=True)
+        for name in self._in_offset_order(self.names()):
+            if name in self._index or out != self.run_dir:
+                (out / name).write_bytes(self.read_bytes(name))
+        return out
+
+
+def _file_record(p: Path, binary: bool = False) -> Optional[Tuple[str, Any]]:
+    """Plain file -> (kind, data) for the log; binary files give None unless binary=True."""
+    try:
+        text = p.read_text(encoding="utf-8")
+    except UnicodeDecodeError:
+        if not binary:
+            return None
+        return "bytes", base64.b64encode(p.read_bytes()).decode("ascii")
+    if p.suffix == ".json":
+        try:
+            return "json", json.loads(text)
+        except ValueError:
+            pass
+    return "text", text
+
+
+def convert_run_dir(run_dir: Path, remove_files: bool = True) -> int:
+    """
+    Pack a legacy per-file run directory into run.jsonl/run.idx. Returns artifacts converted.
+    *.json files that parse are stored as JSON records, everything else as text.
+    """
+    run_dir = Path(run_dir)
+    if (run_dir / SEGMENT_NAME).exists() or RunLogReader(run_dir).packed is not None:
+        return 0
+    files = sorted(p for p in run_dir.iterdir() if p.is_file())
+    writer = RunLogWriter(run_dir, keep_open=True)
+    try:
+        for p in files:
+            rec = _file_record(p)
+            if rec is not None:  # binary artifact (e.g. plot.png): leave it as a file
+                writer.append(p.name, *rec)
+        writer.sync()
+    finally:
+        writer.close()
+
+    n = 0
+    reader = RunLogReader(run_dir)
+    for p in files:
+        if reader.in_log(p.name):
+            n += 1
+            if remove_files:
+                p.unlink()
+    return n
+
+
+def dir_bytes(run_dir: Path) -> int:
+    return sum(p.stat().st_size for p in Path(run_dir).iterdir() if p.is_file())
+
+
+def _fsync_write(path: Path, write) -> None:
+    with open(path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _record_line(run_dir: Path, name: str) -> bytes:
+    kind, data = _file_record(run_dir / name, binary=True)
+    rec = {"name": name, "step": step_of(name), "kind": kind, "ts": (run_dir / name).stat().st_mtime, "data": data}
+    return json.dumps(rec, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _index_lines(lines: List[bytes], off: int = 0) -> bytes:
+    idx = []
+    for line in lines:
+        name = json.loads(line)["name"]
+        step = step_of(name)
+        idx.append(f"{off}\t{len(line)}\t{'' if step is None else step}\t{name}\n".encode("utf-8"))
+        off += len(line)
+    return b"".join(idx)
+
+
+def _unpacked_size(packed: Path) -> int:
+    n = 0
+    with _OPENERS[packed.name](packed, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            n += len(chunk)
+    return n
+
+
+def pack_run_dir(run_dir: Path, codec: str = "gzip") -> Tuple[int, int]:
+    """
+    Compact and compress a finished run into a single archive (+ its small index).
+    Returns (bytes before, bytes after). Safe to re-run after a crash at any point.
+
+    Commit point is the rename of the archive; the old segment/index/plain files are removed after it.
+    A run packed before gets its later records (a leftover run.jsonl, new plain files) appended to
+    the archive as one more gzip member / xz stream: earlier offsets stay valid, so the old index
+    is still right for the new archive until the extended one replaces it.
+    """
+    if codec not in PACKED_NAMES:
+        raise ValueError(f"codec must be one of {tuple(PACKED_NAMES)}, got {codec!r}")
+    run_dir = Path(run_dir)
+    before = dir_bytes(run_dir)
+    reader = RunLogReader(run_dir)
+    seg_bytes = reader._seg_path.stat().st_size if reader._seg_path.exists() else 0
+    loose = sorted(set(reader._files()) - set(reader._index))
+    if reader.packed is None or reader.has_segment or loose:
+        packed = reader.packed or run_dir / PACKED_NAMES[codec]
+        # latest record per name not in the archive yet, in write order, then plain files
+        # (binary ones base64-encoded)
+        new = sorted((n for n, (_, _, in_archive) in reader._index.items() if not in_archive),
+                     key=lambda n: reader._index[n][0])
+        lines = [reader._raw(n) for n in new] + [_record_line(run_dir, n) for n in loose]
+
+        idx_path, tmp = run_dir / (packed.name + ".idx"), run_dir / (packed.name + ".tmp")
+        idx_tmp = run_dir / (packed.name + ".idx.tmp")
+        if reader.packed is None:
+            _fsync_write(idx_tmp, lambda f: f.write(_index_lines(lines)))
+            os.replace(idx_tmp, idx_path)
+            tmp.unlink(missing_ok=True)  # a crashed earlier attempt: "ab" below must start empty
+        else:
+            # offsets continue after everything already in the archive (indexed or not)
+            old_idx = idx_path.read_bytes() if idx_path.exists() else b""
+            _fsync_write(idx_tmp, lambda f: f.write(old_idx + _index_lines(lines, _unpacked_size(packed))))
+            shutil.copyfile(packed, tmp)
+        with _OPENERS[packed.name](tmp, "ab") as f:
+            f.writelines(lines)
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, packed)  # commit
+        if idx_tmp.exists():
+            os.replace(idx_tmp, idx_path)
+        reader = RunLogReader(run_dir)
+
+    # drop everything the archive now holds; a segment that grew since it was read stays (merged by readers)
+    grew = reader._seg_path.exists() and reader._seg_path.stat().st_size != seg_bytes
+    for p in run_dir.iterdir():
+        if not p.is_file() or p == reader.packed or p.name == reader.packed.name + ".idx":
+            continue
+        if p.name in (SEGMENT_NAME, INDEX_NAME):
+            if not grew:
+                p.unlink()
+        elif p.name.endswith(".tmp") or reader.in_log(p.name):
+            p.unlink()
+    return before, dir_bytes(run_dir)
+
+
+def convert_runs(root: str = "runs", remove_files: bool = True) -> Dict[str, int]:
+    from .run_ids import iter_run_dirs
+
+    out = {}
+    for run_dir in iter_run_dirs(root):
+        out[run_dir.name] = convert_run_dir(run_dir, remove_files=remove_files)
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Convert per-file run directories to the run-log format.")
+    ap.add_argument("root", nargs="?", default="runs")
+    ap.add_argument("--keep-files", action="store_true", help="keep the original per-file artifacts")
+    args = ap.parse_args()
+    res = convert_runs(args.root, remove_files=not args.keep_files)
+    print(json.dumps({"runs": len(res), "artifacts": sum(res.values())}, ensure_ascii=False))
@@ -1,39 +1,387 @@
 import json
+import os
+import queue
+import threading
 import time
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from ..llm import usage
+from . import tracing
+from .run_catalog import RunCatalog, RunRecord, status_from_final
+from .run_ids import new_run_id, run_dir_for
+from .run_log import RunLogReader, RunLogWriter, step_of
+
+FSYNC_POLICIES = ("close", "batch", "always")
+LAYOUTS = ("log", "files")
 
 @dataclass
 class RunContext:
     run_id: str
     run_dir: Path
+    started_at: float = 0.0
+    steps: int = 0  # highest step_XX_ artifact saved so far
+    finished: bool = False
+    usage_at_start: Dict[str, int] = field(default_factory=dict)
+    tracer: Optional[tracing.Tracer] = None
+    traced_events: int = -1  # events already exported to trace.json
+    trace_token: Any = field(default=None, repr=False)  # tracing.activate() token, reset by finish()
+
+
+class _BackgroundWriter:
+    """
+    Single writer thread fed by a bounded queue.
+
+    - producers block only when the queue is full (backpressure instead of unbounded memory)
+    - items are drained in batches; repeated writes to the same path inside a batch are coalesced
+    - run-log appends ("log" items) are applied in submission order through one open writer per run
+    - JSON serialization happens on the writer thread, off the agent loop
+    - fsync policy: "close" (only on flush/close), "batch" (after every batch), "always" (every write)
+    """
+
+    def __init__(self, queue_size: int = 256, batch_size: int = 64, fsync: str = "close"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.fsync = fsync
+        self.batch_size = batch_size
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._dirty: set = set()  # paths written but not fsynced yet
+        self._logs: Dict[Path, RunLogWriter] = {}  # open run logs (writer thread only)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="run-writer", daemon=True)
+        self._thread.start()
+
+    # ---- producer side ----
+    def submit(self, path: Path, kind: str, payload: Any) -> None:
+        if self._closed:
+            raise RuntimeError("RunManager writer is closed")
+        self._raise_pending()
+        self._q.put((path, kind, payload))
+
+    def flush(self, durable: bool = True) -> None:
+        if self._closed or not self._thread.is_alive():
+            # close() already flushed durably; nothing could be queued since (submit() raises)
+            self._raise_pending()
+            return
+        done = threading.Event()
+        self._q.put(("__flush__", durable, done))
+        done.wait()
+        self._raise_pending()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush(durable=True)
+        self._closed = True
+        self._q.put(None)
+        self._thread.join()
+
+    def _raise_pending(self) -> None:
+        if self._error is not None:
+            err, self._error = self._error, None
+            raise RuntimeError(f"background artifact write failed: {err!r}") from err
+
+    # ---- writer thread ----
+    def _loop(self) -> None:
+        while True:
+            item = self._q.get()
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._process(batch):
+                return
+
+    def _process(self, batch: List[Any]) -> bool:
+        pending: Dict[Path, Tuple[str, Any]] = {}
+        for item in batch:
+            if item is None:
+                self._write_all(pending)
+                return False
+            if item[0] == "__flush__":
+                _, durable, done = item
+                self._write_all(pending)
+                pending = {}
+                if durable:
+                    self._sync_dirty()
+                else:
+                    self._release_logs()
+                done.set()
+                continue
+            path, kind, payload = item
+            if kind == "log":
+                self._append_log(path, payload)
+                continue
+            pending.pop(path, None)  # keep insertion order of the latest write
+            pending[path] = (kind, payload)
+        self._write_all(pending)
+        if self.fsync == "batch":
+            self._sync_dirty()
+        return True
+
+    def _append_log(self, run_dir: Path, payload: Tuple[str, str, Any]) -> None:
+        try:
+            log = self._logs.get(run_dir)
+            if log is None:
+                log = self._logs[run_dir] = RunLogWriter(run_dir, keep_open=True)
+            log.append(*payload)
+            if self.fsync == "always":
+                log.sync()
+        except BaseException as e:
+            if self._error is None:
+                self._error = e
+
+    def _write_all(self, pending: Dict[Path, Tuple[str, Any]]) -> None:
+        for path, (kind, payload) in pending.items():
+            self._write_one(path, kind, payload)
+
+    def _write_one(self, path: Path, kind: str, payload: Any) -> None:
+        try:
+            if kind == "json":
+                payload = json.dumps(payload, ensure_ascii=False, indent=2)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(payload)
+                if self.fsync == "always":
+                    f.flush()
+                    os.fsync(f.fileno())
+                    return
+            self._dirty.add(path)
+        except BaseException as e:  # surfaced to the producer on the next submit/flush
+            if self._error is None:
+                self._error = e
+
+    def _release_logs(self) -> None:
+        # close run-log handles so appends are visible to other processes (retention packing a
+        # finished run must not race an open handle); their fsync is left to the next durable flush
+        for log in self._logs.values():
+            self._dirty.update(log.paths)
+            try:
+                log.close()
+            except OSError as e:
+                if self._error is None:
+                    self._error = e
+        self._logs.clear()
+
+    def _sync_dirty(self) -> None:
+        dirs = set()
+        for path in self._dirty:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                dirs.add(path.parent)
+            except FileNotFoundError:
+                pass  # a released run log that retention has packed since
+            except OSError as e:
+                if self._error is None:
+                    self._error = e
+        for d in dirs:
+            try:
+                fd = os.open(d, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass  # directory fsync is not supported everywhere
+        self._dirty.clear()
+
+        # run logs: fsync and release the handles; the next append reopens at the end offset
+        for log in self._logs.values():
+            try:
+                log.sync()
+            except OSError as e:
+                if self._error is None:
+                    self._error = e
+            log.close()
+        self._logs.clear()
+
 
 class RunManager:
-    def __init__(self, root: str = "runs"):
+    """
+    Creates run directories and persists run artifacts.
+
+    layout="log" (default) appends every artifact to one run.jsonl segment per run (see
+    runtime/run_log.py); layout="files" keeps the legacy one-file-per-artifact view. Both are
+    read back through reader().
+
+    catalog=True records every run in <root>/catalog.db (runtime/run_catalog.py) when it starts
+    and when it finishes. finish() is called explicitly or implicitly by saving final.txt.
+    Runs still open at close() (or when the context manager exits, e.g. on an exception) get an
+    "ABORTED: <reason>" final.txt and finish as failed, so none stay "running" in the catalog.
+
+    async_writes=True moves artifact writes to a background thread so loop latency does not
+    depend on disk latency. Objects passed to save_json are serialized later on that thread,
+    so callers must not mutate them after saving. Use flush() (or the context manager) to make
+    everything durable at the end of a run.
+
+    trace=True (default: AGENT_TRACE=1 in the environment) activates a tracer per run (see
+    runtime/tracing.py) from start() until finish() and saves its spans as trace.json when the
+    run finishes and again on close() (spans opened before finish() end there). The tracer
+    follows the starting context: worker threads need tracing.propagate() / copy_context().
+    """
+
+    def __init__(
+        self,
+        root: str = "runs",
+        async_writes: bool = False,
+        queue_size: int = 256,
+        batch_size: int = 64,
+        fsync: str = "close",
+        layout: str = "log",
+        catalog: bool = True,
+        trace: Optional[bool] = None,
+    ):
+        if layout not in LAYOUTS:
+            raise ValueError(f"layout must be one of {LAYOUTS}, got {layout!r}")
+        self.layout = layout
         self.root = Path(root)
         self.root.mkdir(parents=True, exist_ok=True)
+        self._writer = _BackgroundWriter(queue_size, batch_size, fsync) if async_writes else None
+        self.catalog = RunCatalog(str(self.root / "catalog.db")) if catalog else None
+        self.trace = tracing.enabled_by_env() if trace is None else trace
+        self._traced: List[RunContext] = []
+        self._open: Dict[str, RunContext] = {}  # started, not finished yet
 
-    def start(self, tag: str = "run") -> RunContext:
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        run_id = f"{ts}_{tag}"
-        run_dir = self.root / run_id
+    def start(self, tag: str = "run", task_id: Optional[str] = None, strategy: Optional[str] = None) -> RunContext:
+        # ULID-style IDs: unique across concurrent workers, sortable by start time
+        run_id = new_run_id(tag)
+        run_dir = run_dir_for(self.root, run_id)
         run_dir.mkdir(parents=True, exist_ok=False)
-        return RunContext(run_id=run_id, run_dir=run_dir)
+        ctx = RunContext(run_id=run_id, run_dir=run_dir, started_at=time.time(), usage_at_start=usage.snapshot())
+        self._open[run_id] = ctx
+        if self.trace:
+            ctx.tracer = tracing.Tracer(run_id)
+            ctx.trace_token = tracing.activate(ctx.tracer)
+            self._traced.append(ctx)
+        if self.catalog is not None:
+            self.catalog.start_run(RunRecord(
+                run_id=run_id, tag=tag, task_id=task_id, strategy=strategy, status="running",
+                run_dir=str(run_dir), started_at=ctx.started_at,
+            ))
+        return ctx
+
+    def finish(self, ctx: RunContext, status: str, steps: Optional[int] = None) -> None:
+        """Mark the run finished in the catalog (status: done/failed). Idempotent per run."""
+        if ctx.finished:
+            return
+        ctx.finished = True
+        self._open.pop(ctx.run_id, None)
+        self._export_trace(ctx)
+        self._deactivate(ctx)
+        if self.catalog is None:
+            return
+        if self._writer is not None:
+            # a finished row may be packed by retention: its queued artifacts must be on disk first
+            self._writer.flush(durable=False)
+        used = usage.delta(ctx.usage_at_start)
+        self.catalog.finish_run(
+            ctx.run_id,
+            status,
+            steps=ctx.steps if steps is None else steps,
+            prompt_tokens=used["prompt_tokens"],
+            completion_tokens=used["completion_tokens"],
+        )
+
+    def _deactivate(self, ctx: RunContext) -> None:
+        # the tracer is scoped to start() .. finish(): later spans must not land in a finished run
+        if ctx.tracer is not None:
+            tracing.deactivate(ctx.tracer, ctx.trace_token)
+            ctx.trace_token = None
+
+    def _export_trace(self, ctx: RunContext) -> None:
+        if ctx.tracer is None or len(ctx.tracer.events) == ctx.traced_events:
+            return
+        ctx.traced_events = len(ctx.tracer.events)
+        self._write(ctx, "trace.json", "json", ctx.tracer.to_chrome())
+
+    def _save(self, ctx: RunContext, name: str, kind: str, data: Any) -> None:
+        with tracing.span("save", cat="io", artifact=name):
+            self._save_inner(ctx, name, kind, data)
+
+    def _save_inner(self, ctx: RunContext, name: str, kind: str, data: Any) -> None:
+        step = step_of(name)
+        if step is not None and step > ctx.steps:
+            ctx.steps = step
+        self._write(ctx, name, kind, data)
+        if name == "final.txt" and kind == "text":
+            self.finish(ctx, status_from_final(data))
+
+    def _write(self, ctx: RunContext, name: str, kind: str, data: Any) -> None:
+        if self.layout == "log":
+            if self._writer is not None:
+                self._writer.submit(ctx.run_dir, "log", (name, kind, data))
+            else:
+                RunLogWriter(ctx.run_dir).append(name, kind, data)
+            return
+        if self._writer is not None:
+            self._writer.submit(ctx.run_dir / name, kind, data)
+            return
+        if kind == "json":
+            data = json.dumps(data, ensure_ascii=False, indent=2)
+        (ctx.run_dir / name).write_text(data, encoding="utf-8")
 
     def save_text(self, ctx: RunContext, name: str, text: str) -> None:
-        (ctx.run_dir / name).write_text(text, encoding="utf-8")
+        self._save(ctx, name, "text", text)
 
     def save_json(self, ctx: RunContext, name: str, obj: Any) -> None:
-        (ctx.run_dir / name).write_text(
-            json.dumps(obj, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
+        self._save(ctx, name, "json", obj)
 
     def save_error(self, ctx: RunContext, err: str) -> None:
-        p = ctx.run_dir / "errors.log"
-        p.write_text(err + "\n", encoding="utf-8")
+        self._save(ctx, "errors.log", "text", err + "\n")
+
+    def reader(self, run: Union[RunContext, str, Path]) -> RunLogReader:
+        """
+        Read a run back regardless of layout. Accepts a RunContext, a run_id under root,
+        or a run directory path.
+        """
+        if isinstance(run, RunContext):
+            return RunLogReader(run.run_dir)
+        p = Path(run)
+        return RunLogReader(p if p.is_dir() else run_dir_for(self.root, str(run)))
+
+    def flush(self) -> None:
+        """Block until every queued artifact is written and fsynced (no-op in sync mode)."""
+        if self._writer is not None:
+            self._writer.flush(durable=True)
+
+    def abort(self, ctx: RunContext, reason: str = "run ended without final.txt") -> None:
+        """Save "ABORTED: <reason>" as final.txt (finishing the run as failed) unless it already finished."""
+        if ctx.finished:
+            return
+        try:
+            self.save_text(ctx, "final.txt", f"ABORTED: {reason}")
+        finally:
+            self.finish(ctx, "failed")  # no-op when final.txt was saved; covers a failed write
+
+    def close(self, reason: Optional[str] = None) -> None:
+        failed: Optional[BaseException] = None
+        for ctx in list(self._open.values()):
+            try:
+                self.abort(ctx, reason or "run manager closed before final.txt")
+            except Exception as e:  # keep closing the other runs and the writer; raised below
+                failed = failed or e
+        # re-export traces that gained spans after finish() (the loop unwinding past final.txt)
+        for ctx in self._traced:
+            self._export_trace(ctx)
+            self._deactivate(ctx)
+        self._traced = []
+        if self._writer is not None:
+            self._writer.close()
+        if failed is not None:
+            raise failed
+
+    def __enter__(self) -> "RunManager":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(f"{exc_type.__name__}: {exc}" if exc_type is not None else None)
 
 class Timer:
     def __enter__(self):
@@ -0,0 +1,203 @@
+"""
+Step-level tracing: context-manager spans exported as Chrome/Perfetto trace-event JSON.
+
+    with tracing.span("tool", tool=call.name) as sp:
+        ...
+        sp.set(ok=result.ok)
+
+Spans go to the tracer active in the current context (RunManager activates one per run when
+tracing is on, from start() until finish(), and saves it as the run artifact trace.json).
+With no active tracer, span() returns a shared no-op object: the disabled cost is one
+ContextVar lookup per call.
+
+The active tracer is a ContextVar, so threads do not inherit it. Submit work to a pool as
+pool.map(tracing.propagate(fn), items) (or through contextvars.copy_context().run) for the
+worker's spans to land in the caller's trace.
+
+Open the result in chrome://tracing or https://ui.perfetto.dev; extract it from a run with
+    python -m src.agent_core.runtime.tracing <run_dir> -o trace.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+_current: ContextVar[Optional["Tracer"]] = ContextVar("agent_tracer", default=None)
+
+
+def enabled_by_env() -> bool:
+    return os.environ.get("AGENT_TRACE", "").lower() in ("1", "true", "yes")
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def set(self, **attrs: Any) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "cat", "args", "t0", "tid")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.t0 = 0
+        self.tid = 0
+
+    def __enter__(self) -> "Span":
+        self.tid = threading.get_ident()
+        self.t0 = time.perf_counter_ns()
+        self.tracer._open[id(self)] = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._open.pop(id(self), None)
+        self.tracer._emit(self, time.perf_counter_ns())
+
+    def set(self, **attrs: Any) -> None:
+        self.args.update(attrs)
+
+
+class Tracer:
+    """Collects complete ("X") events for one run. Thread-safe for appends."""
+
+    def __init__(self, name: str = "run"):
+        self.name = name
+        self.pid = os.getpid()
+        self.events: List[Dict[str, Any]] = []
+        self._open: Dict[int, Span] = {}
+        self._threads: Dict[int, str] = {}
+
+    def _emit(self, sp: Span, t1: int, still_open: bool = False) -> Dict[str, Any]:
+        ev = {
+            "name": sp.name,
+            "cat": sp.cat,
+            "ph": "X",
+            "ts": sp.t0 / 1000.0,
+            "dur": (t1 - sp.t0) / 1000.0,
+            "pid": self.pid,
+            "tid": sp.tid,
+            "args": _jsonable(sp.args),
+        }
+        if still_open:
+            ev["args"]["open"] = True
+            return ev
+        if sp.tid not in self._threads:
+            self._threads[sp.tid] = threading.current_thread().name
+        self.events.append(ev)  # list.append is atomic under the GIL
+        return ev
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Trace-event JSON; spans still open (export before the loop unwinds) end at export time."""
+        now = time.perf_counter_ns()
+        events = list(self.events) + [self._emit(sp, now, still_open=True) for sp in list(self._open.values())]
+        meta = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": self.name}}]
+        meta += [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": tname}}
+            for tid, tname in self._threads.items()
+        ]
+        return {"traceEvents": meta + events, "displayTimeUnit": "ms"}
+
+
+def _jsonable(args: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for k, v in args.items():
+        out[k] = v if isinstance(v, (str, int, float, bool)) or v is None else repr(v)[:200]
+    return out
+
+
+# ---- public API ----
+def span(name: str, cat: str = "agent", **attrs: Any):
+    tracer = _current.get()
+    if tracer is None:
+        return _NOOP
+    return Span(tracer, name, cat, attrs)
+
+
+def steps(it: Iterable[int], name: str = "step") -> Iterator[int]:
+    """
+    for step in tracing.steps(range(1, MAX_STEPS + 1)): ...
+    One span per loop iteration; it closes when the next iteration starts or the loop exits.
+    """
+    for i in it:
+        with span(name, cat="loop", step=i):
+            yield i
+
+
+def current() -> Optional[Tracer]:
+    return _current.get()
+
+
+def activate(tracer: Optional[Tracer]) -> Token:
+    """Make `tracer` current; pass the returned token to deactivate() to restore the previous one."""
+    return _current.set(tracer)
+
+
+def deactivate(tracer: Tracer, token: Optional[Token] = None) -> None:
+    if _current.get() is not tracer:
+        return
+    try:
+        if token is not None:
+            _current.reset(token)
+            return
+    except ValueError:  # token from another context (e.g. finish() on a different thread)
+        pass
+    _current.set(None)
+
+
+@contextmanager
+def activated(tracer: Optional[Tracer]) -> Iterator[Optional[Tracer]]:
+    """Spans inside the block go to `tracer`; the previous tracer is restored on exit."""
+    token = _current.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current.reset(token)
+
+
+def propagate(fn: Callable[..., T]) -> Callable[..., T]:
+    """fn bound to the caller's current tracer, for running on worker threads."""
+    tracer = _current.get()
+    if tracer is None:
+        return fn
+
+    def run(*args: Any, **kwargs: Any) -> T:
+        with activated(tracer):
+            return fn(*args, **kwargs)
+
+    return run
+
+
+if __name__ == "__main__":
+    from .run_log import RunLogReader
+
+    ap = argparse.ArgumentParser(description="Extract a run's trace.json for chrome://tracing / Perfetto.")
+    ap.add_argument("run_dir")
+    ap.add_argument("-o", "--out", default="trace.json")
+    args = ap.parse_args()
+    Path(args.out).write_text(json.dumps(RunLogReader(Path(args.run_dir)).read_json("trace.json")), encoding="utf-8")
+    print(args.out)
@@ -1,12 +1,19 @@
 from pathlib import Path
 import re
 
+from ..verify.artifact_checks import check_image_size
+
 def require_file(path: str) -> tuple[bool, str]:
     p = Path(path)
     if p.exists() and p.is_file() and p.stat().st_size > 0:
         return True, f"OK: file exists: {path} (size={p.stat().st_size} bytes)"
     return False, f"FAIL: file not found or empty: {path}"
 
+def require_image(path: str, min_width: int = 1, min_height: int = 1) -> tuple[bool, str]:
+    # header-only: reads the PNG/JPEG size without decoding the image
+    ok, msg = check_image_size(path, min_width, min_height)
+    return ok, msg if ok else f"FAIL: {msg}"
+
 def mean_output_ok(stdout: str) -> tuple[bool, str]:
     if stdout is None:
         return False, "FAIL: no stdout"
@@ -0,0 +1,165 @@
+"""
+Isolated scratch directories for trying tool calls side by side (search/beam.py).
+
+    ws = Workspace.fork(".", include=spec.required_files)
+    result = execute_tool(call, cwd=str(ws.root), timeout=30)
+    ws.promote(".")      # keep what this candidate wrote
+    ws.cleanup()
+
+- fork() copies the regular files at the top of `base` (no subdirectories, none larger than
+  MAX_COPY_BYTES) plus any `include` paths, so each candidate sees the task's current files
+  and writes only to its own copy
+- promote() copies back files the candidate created or changed (by size / mtime)
+- child() forks a workspace from another one (whole tree): changes accumulate along a chain
+  of children and promote() still compares against, and writes to, the original directory
+- tools run their subprocesses through run_process(): the process group is killed on timeout
+  or when the calling thread's cancel event (cancel_scope()) is set, so a racing evaluator can
+  stop the losers instead of waiting for them
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+MAX_COPY_BYTES = 64 << 20
+POLL_S = 0.05  # how often a running subprocess checks for cancellation
+
+_CANCEL: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar("tool_cancel", default=None)
+
+
+class Cancelled(RuntimeError):
+    """A tool subprocess was killed because its cancel event was set."""
+
+
+@contextmanager
+def cancel_scope(event: threading.Event) -> Iterator[threading.Event]:
+    """Tool subprocesses started inside this block are killed once `event` is set."""
+    token = _CANCEL.set(event)
+    try:
+        yield event
+    finally:
+        _CANCEL.reset(token)
+
+
+def _kill(proc: subprocess.Popen) -> None:
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        proc.kill()
+
+
+def run_process(
+    cmd: Union[str, Sequence[str]],
+    shell: bool = False,
+    cwd: Optional[str] = None,
+    timeout: float = 30,
+) -> subprocess.CompletedProcess:
+    """
+    subprocess.run(capture_output=True, text=True) that also honours cancel_scope().
+    Raises subprocess.TimeoutExpired or Cancelled; the whole process group is killed either way.
+    """
+    cancel = _CANCEL.get()
+    proc = subprocess.Popen(
+        cmd, shell=shell, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        start_new_session=os.name == "posix",
+    )
+    if cancel is None:
+        try:
+            out, err = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _kill(proc)
+            proc.communicate()
+            raise
+        return subprocess.CompletedProcess(cmd, proc.returncode, out, err)
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            out, err = proc.communicate(timeout=max(0.001, min(POLL_S, deadline - time.monotonic())))
+            return subprocess.CompletedProcess(cmd, proc.returncode, out, err)
+        except subprocess.TimeoutExpired:
+            if cancel.is_set():
+                _kill(proc)
+                proc.communicate()
+                raise Cancelled(f"cancelled: {cmd}")
+            if time.monotonic() >= deadline:
+                _kill(proc)
+                proc.communicate()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+
+
+# ---- workspaces ----
+def _stamp(p: Path) -> Tuple[int, int]:
+    st = p.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+@dataclass
+class Workspace:
+    root: Path
+    base: Optional[Path] = None
+    _snapshot: Dict[str, Tuple[int, int]] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def fork(cls, base: str = ".", include: Iterable[str] = (), prefix: str = "ws_") -> "Workspace":
+        base_p = Path(base).resolve()
+        ws = cls(Path(tempfile.mkdtemp(prefix=prefix)), base_p)
+        paths: List[Path] = [p for p in base_p.iterdir() if p.is_file() and not p.name.startswith(".")]
+        for rel in include:
+            p = base_p / rel
+            if p.exists() and p not in paths:
+                paths.append(p)
+        for src in paths:
+            rel = src.relative_to(base_p)
+            dst = ws.root / rel
+            if src.is_dir():
+                shutil.copytree(src, dst, dirs_exist_ok=True)
+            elif src.stat().st_size <= MAX_COPY_BYTES:
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(src, dst)
+        ws._snapshot = {str(p.relative_to(ws.root)): _stamp(p) for p in ws.files()}
+        return ws
+
+    def child(self, prefix: str = "ws_") -> "Workspace":
+        """A copy of this workspace's whole tree that keeps its base and fork-time snapshot."""
+        ws = Workspace(Path(tempfile.mkdtemp(prefix=prefix)), self.base, dict(self._snapshot))
+        shutil.copytree(self.root, ws.root, dirs_exist_ok=True)  # copy2: unchanged files keep their stamps
+        return ws
+
+    def files(self) -> Iterator[Path]:
+        for p in self.root.rglob("*"):
+            if p.is_file():
+                yield p
+
+    def changed(self) -> List[str]:
+        """Relative paths created or modified since fork()."""
+        return sorted(
+            rel for rel, p in ((str(p.relative_to(self.root)), p) for p in self.files())
+            if self._snapshot.get(rel) != _stamp(p)
+        )
+
+    def promote(self, dst: Optional[str] = None) -> List[str]:
+        """Copy changed files into `dst` (default: the directory forked from). Returns them."""
+        target = Path(dst) if dst is not None else self.base
+        if target is None:
+            raise ValueError("promote() needs a destination for a workspace not made by fork()")
+        changed = self.changed()
+        for rel in changed:
+            out = target / rel
+            out.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(self.root / rel, out)
+        return changed
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -10,4 +10,5 @@ class ToolResult(BaseModel):
     ok: bool
     output: str
     error: Optional[str] = None
+    duration_s: Optional[float] = None
 
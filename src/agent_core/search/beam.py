@@ -1,17 +1,30 @@
 # src/agent_core/search/beam.py
 from __future__ import annotations
 
+import contextvars
 import json
 import logging
 import re
-from dataclasses import dataclass
-from typing import Any, Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
 
-from ..llm.client import LLMClient
 from ..llm.normalize import normalize_toolcall_obj, ALLOWED
+from ..runtime import metrics, tracing
+from ..runtime.executor import execute_tool
+from ..runtime.workspace import Workspace, cancel_scope
+from ..schemas.tool import ToolCall, ToolResult
+from ..specs.task_spec import TaskSpec
+from ..verify.verifier import verify
+from .prescore import rank_candidates
+from .transposition import TranspositionTable, file_stamps, state_hash
 
 log = logging.getLogger(__name__)
 
+TIMED_TOOLS = ("shell_exec", "python_exec")  # evaluate_candidates' timeout; pip_install keeps its own
+
 # ----------------------------------------------------------------------
 # ①  Prompt – ask for *strict* JSON again (helps for the repair step)
 # ----------------------------------------------------------------------
@@ -131,6 +144,8 @@ def _repair_with_llm(broken_raw: str) -> List[Dict[str, Any]]:
     Sends the broken output back to the LLM with a short “please fix the JSON”
     instruction and tries to parse the reply.
     """
+    from ..llm.client import LLMClient  # lazy: needs model settings
+
     client = LLMClient()
     repair_prompt = (
         "The previous response was not valid JSON. "
@@ -161,6 +176,8 @@ def _repair_with_llm(broken_raw: str) -> List[Dict[str, Any]]:
 # ⑤  Main entry – propose_candidates
 # ----------------------------------------------------------------------
 def propose_candidates(task: str, obs: str, k: int = 4) -> List[Dict[str, Any]]:
+    from ..llm.client import LLMClient  # lazy: needs model settings
+
     client = LLMClient()
     raw = client.chat(
         messages=[
@@ -207,5 +224,183 @@ def score_by_gaps(gaps: Dict[str, Any]) -> float:
     missing_files = len(gaps.get("missing_files", []) or [])
     missing_cols = len((gaps.get("csv_missing_columns", {}) or {}).keys())
     rows_needed = len((gaps.get("csv_rows_needed", {}) or {}).keys())
+    artifact_errors = len((gaps.get("artifact_errors", {}) or {}).keys())
     stdout_err = 1 if gaps.get("stdout_error") else 0
-    return -(5 * missing_files + 3 * missing_cols + 2 * rows_needed + 1 * stdout_err)
+    return -(5 * missing_files + 3 * missing_cols + 2 * rows_needed + 3 * artifact_errors + 1 * stdout_err)
+
+
+
+# ----------------------------------------------------------------------
+# ⑦  Parallel evaluation – run candidates side by side, first success wins
+# ----------------------------------------------------------------------
+@dataclass
+class CandidateEval:
+    index: int
+    action: Dict[str, Any]
+    status: str = "pending"  # done | skipped | duplicate | prefiltered | cancelled | error
+    cached: bool = False  # result replayed from the transposition table, nothing executed
+    duplicate_of: Optional[int] = None  # same canonical action as this earlier candidate
+    prescore: Optional[float] = None  # search/prescore.py estimate, before execution
+    reason: Optional[str] = None  # why it was not executed (prescore drop reason)
+    result: Optional[ToolResult] = None
+    verify_ok: bool = False
+    gaps: Dict[str, Any] = field(default_factory=dict)
+    hint: str = ""
+    score: float = float("-inf")
+    seconds: float = 0.0
+    workspace: Optional[Workspace] = field(default=None, repr=False)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "action": self.action,
+            "status": self.status,
+            "cached": self.cached,
+            "duplicate_of": self.duplicate_of,
+            "prescore": self.prescore,
+            "reason": self.reason,
+            "result": self.result.model_dump() if self.result is not None else None,
+            "verify_ok": self.verify_ok,
+            "gaps": self.gaps,
+            "hint": self.hint,
+            "score": self.score if self.status == "done" else None,
+            "seconds": round(self.seconds, 4),
+        }
+
+
+@dataclass
+class BeamEval:
+    evals: List[CandidateEval]
+    winner: Optional[CandidateEval] = None  # first candidate whose result passed verify
+    wall_s: float = 0.0
+    avoided: int = 0  # candidates not executed: dropped before running or replayed from the table
+
+    @property
+    def best(self) -> Optional[CandidateEval]:
+        """The winner, else the finished candidate with the best gap score (earliest on ties)."""
+        if self.winner is not None:
+            return self.winner
+        done = [e for e in self.evals if e.status == "done"]
+        return max(done, key=lambda e: (e.score, -e.index)) if done else None
+
+    def adopt(self, ev: CandidateEval, dst: Optional[str] = None) -> List[str]:
+        """Copy the files `ev` wrote in its workspace into `dst` (default: the evaluated base dir)."""
+        return ev.workspace.promote(dst) if ev.workspace is not None else []
+
+    def cleanup(self) -> None:
+        for e in self.evals:
+            if e.workspace is not None:
+                e.workspace.cleanup()
+
+
+def evaluate_candidates(
+    cands: List[Dict[str, Any]],
+    spec: TaskSpec,
+    task: Optional[str] = None,
+    allowed: Optional[Iterable[str]] = None,
+    base: str = ".",
+    concurrency: int = 4,
+    timeout: float = 30.0,
+    race: bool = True,
+    parent: Optional[Workspace] = None,
+    table: Optional[TranspositionTable] = None,
+    gaps: Optional[Dict[str, Any]] = None,
+    top_m: Optional[int] = None,
+) -> BeamEval:
+    """
+    Execute every allowed candidate in its own Workspace forked from `base` (tools run with
+    cwd=workspace; shell_exec / python_exec get `timeout` seconds each, pip_install keeps its
+    own longer default), `concurrency` at a time on a thread pool (the tools are subprocesses,
+    so threads are enough), and verify each result against its workspace.
+
+    race=True: once one candidate passes verify, the others are cancelled (their subprocesses
+    killed), so the step costs the time of the first success instead of the sum of all
+    candidates. Nothing touches `base` until the caller adopt()s a candidate; call cleanup()
+    when done. With `parent`, candidates start from parent.child() instead of a fresh fork of
+    `base` (multi-step search, search/beam_search.py).
+
+    Before anything runs, candidates are pre-scored (search/prescore.py): disallowed tools
+    ("skipped"), invalid calls and canonical duplicates ("duplicate") are dropped; with the
+    current `gaps`, actions that cannot close any of them are too, and with `top_m` only the
+    best top_m run ("prefiltered", with the reason). With `table`, a (workspace state, action) pair
+    evaluated before is replayed from it (status "done", cached=True) instead of executed.
+    Every candidate not executed is counted in metrics.EXECUTIONS_AVOIDED.
+    """
+    allowed_set = set(allowed) if allowed is not None else None
+    include = spec.workspace_files()
+    evals = [CandidateEval(i, c) for i, c in enumerate(cands)]
+    out = BeamEval(evals)
+    stop = threading.Event()
+    won = threading.Lock()
+    seed: Optional[Workspace] = None  # every candidate starts from a child of this one
+    state: Optional[str] = None
+    before: Dict[str, Any] = {}
+
+    def run(ev: CandidateEval) -> None:
+        if stop.is_set():
+            ev.status = "cancelled"
+            return
+        t0 = time.perf_counter()
+        with tracing.span("candidate", cat="search", index=ev.index, tool=ev.action.get("name")) as sp:
+            try:
+                action = ToolCall.model_validate(ev.action)
+                ev.workspace = seed.child()
+                hit = table.get(state, ev.action) if table is not None else None
+                if hit is not None:
+                    hit.apply(ev.workspace.root)
+                    ev.result, v, ev.cached = hit.result, hit.verify, True
+                else:
+                    with cancel_scope(stop):
+                        ev.result = execute_tool(action, task=task, cwd=str(ev.workspace.root),
+                                                 timeout=timeout if action.name in TIMED_TOOLS else None)
+                    v = verify(spec, ev.result, check_stdout=True, root=str(ev.workspace.root))
+                    if table is not None and not (stop.is_set() and not ev.result.ok):
+                        table.put(state, ev.action, ev.result, v, ev.workspace.root, before)
+            except Exception as e:
+                ev.status, ev.gaps = "error", {"error": repr(e)}
+                return
+            finally:
+                ev.seconds = time.perf_counter() - t0
+            if stop.is_set() and not ev.result.ok:
+                ev.status = "cancelled"  # its subprocess was killed after another candidate won
+            else:
+                ev.status, ev.verify_ok, ev.gaps, ev.hint = "done", v.ok, v.gaps, v.hint
+                ev.score = score_by_gaps(v.gaps)
+            sp.set(ok=ev.verify_ok, status=ev.status)
+            if ev.verify_ok and race:
+                with won:
+                    if out.winner is None:
+                        out.winner = ev
+                        stop.set()
+
+    ranking = rank_candidates(cands, gaps, spec, allowed=allowed_set, top_m=top_m)
+    for i, ps in ranking.scores.items():
+        evals[i].prescore = ps.score if ps.drop is None else None
+    for i, reason in ranking.dropped.items():
+        ev = evals[i]
+        ev.reason, ev.duplicate_of = reason, ranking.duplicate_of.get(i)
+        ev.status = {"disallowed": "skipped", "duplicate": "duplicate"}.get(reason, "prefiltered")
+        metrics.EXECUTIONS_AVOIDED.inc(reason=reason)
+    todo = [evals[i] for i in ranking.run]  # best first: they get the pool's first slots
+    t0 = time.perf_counter()
+    if todo:
+        seed = parent if parent is not None else Workspace.fork(base, include=include)
+        if table is not None:
+            state, before = state_hash(seed.root), file_stamps(seed.root)
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(todo)))) as pool:
+                # copy_context: candidate spans land in the caller's tracer
+                futs = [pool.submit(contextvars.copy_context().run, run, ev) for ev in todo]
+                for fut in as_completed(futs):
+                    fut.result()
+        finally:
+            if seed is not parent:
+                seed.cleanup()
+    out.wall_s = time.perf_counter() - t0
+    for ev in evals:
+        if ev.cached:
+            metrics.EXECUTIONS_AVOIDED.inc(reason="cached")
+    out.avoided = len(ranking.dropped) + sum(1 for ev in evals if ev.cached)
+    if not race:
+        out.winner = next((e for e in evals if e.verify_ok), None)
+    return out
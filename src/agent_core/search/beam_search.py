@@ -0,0 +1,279 @@
+"""
+Multi-step beam search over tool-call trajectories.
+
+    res = BeamSearch(spec, task, width=2, k=4, save=lambda n, o: rm.save_json(ctx, n, o)).run()
+    res.ok, res.path, res.llm_calls
+
+search/beam.py's greedy loop keeps one action per step. Here the top `width` partial
+trajectories survive each depth, each with its own Workspace (runtime/workspace.py) holding
+the files it has written so far:
+- expand: one propose call per beam (k candidates); the candidates are pre-scored against the
+  beam's gaps (search/prescore.py: no-ops and duplicates dropped, best top_m kept), then run in
+  parallel in children of the beam's workspace (beam.evaluate_candidates) and verified there
+- prune: children are ranked by score_fn (default: gap score minus step and token cost) and
+  the best `width` become the next beams; everything else is cleaned up
+- transpositions (search/transposition.py): a (workspace state, canonical action) pair seen
+  anywhere in the tree is replayed from the table instead of executed, and of two children
+  that reach the same workspace state only the better-ranked one is kept ("transposed")
+- stop: the first verified trajectory (its files are promoted to `base`), max_depth, or the
+  max_llm_calls budget
+Every node (action, result, gaps, score, status, parent) is kept and written through `save`
+as search_tree.json after each depth, so the run log holds the whole tree.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from ..llm import usage
+from ..runtime import tracing
+from ..runtime.workspace import Workspace
+from ..schemas.tool import ToolResult
+from ..specs.task_spec import TaskSpec
+from ..verify.verifier import verify
+from .beam import CandidateEval, evaluate_candidates, score_by_gaps
+from .transposition import TranspositionTable, state_hash
+
+WIDTH = 2
+K = 4
+MAX_DEPTH = 8
+STEP_COST = 0.5  # per action on the path: prefer short trajectories at equal gaps
+TOKEN_COST = 1e-4  # per LLM token spent on the path
+MAX_SHOWN_CHARS = 200
+
+
+@dataclass
+class Node:
+    id: int
+    parent: Optional[int]
+    depth: int
+    action: Optional[Dict[str, Any]] = None  # None for the root
+    result: Optional[ToolResult] = None
+    verify_ok: bool = False
+    gaps: Dict[str, Any] = field(default_factory=dict)
+    hint: str = ""
+    tokens: int = 0  # LLM tokens spent on the path down to this node
+    score: Optional[float] = None
+    status: str = "open"  # open | expanded | kept | pruned | prefiltered | transposed | verified | cancelled | skipped | duplicate | error
+    cached: bool = False
+    state: Optional[str] = None  # workspace state hash, for kept candidates
+    workspace: Optional[Workspace] = field(default=None, repr=False)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "parent": self.parent,
+            "depth": self.depth,
+            "action": self.action,
+            "result": self.result.model_dump() if self.result is not None else None,
+            "verify_ok": self.verify_ok,
+            "gaps": self.gaps,
+            "tokens": self.tokens,
+            "score": self.score,
+            "status": self.status,
+            "cached": self.cached,
+            "state": self.state,
+        }
+
+
+@dataclass
+class SearchResult:
+    ok: bool
+    nodes: List[Node]
+    path: List[Node]  # root excluded; the verified trajectory, else the best one reached
+    llm_calls: int = 0
+    executions: int = 0
+    cache_hits: int = 0  # candidates replayed from the transposition table
+    avoided: int = 0  # candidates not executed (pre-scoring drops + cache hits)
+    wall_s: float = 0.0
+
+    def tree(self) -> Dict[str, Any]:
+        return {
+            "ok": self.ok,
+            "path": [n.id for n in self.path],
+            "llm_calls": self.llm_calls,
+            "executions": self.executions,
+            "cache_hits": self.cache_hits,
+            "avoided": self.avoided,
+            "wall_s": round(self.wall_s, 3),
+            "nodes": [n.to_json() for n in self.nodes],
+        }
+
+
+# ---- scoring ----
+def artifacts_ok(gaps: Dict[str, Any]) -> bool:
+    return not (gaps.get("missing_files") or gaps.get("csv_missing_columns")
+                or gaps.get("csv_rows_needed") or gaps.get("artifact_errors"))
+
+
+def default_score(node: Node) -> float:
+    """Gap score (beam.score_by_gaps) minus STEP_COST per action and TOKEN_COST per token."""
+    return score_by_gaps(node.gaps) - STEP_COST * node.depth - TOKEN_COST * node.tokens
+
+
+def _clip(text: Any, n: int = MAX_SHOWN_CHARS) -> str:
+    text = "" if text is None else str(text)
+    return text if len(text) <= n else text[:n] + "..."
+
+
+def default_observe(task: str, node: Node, path: List[Node], allowed: List[str]) -> str:
+    """The day12 observation, plus the actions already taken on this trajectory."""
+    steps = [
+        f"- {n.action.get('name')} {_clip(n.action.get('args'))} -> "
+        f"{'ok' if n.result is not None and n.result.ok else 'FAILED'}: "
+        f"{_clip(n.result.output if n.result is not None and n.result.ok else (n.result.error if n.result else ''))}"
+        for n in path if n.action is not None
+    ]
+    return (
+        f"Task:\n{task}\n\n"
+        f"PHASE: {'COMPUTE' if artifacts_ok(node.gaps) else 'ARTIFACTS'}\n"
+        f"Allowed tools THIS STEP: {allowed}\n"
+        f"Hint: {node.hint or 'Start.'}\n"
+        f"GAPS: {node.gaps}\n"
+        f"Done so far:\n{chr(10).join(steps) or '- nothing'}\n\n"
+        "Return JSON tool call only.\n"
+    )
+
+
+# ---- search ----
+class BeamSearch:
+    def __init__(
+        self,
+        spec: TaskSpec,
+        task: Optional[str] = None,
+        propose_fn: Optional[Callable[[str, str, int], List[Dict[str, Any]]]] = None,
+        width: int = WIDTH,
+        k: int = K,
+        top_m: Optional[int] = None,
+        max_depth: int = MAX_DEPTH,
+        max_llm_calls: Optional[int] = None,
+        score_fn: Callable[[Node], float] = default_score,
+        allowed_fn: Optional[Callable[[Node], List[str]]] = None,
+        observe_fn: Callable[[str, Node, List[Node], List[str]], str] = default_observe,
+        base: str = ".",
+        concurrency: int = K,
+        timeout: float = 30.0,
+        save: Optional[Callable[[str, Any], None]] = None,
+        table: Optional[TranspositionTable] = None,
+    ):
+        self.spec = spec
+        self.task = task if task is not None else spec.task
+        if propose_fn is None:
+            from .beam import propose_candidates as propose_fn  # calls the LLM when used
+        self.propose_fn = propose_fn
+        self.width, self.k, self.top_m, self.max_depth, self.max_llm_calls = width, k, top_m, max_depth, max_llm_calls
+        self.score_fn, self.observe_fn = score_fn, observe_fn
+        self.allowed_fn = allowed_fn or (lambda node: list(spec.allowed_tools))
+        self.base, self.concurrency, self.timeout, self.save = base, concurrency, timeout, save
+        self.table = table if table is not None else TranspositionTable()
+        self.nodes: List[Node] = []
+
+    def _node(self, **kw: Any) -> Node:
+        node = Node(id=len(self.nodes), **kw)
+        self.nodes.append(node)
+        return node
+
+    def path(self, node: Node) -> List[Node]:
+        out = []
+        while node.parent is not None:
+            out.append(node)
+            node = self.nodes[node.parent]
+        return out[::-1]
+
+    def _child(self, parent: Node, ev: CandidateEval, tokens: int) -> Node:
+        node = self._node(parent=parent.id, depth=parent.depth + 1, action=ev.action, result=ev.result,
+                          verify_ok=ev.verify_ok, gaps=ev.gaps, hint=ev.hint, tokens=parent.tokens + tokens,
+                          cached=ev.cached, workspace=ev.workspace)
+        if ev.status == "done":
+            node.score = self.score_fn(node)
+        node.status = "verified" if ev.verify_ok else ("open" if ev.status == "done" else ev.status)
+        return node
+
+    def _expand(self, beam: Node, res: SearchResult) -> List[Node]:
+        allowed = self.allowed_fn(beam)
+        obs = self.observe_fn(self.task, beam, self.path(beam), allowed)
+        before = usage.snapshot()
+        with tracing.span("propose", cat="llm", k=self.k, depth=beam.depth):
+            cands = self.propose_fn(self.task, obs, self.k)
+        spent = usage.delta(before)
+        tokens = spent["prompt_tokens"] + spent["completion_tokens"]
+        ev = evaluate_candidates(cands, self.spec, task=self.task, allowed=allowed, base=self.base,
+                                 concurrency=self.concurrency, timeout=self.timeout, parent=beam.workspace,
+                                 table=self.table, gaps=beam.gaps, top_m=self.top_m)
+        res.avoided += ev.avoided
+        beam.status = "expanded"
+        return [self._child(beam, e, tokens) for e in ev.evals]
+
+    def _snapshot(self, res: SearchResult, t0: float) -> None:
+        res.wall_s = time.perf_counter() - t0
+        if self.save is not None:
+            self.save("search_tree.json", res.tree())
+
+    def run(self, adopt: bool = True) -> SearchResult:
+        """Search until a trajectory verifies; with adopt, its files are promoted into `base`."""
+        t0 = time.perf_counter()
+        root = self._node(parent=None, depth=0, workspace=Workspace.fork(
+            self.base, include=self.spec.workspace_files()))
+        v = verify(self.spec, None, check_stdout=False, root=str(root.workspace.root))
+        root.gaps, root.hint, root.status = v.gaps, v.hint, "kept"
+        root.state = state_hash(root.workspace.root)
+        res = SearchResult(ok=False, nodes=self.nodes, path=[])
+        beams, winner = [root], None
+        try:
+            for depth in range(1, self.max_depth + 1):
+                children: List[Node] = []
+                with tracing.span("beam_depth", cat="search", depth=depth, beams=len(beams)):
+                    for beam in beams:
+                        if self.max_llm_calls is not None and res.llm_calls >= self.max_llm_calls:
+                            break
+                        kids = self._expand(beam, res)
+                        res.llm_calls += 1
+                        res.executions += sum(1 for c in kids if c.result is not None and not c.cached)
+                        res.cache_hits += sum(1 for c in kids if c.cached)
+                        children += kids
+                        winner = next((c for c in kids if c.verify_ok), None)
+                        if winner is not None:
+                            break
+                ranked = sorted((c for c in children if c.score is not None),
+                                key=lambda c: (-c.score, c.id))
+                if winner is None:
+                    seen = {b.state for b in self.nodes if b.status in ("kept", "expanded") and b.state}
+                    kept = 0
+                    for c in ranked:
+                        if kept >= self.width:
+                            c.status = "pruned"
+                            continue
+                        c.state = state_hash(c.workspace.root)
+                        if c.state in seen:
+                            c.status = "transposed"  # same files as a better or earlier node
+                        else:
+                            c.status = "kept"
+                            seen.add(c.state)
+                            kept += 1
+                for b in beams:
+                    if b is not root and b.workspace is not None:
+                        b.workspace.cleanup()
+                for c in children:
+                    if c is not winner and c.status != "kept" and c.workspace is not None:
+                        c.workspace.cleanup()
+                beams = [c for c in ranked if c.status == "kept"]
+                if winner is not None or not beams:
+                    break
+                self._snapshot(res, t0)
+                if self.max_llm_calls is not None and res.llm_calls >= self.max_llm_calls:
+                    break
+
+            best = winner or max((n for n in self.nodes if n.score is not None),
+                                 key=lambda n: (n.score, -n.id), default=None)
+            res.ok = winner is not None
+            res.path = self.path(best) if best is not None else []
+            if winner is not None and adopt:
+                winner.workspace.promote()
+        finally:
+            for n in self.nodes:
+                if n.workspace is not None:
+                    n.workspace.cleanup()
+            self._snapshot(res, t0)
+        return res
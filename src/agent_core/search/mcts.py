@@ -0,0 +1,228 @@
+"""
+Monte Carlo Tree Search over tool calls.
+
+    res = MCTS(spec, task, max_llm_calls=8, max_seconds=300).run()
+
+Nodes are tool calls; each has a Workspace (runtime/workspace.py) with the files written on
+its path, so every simulation runs in a throwaway copy and nothing touches `base` until a
+trajectory verifies.
+- select: from the root, follow the child with the best UCT value
+  (mean reward + c * sqrt(ln N_parent / n)) down to a node that has not been expanded
+- expand: one LLM propose call for that node (k candidates), pre-scored against the node's gaps
+  (search/prescore.py) so only the promising top_m are simulated
+- simulate: the candidates run in parallel in children of the node's workspace
+  (beam.evaluate_candidates) and are scored by the verifier: 1.0 when verified, otherwise
+  gap_reward(score_by_gaps(gaps)) in (0, 0.9]
+- backpropagate: every new child's reward is added to the visit counts and values of all
+  its ancestors
+- stop: the first verified node (its files are promoted), or the budget: max_llm_calls
+  propose calls, max_seconds wall time, or a tree with nothing left to expand
+Reached workspace states go through the transposition table (search/transposition.py), as in
+BeamSearch. The tree is saved through `save` as mcts_tree.json after every expansion.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from ..llm import usage
+from ..runtime import tracing
+from ..runtime.workspace import Workspace
+from ..specs.task_spec import TaskSpec
+from ..verify.verifier import verify
+from .beam import evaluate_candidates, score_by_gaps
+from .beam_search import Node, SearchResult, default_observe
+from .transposition import TranspositionTable, state_hash
+
+K = 4
+UCT_C = 1.4
+MAX_LLM_CALLS = 8
+MAX_SECONDS = 300.0
+MAX_DEPTH = 8
+
+
+@dataclass
+class MCTSNode(Node):
+    visits: int = 0
+    value: float = 0.0  # sum of backpropagated rewards
+    reward: float = 0.0  # this node's own simulation reward
+    children: List[int] = field(default_factory=list)
+    expanded: bool = False
+    exhausted: bool = False  # nothing below it can be expanded any more
+
+    @property
+    def mean(self) -> float:
+        return self.value / self.visits if self.visits else 0.0
+
+    def to_json(self) -> Dict[str, Any]:
+        return dict(super().to_json(), visits=self.visits, value=round(self.value, 4),
+                    reward=round(self.reward, 4), children=self.children)
+
+
+def gap_reward(gaps: Dict[str, Any]) -> float:
+    """Map beam.score_by_gaps (<= 0) into (0, 0.9]: a verified node (1.0) always scores higher."""
+    return 0.9 / (1.0 - score_by_gaps(gaps))
+
+
+class MCTS:
+    def __init__(
+        self,
+        spec: TaskSpec,
+        task: Optional[str] = None,
+        propose_fn: Optional[Callable[[str, str, int], List[Dict[str, Any]]]] = None,
+        k: int = K,
+        top_m: Optional[int] = None,
+        c: float = UCT_C,
+        max_llm_calls: int = MAX_LLM_CALLS,
+        max_seconds: float = MAX_SECONDS,
+        max_depth: int = MAX_DEPTH,
+        reward_fn: Callable[[Dict[str, Any]], float] = gap_reward,
+        allowed_fn: Optional[Callable[[Node], List[str]]] = None,
+        observe_fn: Callable[[str, Node, List[Node], List[str]], str] = default_observe,
+        base: str = ".",
+        concurrency: int = K,
+        timeout: float = 30.0,
+        save: Optional[Callable[[str, Any], None]] = None,
+        table: Optional[TranspositionTable] = None,
+    ):
+        self.spec = spec
+        self.task = task if task is not None else spec.task
+        if propose_fn is None:
+            from .beam import propose_candidates as propose_fn  # calls the LLM when used
+        self.propose_fn = propose_fn
+        self.k, self.top_m, self.c, self.max_depth = k, top_m, c, max_depth
+        self.max_llm_calls, self.max_seconds = max_llm_calls, max_seconds
+        self.reward_fn, self.observe_fn = reward_fn, observe_fn
+        self.allowed_fn = allowed_fn or (lambda node: list(spec.allowed_tools))
+        self.base, self.concurrency, self.timeout, self.save = base, concurrency, timeout, save
+        self.table = table if table is not None else TranspositionTable()
+        self.nodes: List[MCTSNode] = []
+
+    def _node(self, **kw: Any) -> MCTSNode:
+        node = MCTSNode(id=len(self.nodes), **kw)
+        self.nodes.append(node)
+        return node
+
+    def path(self, node: Node) -> List[Node]:
+        out = []
+        while node.parent is not None:
+            out.append(node)
+            node = self.nodes[node.parent]
+        return out[::-1]
+
+    # ---- the four phases ----
+    def _uct(self, parent: MCTSNode, child: MCTSNode) -> float:
+        if child.visits == 0:
+            return math.inf
+        return child.mean + self.c * math.sqrt(math.log(max(parent.visits, 1)) / child.visits)
+
+    def _select(self, root: MCTSNode) -> Optional[MCTSNode]:
+        """The unexpanded node UCT leads to; None once the whole tree is exhausted."""
+        while not root.exhausted:
+            node = root
+            while node.expanded:
+                live = [self.nodes[i] for i in node.children if not self.nodes[i].exhausted]
+                if not live:
+                    node.exhausted = True  # dead end: start over from the root
+                    break
+                node = max(live, key=lambda ch: (self._uct(node, ch), -ch.id))
+            else:
+                return node
+        return None
+
+    def _expand(self, node: MCTSNode, res: SearchResult) -> List[MCTSNode]:
+        allowed = self.allowed_fn(node)
+        obs = self.observe_fn(self.task, node, self.path(node), allowed)
+        before = usage.snapshot()
+        with tracing.span("propose", cat="llm", k=self.k, depth=node.depth):
+            cands = self.propose_fn(self.task, obs, self.k)
+        spent = usage.delta(before)
+        res.llm_calls += 1
+        ev = evaluate_candidates(cands, self.spec, task=self.task, allowed=allowed, base=self.base,
+                                 concurrency=self.concurrency, timeout=self.timeout, parent=node.workspace,
+                                 table=self.table, gaps=node.gaps, top_m=self.top_m)
+        res.avoided += ev.avoided
+        node.expanded, node.status = True, "expanded"
+        seen = {n.state for n in self.nodes if n.state}
+        kids = []
+        for e in ev.evals:
+            child = self._node(parent=node.id, depth=node.depth + 1, action=e.action, result=e.result,
+                               verify_ok=e.verify_ok, gaps=e.gaps, hint=e.hint, cached=e.cached,
+                               tokens=node.tokens + spent["prompt_tokens"] + spent["completion_tokens"],
+                               workspace=e.workspace)
+            node.children.append(child.id)
+            res.executions += 1 if e.result is not None and not e.cached else 0
+            res.cache_hits += 1 if e.cached else 0
+            if e.status != "done":
+                child.status, child.exhausted = e.status, True
+            else:
+                child.reward = 1.0 if e.verify_ok else self.reward_fn(e.gaps)
+                child.score = child.reward
+                child.state = state_hash(e.workspace.root)
+                if e.verify_ok:
+                    child.status = "verified"
+                elif child.state in seen:
+                    child.status, child.exhausted = "transposed", True  # same files as a node already in the tree
+                else:
+                    child.status, child.exhausted = "open", child.depth >= self.max_depth
+                seen.add(child.state)
+            if child.exhausted and child.workspace is not None:
+                child.workspace.cleanup()
+            kids.append(child)
+        if not any(not k.exhausted for k in kids):
+            node.exhausted = True
+        return kids
+
+    def _backpropagate(self, child: MCTSNode) -> None:
+        child.visits += 1
+        child.value += child.reward
+        node = child
+        while node.parent is not None:
+            node = self.nodes[node.parent]
+            node.visits += 1
+            node.value += child.reward
+
+    def _snapshot(self, res: SearchResult, t0: float) -> None:
+        res.wall_s = time.perf_counter() - t0
+        if self.save is not None:
+            self.save("mcts_tree.json", res.tree())
+
+    def run(self, adopt: bool = True) -> SearchResult:
+        """Search within the budget; with adopt, the verified trajectory's files go into `base`."""
+        t0 = time.perf_counter()
+        root = self._node(parent=None, depth=0, workspace=Workspace.fork(
+            self.base, include=self.spec.workspace_files()))
+        v = verify(self.spec, None, check_stdout=False, root=str(root.workspace.root))
+        root.gaps, root.hint, root.state = v.gaps, v.hint, state_hash(root.workspace.root)
+        res = SearchResult(ok=False, nodes=self.nodes, path=[])
+        winner: Optional[MCTSNode] = None
+        try:
+            while res.llm_calls < self.max_llm_calls and time.perf_counter() - t0 < self.max_seconds:
+                leaf = self._select(root)
+                if leaf is None:
+                    break  # every branch ended (depth limit, failures, transpositions)
+                with tracing.span("mcts_iteration", cat="search", depth=leaf.depth, node=leaf.id):
+                    kids = self._expand(leaf, res)
+                for ch in kids:
+                    if ch.status not in ("skipped", "duplicate", "prefiltered", "error", "cancelled"):
+                        self._backpropagate(ch)
+                winner = next((ch for ch in kids if ch.verify_ok), None)
+                self._snapshot(res, t0)
+                if winner is not None:
+                    break
+
+            scored = [n for n in self.nodes if n.score is not None]
+            best = winner or max(scored, key=lambda n: (n.reward, -n.depth, -n.id), default=None)
+            res.ok = winner is not None
+            res.path = self.path(best) if best is not None else []
+            if winner is not None and adopt:
+                winner.workspace.promote()
+        finally:
+            for n in self.nodes:
+                if n.workspace is not None:
+                    n.workspace.cleanup()
+            self._snapshot(res, t0)
+        return res
@@ -0,0 +1,224 @@
+"""
+Static pre-scoring of candidate tool calls, before anything is executed.
+
+    ranking = rank_candidates(cands, gaps, spec, allowed=allowed, top_m=2)
+    ranking.run      # candidate indices worth executing, best first
+    ranking.dropped  # index -> reason ("disallowed", "invalid", "duplicate", "no_op", "below_top_m")
+
+prescore() estimates which verifier gaps (verify/verifier.py) an action could close by
+looking at the action alone:
+- file_write to a path in missing_files closes it; when the spec wants CSV columns / rows for
+  that path, the content's header line and data row count are checked as well (a header
+  missing required columns scores below zero: it would write the wrong schema)
+- shell_exec / python_exec that name a gap path and write something ("> path", open(..., "w"),
+  to_csv, .save(...), ...) may close it. Only positive read-only evidence drops an action as a
+  no-op while artifacts are missing: shell commands made of READ_ONLY programs, and python code
+  that names no gap path and calls nothing outside _READ_ONLY_CALLS (print, len, read_csv, ...).
+  Other python code without a recognised write is kept with a lower score (it may write through
+  an API not listed here, e.g. np.savetxt)
+- when only stdout is left, actions that can print score above ones that cannot
+Disallowed tools, calls that fail ToolCall validation and canonical duplicates
+(search/transposition.py) are dropped without a score.
+"""
+
+from __future__ import annotations
+
+import ast
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from ..schemas.tool import ToolCall
+from ..specs.task_spec import TaskSpec
+from .transposition import action_key, canonical_action
+
+READ_ONLY = frozenset(
+    "ls pwd cat head tail echo wc find grep which env printenv whoami date file stat du df tree true sort uniq".split()
+)
+_SEGMENTS = re.compile(r"&&|\|\||;|\|")
+_WRITE_MARKERS = (
+    "to_csv", "to_json", "to_parquet", "to_excel", "to_pickle", "write(", "write_text", "write_bytes",
+    "savefig", ".save(", "savetxt", "np.save", "imwrite", "imsave", "json.dump", "pickle.dump",
+    "csv.writer", "DictWriter", "mkdir", "touch(", "shutil.", "os.rename", "os.replace", "subprocess", "os.system",
+)
+# calls that never write a file (open() only with a read mode); anything else may write
+_READ_ONLY_CALLS = frozenset(
+    "print len sum min max sorted reversed range enumerate zip map filter list dict set tuple str int float bool "
+    "abs round repr type isinstance open read readline readlines read_csv read_json read_excel read_parquet "
+    "read_text read_bytes load loads listdir scandir walk exists isfile isdir getsize glob iterdir Path "
+    "head tail describe info mean median std count value_counts groupby agg split strip lower upper "
+    "startswith endswith join format items keys values get reader DictReader next".split()
+)
+_MODE = re.compile(r"^[rbt]*[wax+][rbt+]*$")
+# open() / Path.open() with a "w", "a", "x" or "+" mode; plain reads are not writes
+_WRITE_OPEN = re.compile(
+    r"""(?:\bopen\s*\((?:[^()]|\([^()]*\))*?,\s*|\.open\s*\(\s*)(?:mode\s*=\s*)?['"][rbt]*[wax+][rbt+]*['"]"""
+)
+_PRINT = re.compile(r"\bprint\s*\(")
+
+
+@dataclass
+class Prescore:
+    score: float = 0.0
+    closes: List[str] = field(default_factory=list)  # e.g. "missing_files:users.csv"
+    drop: Optional[str] = None  # disallowed | invalid | no_op
+
+
+@dataclass
+class Ranking:
+    run: List[int]  # indices to execute, best first
+    dropped: Dict[int, str]
+    scores: Dict[int, Prescore]
+    duplicate_of: Dict[int, int] = field(default_factory=dict)
+
+
+def gap_paths(gaps: Dict[str, Any]) -> Set[str]:
+    paths = set(gaps.get("missing_files") or [])
+    for k in ("csv_missing_columns", "csv_rows_needed", "artifact_errors"):
+        paths |= set((gaps.get(k) or {}).keys())
+    return paths
+
+
+def _artifact_gaps(gaps: Dict[str, Any]) -> bool:
+    return bool(gap_paths(gaps))
+
+
+def _csv_shape(content: str) -> tuple:
+    lines = [ln for ln in content.replace("\r\n", "\n").split("\n")]
+    header = {h.strip().strip('"') for h in (lines[0].split(",") if lines else [])}
+    rows = sum(1 for ln in lines[1:] if ln.strip())
+    return header, rows
+
+
+def _score_file_write(args: Dict[str, Any], gaps: Dict[str, Any], spec: Optional[TaskSpec]) -> Prescore:
+    path, content = str(args.get("path", "")).strip(), args.get("content")
+    path = path[2:] if path.startswith("./") else path
+    out = Prescore(0.2)  # a helper file may still be a step towards the goal
+    generated = content == "__LLM_GENERATE_SAMPLE__"
+    if path in (gaps.get("missing_files") or []):
+        out.score += 5
+        out.closes.append(f"missing_files:{path}")
+    cols = (spec.csv_required_columns.get(path) if spec else None) or (gaps.get("csv_missing_columns") or {}).get(path)
+    min_rows = (spec.csv_min_rows.get(path) if spec else None) or (gaps.get("csv_rows_needed") or {}).get(path)
+    if isinstance(content, str) and not generated and (cols or min_rows):
+        header, rows = _csv_shape(content)
+        if cols:
+            if set(cols) <= header:
+                out.score += 3
+                out.closes.append(f"csv_missing_columns:{path}")
+            else:
+                out.score -= 2
+        if min_rows:
+            if rows >= int(min_rows):
+                out.score += 2
+                out.closes.append(f"csv_rows_needed:{path}")
+            else:
+                out.score -= 1
+    elif generated and (cols or min_rows):
+        out.score += 1  # the sample generator reads the task; its header is unknown here
+    return out
+
+
+def _python_read_only(code: str) -> bool:
+    """True only if every call in the code is a known read-only one (unparseable code: False)."""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return False
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        func = node.func
+        name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else None
+        if name not in _READ_ONLY_CALLS:
+            return False
+        modes = list(node.args) + [kw.value for kw in node.keywords if kw.arg == "mode"]
+        if any(isinstance(a, ast.Constant) and isinstance(a.value, str) and _MODE.match(a.value) for a in modes):
+            return False  # open(..., "w") / Path.open("a")
+    return True
+
+
+def _score_command(text: str, gaps: Dict[str, Any], is_python: bool) -> Prescore:
+    paths = gap_paths(gaps)
+    named = [p for p in paths if p and p in text]
+    if is_python:
+        writes = any(m in text for m in _WRITE_MARKERS) or bool(_WRITE_OPEN.search(text))
+        prints = bool(_PRINT.search(text)) or "\n" not in text.strip()  # single expressions get print()-wrapped
+    else:
+        segments = [s.strip().split()[0] for s in _SEGMENTS.split(text) if s.strip()]
+        writes = ">" in text or "tee " in text or any(s not in READ_ONLY for s in segments)
+        prints = True
+    if _artifact_gaps(gaps):
+        if not writes and (not is_python or (not named and _python_read_only(text))):
+            return Prescore(0.0, drop="no_op")
+        # python that writes through an unlisted API (or only reads): kept, below known writers
+        out = Prescore(1.0 if writes else 0.5)
+        for p in named:
+            out.score += 3 if writes else 1
+            out.closes.append(f"missing_files:{p}" if p in (gaps.get("missing_files") or []) else f"artifact:{p}")
+        return out
+    # artifacts are fine: what is left is stdout, which only this action's output can fix
+    return Prescore(3.0, ["stdout"]) if prints else Prescore(0.5)
+
+
+def prescore(
+    action: Dict[str, Any],
+    gaps: Optional[Dict[str, Any]] = None,
+    spec: Optional[TaskSpec] = None,
+    allowed: Optional[Iterable[str]] = None,
+) -> Prescore:
+    """Heuristic value of `action` against the current gaps; higher is more promising."""
+    canon = canonical_action(action)
+    name, args = canon.get("name"), canon.get("args") or {}
+    if allowed is not None and name not in set(allowed):
+        return Prescore(drop="disallowed")
+    try:
+        ToolCall.model_validate(canon)
+    except Exception:
+        return Prescore(drop="invalid")
+    gaps = gaps or {}
+    if name == "file_write":
+        return _score_file_write(args, gaps, spec)
+    if name == "shell_exec":
+        cmd = args.get("cmd")
+        return _score_command(" ".join(cmd) if isinstance(cmd, list) else str(cmd or ""), gaps, is_python=False)
+    if name == "python_exec":
+        return _score_command(str(args.get("code") or ""), gaps, is_python=True)
+    return Prescore(0.3)  # pip_install: only useful after an ImportError, which gaps do not show
+
+
+def rank_candidates(
+    cands: List[Dict[str, Any]],
+    gaps: Optional[Dict[str, Any]] = None,
+    spec: Optional[TaskSpec] = None,
+    allowed: Optional[Iterable[str]] = None,
+    top_m: Optional[int] = None,
+) -> Ranking:
+    """
+    Score every candidate, drop disallowed / invalid / duplicate ones (and no-ops, which need
+    artifact gaps to be detected), and keep the best top_m (all when None); ties keep proposal
+    order.
+    """
+    allowed = list(allowed) if allowed is not None else None
+    scores: Dict[int, Prescore] = {}
+    dropped: Dict[int, str] = {}
+    first: Dict[str, int] = {}
+    duplicate_of: Dict[int, int] = {}
+    live: List[int] = []
+    for i, c in enumerate(cands):
+        ps = scores[i] = prescore(c, gaps, spec, allowed)
+        if ps.drop is not None:
+            dropped[i] = ps.drop
+            continue
+        key = action_key(c)
+        if key in first:
+            dropped[i], duplicate_of[i] = "duplicate", first[key]
+            continue
+        first[key] = i
+        live.append(i)
+    live.sort(key=lambda i: -scores[i].score)  # stable: ties keep proposal order
+    if top_m is not None:
+        for i in live[top_m:]:
+            dropped[i] = "below_top_m"
+        live = live[:top_m]
+    return Ranking(live, dropped, scores, duplicate_of)
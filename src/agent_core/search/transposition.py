@@ -0,0 +1,240 @@
+"""
+Canonical action keys, workspace state hashes and a transposition table for search.
+
+    table = TranspositionTable()
+    hit = table.get(state_hash(ws.root), cands[0])     # (state, action) seen before?
+    if hit: hit.apply(ws.root)                          # replay its file writes, no execution
+
+- canonical_action(): normalize_toolcall_obj, then whitespace that cannot change the outcome
+  is normalized (trailing spaces and blank edges in code, runs of spaces / tabs outside quotes
+  and heredoc bodies in shell commands; newlines are kept) and args are key-sorted; file contents are kept byte for byte
+- state_hash(): relative path, size and content digest of every file under a directory;
+  digests are cached by (path, inode, size, mtime), so rehashing an unchanged tree only stats
+- TranspositionTable: (state hash, action key) -> the ToolResult, the VerifyResult and the
+  files the action wrote / deleted, so a hit reproduces the workspace without running anything.
+  Entries are only valid for one TaskSpec (the verify result is cached); use one table per search
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..llm.normalize import normalize_toolcall_obj
+from ..schemas.tool import ToolResult
+from ..verify.verifier import VerifyResult
+
+MAX_ENTRIES = 4096
+MAX_ENTRY_BYTES = 8 << 20  # actions that write more than this are not cached
+
+
+# ---- canonical actions ----
+def _norm_code(code: str) -> str:
+    # python_exec strips the code anyway; indentation is left alone (it changes meaning)
+    return "\n".join(ln.rstrip() for ln in code.replace("\r\n", "\n").split("\n")).strip()
+
+
+_HEREDOC = re.compile(r"<<(-?)[ \t]*(?:'([^']*)'|\"([^\"]*)\"|\\?([^\s;&|<>()'\"]+))")
+
+
+def _norm_cmd(cmd: str) -> str:
+    """
+    Collapse space / tab runs outside single / double quotes and strip the ends. Newlines
+    separate commands, so they are kept (blanks around them are dropped), and heredoc bodies
+    are copied line for line.
+    """
+    cmd = cmd.strip().replace("\r\n", "\n")
+    out: List[str] = []
+    pending: List[Tuple[str, bool]] = []  # heredoc (terminator, strip_tabs) opened on this line
+    quote: Optional[str] = None
+    escaped = False
+    line_start = True  # after an unescaped newline: leading blanks are dropped
+    i, n = 0, len(cmd)
+    while i < n:
+        ch = cmd[i]
+        if quote is None and not escaped:
+            if ch in " \t":
+                j = i
+                while j < n and cmd[j] in " \t":
+                    j += 1
+                if not line_start and j < n and cmd[j] != "\n":
+                    out.append(" ")
+                i = j
+                continue
+            if ch == "\n":
+                out.append(ch)
+                i, line_start = i + 1, True
+                for word, strip_tabs in pending:  # bodies are kept verbatim up to their terminator
+                    while i < n:
+                        nl = cmd.find("\n", i)
+                        line = cmd[i:] if nl < 0 else cmd[i:nl + 1]
+                        out.append(line)
+                        i += len(line)
+                        if (line.lstrip("\t") if strip_tabs else line).rstrip("\n") == word:
+                            break
+                pending = []
+                continue
+            if cmd.startswith("<<", i) and not cmd.startswith("<<<", i) and (i == 0 or cmd[i - 1] != "<"):
+                m = _HEREDOC.match(cmd, i)
+                if m:
+                    pending.append((next(g for g in m.groups()[1:] if g is not None), m.group(1) == "-"))
+        out.append(ch)
+        i, line_start = i + 1, False
+        if escaped:
+            escaped = False
+        elif ch == "\\" and quote != "'":
+            escaped = True
+        elif quote is None and ch in "'\"":
+            quote = ch
+        elif ch == quote:
+            quote = None
+    return "".join(out)
+
+
+def canonical_action(obj: Any) -> Dict[str, Any]:
+    """{"name", "args"} with formatting-only differences removed (accepts a dict or a ToolCall)."""
+    if hasattr(obj, "model_dump"):
+        obj = obj.model_dump()
+    obj = normalize_toolcall_obj(dict(obj)) if isinstance(obj, dict) else {}
+    name = obj.get("name")
+    args = dict(obj.get("args") or {})
+    if name == "python_exec" and isinstance(args.get("code"), str):
+        args["code"] = _norm_code(args["code"])
+    elif name == "shell_exec":
+        cmd = args.get("cmd")
+        if isinstance(cmd, str):
+            args["cmd"] = _norm_cmd(cmd)
+        elif isinstance(cmd, list):
+            args["cmd"] = [str(c) for c in cmd]
+    elif name == "pip_install":
+        pkgs = args.get("packages")
+        if isinstance(pkgs, str):
+            pkgs = [pkgs]
+        if isinstance(pkgs, list):
+            args["packages"] = sorted({str(p).strip() for p in pkgs if str(p).strip()})
+    elif name == "file_write" and isinstance(args.get("path"), str):
+        args["path"] = os.path.normpath(args["path"].strip())
+    return {"name": name, "args": args}
+
+
+def action_key(obj: Any) -> str:
+    canon = canonical_action(obj)
+    raw = json.dumps(canon, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# ---- workspace state ----
+@lru_cache(maxsize=65536)
+def _digest(path: str, ino: int, size: int, mtime_ns: int) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def state_hash(root: str | Path) -> str:
+    """Digest of (relative path, size, content digest) for every file under root."""
+    root = Path(root)
+    h = hashlib.blake2b(digest_size=16)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            p = os.path.join(dirpath, name)
+            st = os.stat(p)
+            rel = os.path.relpath(p, root).replace(os.sep, "/")
+            h.update(f"{rel}\0{st.st_size}\0{_digest(p, st.st_ino, st.st_size, st.st_mtime_ns)}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def file_stamps(root: str | Path) -> Dict[str, Tuple[int, int]]:
+    root = Path(root)
+    return {str(p.relative_to(root)): (p.stat().st_size, p.stat().st_mtime_ns) for p in root.rglob("*") if p.is_file()}
+
+
+# ---- table ----
+@dataclass
+class Entry:
+    result: ToolResult
+    verify: VerifyResult
+    files: Dict[str, bytes] = field(default_factory=dict)  # relative path -> content written
+    deleted: List[str] = field(default_factory=list)
+    hits: int = 0
+
+    def apply(self, root: str | Path) -> None:
+        """Reproduce the action's effect on a workspace in the entry's pre-state."""
+        root = Path(root)
+        for rel in self.deleted:
+            try:
+                (root / rel).unlink()
+            except FileNotFoundError:
+                pass
+        for rel, data in self.files.items():
+            out = root / rel
+            out.parent.mkdir(parents=True, exist_ok=True)
+            out.write_bytes(data)
+
+
+class TranspositionTable:
+    """Thread-safe LRU map of (state hash, action key) -> Entry."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_entry_bytes: int = MAX_ENTRY_BYTES):
+        self.max_entries, self.max_entry_bytes = max_entries, max_entry_bytes
+        self._map: "OrderedDict[Tuple[str, str], Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def get(self, state: str, action: Any) -> Optional[Entry]:
+        key = (state, action_key(action))
+        with self._lock:
+            entry = self._map.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._map.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            # copies: callers may mutate what they get back
+            return Entry(entry.result.model_copy(deep=True), copy.deepcopy(entry.verify), entry.files, entry.deleted, entry.hits)
+
+    def put(
+        self,
+        state: str,
+        action: Any,
+        result: ToolResult,
+        verify: VerifyResult,
+        root: str | Path,
+        before: Dict[str, Tuple[int, int]],
+    ) -> bool:
+        """
+        Record the outcome of running `action` in a workspace (root) whose files had the stamps
+        `before` (file_stamps()). Returns False when the written files exceed max_entry_bytes.
+        """
+        after = file_stamps(root)
+        changed = [rel for rel, st in after.items() if before.get(rel) != st]
+        if sum(after[rel][0] for rel in changed) > self.max_entry_bytes:
+            return False
+        files = {rel: (Path(root) / rel).read_bytes() for rel in changed}
+        entry = Entry(result.model_copy(deep=True), copy.deepcopy(verify), files, sorted(set(before) - set(after)))
+        with self._lock:
+            self._map[(state, action_key(action))] = entry
+            self._map.move_to_end((state, action_key(action)))
+            while len(self._map) > self.max_entries:
+                self._map.popitem(last=False)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._map), "hits": self.hits, "misses": self.misses}
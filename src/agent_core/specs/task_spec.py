@@ -14,6 +14,13 @@ class TaskSpec:
     - csv_min_rows: mapping of csv file -> minimum data rows (excluding header)
     - stdout_is_number: stdout must be parseable as number (int/float)
     - stdout_exact: if provided, stdout must equal this exact string after strip
+
+    Header-only artifact constraints (see verify/artifact_checks.py, no full-file reads):
+    - image_min_size: mapping of PNG/JPEG file -> [min_width, min_height]
+    - json_valid_files: files that must parse as a single JSON document
+    - jsonl_min_lines: mapping of JSONL file -> minimum line count
+    - file_min_bytes / file_max_bytes: mapping of file -> size bound in bytes
+    - file_sha256: mapping of file -> expected hex sha256 digest
     """
     task: str
 
@@ -21,8 +28,20 @@ class TaskSpec:
     csv_required_columns: Dict[str, List[str]] = field(default_factory=dict)
     csv_min_rows: Dict[str, int] = field(default_factory=dict)
 
+    image_min_size: Dict[str, List[int]] = field(default_factory=dict)
+    json_valid_files: List[str] = field(default_factory=list)
+    jsonl_min_lines: Dict[str, int] = field(default_factory=dict)
+    file_min_bytes: Dict[str, int] = field(default_factory=dict)
+    file_max_bytes: Dict[str, int] = field(default_factory=dict)
+    file_sha256: Dict[str, str] = field(default_factory=dict)
+
     stdout_is_number: bool = False
     stdout_exact: Optional[str] = None
 
     # optional: tools whitelist for this task
-    allowed_tools: List[str] = field(default_factory=lambda: ["shell_exec", "python_exec", "file_write", "pip_install"])
\ No newline at end of file
+    allowed_tools: List[str] = field(default_factory=lambda: ["shell_exec", "python_exec", "file_write", "pip_install"])
+
+    def workspace_files(self) -> List[str]:
+        """Files a forked workspace must carry over from the base (verifier inputs, in order, no repeats)."""
+        names = list(self.required_files) + list(self.csv_required_columns) + list(self.csv_min_rows)
+        return list(dict.fromkeys(names))
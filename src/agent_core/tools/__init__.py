@@ -5,7 +5,8 @@ from .file_write import file_write
 from .shell_exec import shell_exec
 
 
-TOOLS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+# fn(args, cwd=None, timeout=...) -> output; cwd / timeout are optional keywords
+TOOLS: Dict[str, Callable[..., str]] = {
     "python_exec": python_exec,
     "pip_install": pip_install,
     "file_write": file_write,
@@ -1,11 +1,14 @@
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-def file_write(args: Dict[str, Any]) -> str:
+def file_write(args: Dict[str, Any], cwd: Optional[str] = None, timeout: Optional[float] = None) -> str:
     """
     Write text to a file.
     Args expects: {"path": "relative/or/absolute", "content": "text"}
-    Default: relative to current working directory.
+    Default: relative to current working directory. With `cwd` (an isolated workspace,
+    search/beam.py) relative paths resolve against it and paths that end up outside it,
+    absolute or through "..", are rejected. timeout is accepted for a uniform tool signature
+    and unused.
     """
     path = args.get("path")
     content = args.get("content")
@@ -16,6 +19,11 @@ def file_write(args: Dict[str, Any]) -> str:
         raise ValueError("file_write requires args['content'] as string")
 
     p = Path(path)
+    if cwd is not None:
+        root = Path(cwd).resolve()
+        p = (root / p).resolve()  # an absolute path replaces root here
+        if p != root and root not in p.parents:
+            raise ValueError(f"file_write path {path!r} is outside the working directory; use a relative path")
     p.parent.mkdir(parents=True, exist_ok=True)
     p.write_text(content, encoding="utf-8")
     return f"Wrote {len(content)} chars to {str(p)}"
@@ -1,8 +1,9 @@
-import subprocess
 import sys
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-def pip_install(args: Dict[str, Any]) -> str:
+from ..runtime.workspace import run_process
+
+def pip_install(args: Dict[str, Any], cwd: Optional[str] = None, timeout: float = 600) -> str:
     """
     Install python packages into current venv.
     Args expects: {"packages": ["matplotlib", "numpy"]} or {"packages": "matplotlib"}
@@ -16,7 +17,7 @@ def pip_install(args: Dict[str, Any]) -> str:
         raise ValueError("pip_install requires args['packages'] as str or list[str]")
 
     cmd = [sys.executable, "-m", "pip", "install", "-q"] + packages
-    proc = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+    proc = run_process(cmd, cwd=cwd, timeout=timeout)
 
     out = (proc.stdout or "").strip()
     err = (proc.stderr or "").strip()
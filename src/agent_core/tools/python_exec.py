@@ -1,6 +1,7 @@
-import subprocess
 import sys
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from ..runtime.workspace import run_process
 
 def _wrap_code(code: str) -> str:
     code = code.strip()
@@ -12,9 +13,9 @@ def _wrap_code(code: str) -> str:
     # 否则把“单表达式”包成 print(expr)
     return f"print({code})"
 
-def python_exec(args: Dict[str, Any]) -> str:
+def python_exec(args: Dict[str, Any], cwd: Optional[str] = None, timeout: float = 30) -> str:
     """
-    Execute python code in a subprocess using current interpreter (venv).
+    Execute python code in a subprocess using current interpreter (venv), in `cwd` if given.
     Args expects: {"code": "..."}.
     If code is a single expression without print, auto-wrap with print().
     """
@@ -24,12 +25,7 @@ def python_exec(args: Dict[str, Any]) -> str:
 
     code_to_run = _wrap_code(code)
 
-    proc = subprocess.run(
-        [sys.executable, "-c", code_to_run],
-        capture_output=True,
-        text=True,
-        timeout=30,
-    )
+    proc = run_process([sys.executable, "-c", code_to_run], cwd=cwd, timeout=timeout)
     out = (proc.stdout or "").strip()
     err = (proc.stderr or "").strip()
 
@@ -1,9 +1,10 @@
-import subprocess
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-def shell_exec(args: Dict[str, Any]) -> str:
+from ..runtime.workspace import run_process
+
+def shell_exec(args: Dict[str, Any], cwd: Optional[str] = None, timeout: float = 30) -> str:
     """
-    Execute shell command in current working directory.
+    Execute shell command in `cwd` (default: current working directory).
     Args expects: {"cmd": "ls -l"} or {"cmd": ["ls", "-l"]}
     """
     cmd = args.get("cmd")
@@ -15,13 +16,7 @@ def shell_exec(args: Dict[str, Any]) -> str:
     else:
         raise ValueError("shell_exec requires args['cmd'] as str or list")
 
-    proc = subprocess.run(
-        cmd,
-        shell=shell,
-        capture_output=True,
-        text=True,
-        timeout=30,
-    )
+    proc = run_process(cmd, shell=shell, cwd=cwd, timeout=timeout)
 
     out = (proc.stdout or "").strip()
     err = (proc.stderr or "").strip()
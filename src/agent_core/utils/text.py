@@ -0,0 +1,42 @@
+"""
+Text helpers shared by the memory stores and the llm layer (no imports from either).
+
+- task_hash(): short stable key for a task text
+- error_class(): traceback / error text -> exception class name
+- normalize_text(): strip run-specific noise so the same failure matches across runs
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Optional
+
+MAX_CHARS = {"error": 4000, "output": 2000, "critic": 2000}  # per kind, after normalization
+
+_PATH = re.compile(r'File "(?:[^"]*/)?([^"/]+)", line \d+')
+_HEX = re.compile(r"0x[0-9a-fA-F]+")
+_WS = re.compile(r"\s+")
+_ERROR_CLASS = re.compile(r"^([A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt|Warning))\b")
+
+
+def task_hash(task: str) -> str:
+    return hashlib.sha1(task.encode("utf-8")).hexdigest()[:16]
+
+
+def error_class(error: Optional[str]) -> Optional[str]:
+    """Traceback / error text -> exception class name ("ValueError"), "Timeout", "error" or None."""
+    if not error:
+        return None
+    for line in reversed(error.strip().splitlines()):
+        m = _ERROR_CLASS.match(line.strip())
+        if m:
+            return m.group(1).rsplit(".", 1)[-1]
+    return "Timeout" if "timed out" in error.lower() else "error"
+
+
+def normalize_text(text: str, kind: str = "error") -> str:
+    """Strip run-specific noise (absolute paths, line numbers, addresses, whitespace runs)."""
+    text = _PATH.sub(r'File "\1"', text)
+    text = _HEX.sub("0xADDR", text)
+    return _WS.sub(" ", text).strip()[: MAX_CHARS.get(kind, 2000)]
@@ -0,0 +1,319 @@
+"""
+Metadata-only artifact checks.
+
+None of these checks load a whole file into memory:
+- image size is read from the PNG IHDR chunk / JPEG SOFn segment (a few hundred bytes at most)
+- JSON validity is checked chunk by chunk (tokenizer + grammar stack, C decoder for in-buffer containers)
+- JSONL line counts and sha256 digests walk the file in fixed-size chunks (mmap for hashing)
+
+All checks return (ok, message) like verify/verifier.py.
+"""
+
+from __future__ import annotations
+
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from typing import BinaryIO, List, Optional, Tuple
+
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+MAX_TOKEN_BYTES = 16 << 20  # a single JSON string larger than this is treated as invalid
+
+_PNG_SIG = b"\x89PNG\r\n\x1a\n"
+# SOF0..SOF15 except DHT(C4), JPG(C8), DAC(CC)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _ok(msg: str) -> Tuple[bool, str]:
+    return True, msg
+
+
+def _fail(msg: str) -> Tuple[bool, str]:
+    return False, msg
+
+
+# ----------------------------------------------------------------------
+# Images
+# ----------------------------------------------------------------------
+def _png_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    head = f.read(24)
+    if len(head) < 24 or head[:8] != _PNG_SIG or head[12:16] != b"IHDR":
+        return None
+    w, h = struct.unpack(">II", head[16:24])
+    return w, h
+
+
+def _jpeg_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    f.seek(0)
+    if f.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        b = f.read(1)
+        if not b:
+            return None
+        if b != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = f.read(1)
+        if not marker:
+            return None
+        m = marker[0]
+        if m == 0xD8 or 0xD0 <= m <= 0xD7 or m == 0x01:  # standalone markers
+            continue
+        if m == 0xD9:  # EOI before any frame header
+            return None
+        seg_len = f.read(2)
+        if len(seg_len) < 2:
+            return None
+        (n,) = struct.unpack(">H", seg_len)
+        if m in _JPEG_SOF:
+            body = f.read(5)
+            if len(body) < 5:
+                return None
+            h, w = struct.unpack(">HH", body[1:5])
+            return w, h
+        f.seek(n - 2, os.SEEK_CUR)
+
+
+def read_image_size(path: str) -> Optional[Tuple[str, int, int]]:
+    """
+    Return (format, width, height) for PNG/JPEG by reading only the header, else None.
+    """
+    with open(path, "rb") as f:
+        size = _png_size(f)
+        if size is not None:
+            return "png", size[0], size[1]
+        size = _jpeg_size(f)
+        if size is not None:
+            return "jpeg", size[0], size[1]
+    return None
+
+
+def check_image_size(path: str, min_width: int = 1, min_height: int = 1) -> Tuple[bool, str]:
+    if not os.path.exists(path):
+        return _fail(f"Image missing: {path}")
+    info = read_image_size(path)
+    if info is None:
+        return _fail(f"Not a readable PNG/JPEG header: {path}")
+    fmt, w, h = info
+    if w < min_width or h < min_height:
+        return _fail(f"Image {path} too small: {w}x{h} < {min_width}x{min_height}")
+    return _ok(f"OK: image {path} is {fmt} {w}x{h}")
+
+
+# ----------------------------------------------------------------------
+# JSON (streaming)
+# ----------------------------------------------------------------------
+_JSON_TOKEN = re.compile(
+    r'[ \t\r\n]*(?:'
+    r'("(?:[^"\\\x00-\x1f]+|\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4}))*")'
+    r'|(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|true|false|null)'
+    r'|([{}\[\]:,]))'
+)
+_TOKEN_START = set('"-0123456789tfn{}[]:,')
+_LOOKAHEAD = 64  # tokens starting this close to the buffer end are re-read after a refill
+
+# grammar states
+_VALUE, _VALUE_OR_END, _KEY, _KEY_OR_END, _COLON_NEXT, _COMMA_OR_END, _DONE = range(7)
+
+
+def _reject_constant(name: str):
+    raise ValueError(f"non-standard JSON constant: {name}")
+
+
+# C-speed skip over containers that fit entirely in the buffer (NaN/Infinity rejected)
+_raw_decode = json.JSONDecoder(parse_constant=_reject_constant).raw_decode
+
+
+def _advance(expect: int, stack: List[str], kind: str) -> int:
+    """
+    One grammar transition. kind is '"' (string), 'v' (number/literal/complete container)
+    or a structural character.
+    """
+    if expect <= _VALUE_OR_END:
+        if kind == '"' or kind == "v":
+            return _COMMA_OR_END if stack else _DONE
+        if kind == "{":
+            stack.append(kind)
+            return _KEY_OR_END
+        if kind == "[":
+            stack.append(kind)
+            return _VALUE_OR_END
+        if kind == "]" and expect == _VALUE_OR_END:
+            stack.pop()
+            return _COMMA_OR_END if stack else _DONE
+        raise ValueError(f"unexpected {kind!r}, expected a value")
+    if expect == _COMMA_OR_END:
+        top = stack[-1]
+        if kind == ",":
+            return _KEY if top == "{" else _VALUE
+        if (kind == "}" and top == "{") or (kind == "]" and top == "["):
+            stack.pop()
+            return _COMMA_OR_END if stack else _DONE
+        raise ValueError(f"unexpected {kind!r}, expected ',' or close of {top!r}")
+    if expect == _COLON_NEXT:
+        if kind != ":":
+            raise ValueError(f"unexpected {kind!r}, expected ':'")
+        return _VALUE
+    if expect == _DONE:
+        raise ValueError("trailing data after JSON document")
+    # _KEY / _KEY_OR_END
+    if kind == '"':
+        return _COLON_NEXT
+    if kind == "}" and expect == _KEY_OR_END:
+        stack.pop()
+        return _COMMA_OR_END if stack else _DONE
+    raise ValueError(f"unexpected {kind!r}, expected an object key")
+
+
+def validate_json_stream(f: BinaryIO, chunk_size: int = CHUNK_SIZE) -> None:
+    """
+    Chunked JSON validation. Raises ValueError if the document is not valid JSON.
+
+    Memory is bounded by chunk_size + the largest single container/string that has to be
+    buffered. Containers that fit in the buffer are skipped by the C decoder; only the
+    enclosing levels that straddle chunk boundaries are walked token by token.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    match = _JSON_TOKEN.match
+    buf = ""
+    pos = 0
+    eof = False
+    stack: List[str] = []
+    expect = _VALUE
+
+    def refill() -> None:
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + decoder.decode(chunk, final=eof)
+        pos = 0
+
+    while True:
+        if not eof and len(buf) - pos < _LOOKAHEAD:
+            refill()
+            continue
+
+        limit = len(buf) if eof else len(buf) - _LOOKAHEAD
+        start_pos = pos
+        while pos < limit:
+            m = match(buf, pos)
+            if m is None or (m.end() == len(buf) and not eof):
+                break
+            i = m.lastindex
+            if i == 3:
+                kind = buf[m.end() - 1]
+                if expect <= _VALUE_OR_END and (kind == "{" or kind == "["):
+                    try:
+                        _, end = _raw_decode(buf, m.end() - 1)
+                    except ValueError:
+                        end = -1  # incomplete in this buffer (or invalid): walk it token by token
+                    if end != -1:
+                        expect = _advance(expect, stack, "v")
+                        pos = end
+                        continue
+            else:
+                kind = '"' if i == 1 else "v"
+            expect = _advance(expect, stack, kind)
+            pos = m.end()
+        if pos != start_pos:
+            continue
+
+        # token at pos is incomplete (long string) or invalid
+        if eof:
+            rest = buf[pos:].strip()
+            if rest:
+                raise ValueError(f"invalid JSON token near: {rest[:40]!r}")
+            break
+        rest = buf[pos:].lstrip()
+        if rest and rest[0] not in _TOKEN_START:
+            raise ValueError(f"invalid JSON token near: {rest[:40]!r}")
+        if len(rest) > MAX_TOKEN_BYTES:
+            raise ValueError(f"JSON token larger than {MAX_TOKEN_BYTES} bytes")
+        refill()
+
+    if expect != _DONE:
+        raise ValueError("unexpected end of JSON document")
+
+
+def check_json_valid(path: str, chunk_size: int = CHUNK_SIZE) -> Tuple[bool, str]:
+    if not os.path.exists(path):
+        return _fail(f"JSON missing: {path}")
+    try:
+        with open(path, "rb") as f:
+            validate_json_stream(f, chunk_size=chunk_size)
+    except ValueError as e:
+        return _fail(f"Invalid JSON in {path}: {e}")
+    return _ok(f"OK: {path} is valid JSON")
+
+
+# ----------------------------------------------------------------------
+# JSONL / size / hash
+# ----------------------------------------------------------------------
+def count_lines(path: str, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Count newline-delimited lines (a trailing line without '\\n' counts too).
+    """
+    n = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            n += chunk.count(b"\n")
+            last = chunk[-1:]
+    if last != b"\n":
+        n += 1
+    return n
+
+
+def check_jsonl_min_lines(path: str, n: int) -> Tuple[bool, str]:
+    if not os.path.exists(path):
+        return _fail(f"JSONL missing for line count check: {path}")
+    lines = count_lines(path)
+    if lines < n:
+        return _fail(f"JSONL {path} has too few lines: {lines} < {n}")
+    return _ok(f"OK: JSONL {path} has >= {n} lines ({lines})")
+
+
+def check_file_size(path: str, min_bytes: Optional[int] = None, max_bytes: Optional[int] = None) -> Tuple[bool, str]:
+    if not os.path.exists(path):
+        return _fail(f"File missing for size check: {path}")
+    size = os.path.getsize(path)
+    if min_bytes is not None and size < min_bytes:
+        return _fail(f"File {path} too small: {size} < {min_bytes} bytes")
+    if max_bytes is not None and size > max_bytes:
+        return _fail(f"File {path} too large: {size} > {max_bytes} bytes")
+    return _ok(f"OK: file {path} size={size} bytes")
+
+
+def sha256_file(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Chunked mmap hashing: pages are mapped on demand, never read into one buffer.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for off in range(0, size, chunk_size):
+                h.update(mm[off:off + chunk_size])
+    return h.hexdigest()
+
+
+def check_sha256(path: str, expected: str) -> Tuple[bool, str]:
+    if not os.path.exists(path):
+        return _fail(f"File missing for hash check: {path}")
+    digest = sha256_file(path)
+    if digest != expected.strip().lower():
+        return _fail(f"sha256 mismatch for {path}: got {digest}, expected {expected}")
+    return _ok(f"OK: sha256 of {path} matches")
@@ -6,6 +6,14 @@ from typing import Dict, List, Optional, Tuple
 
 from ..specs.task_spec import TaskSpec
 from ..schemas.tool import ToolResult
+from ..runtime import metrics, tracing
+from .artifact_checks import (
+    check_file_size,
+    check_image_size,
+    check_json_valid,
+    check_jsonl_min_lines,
+    check_sha256,
+)
 
 
 @dataclass
@@ -84,43 +92,79 @@ def _init_gaps() -> Dict[str, object]:
         "missing_files": [],            # list[str]
         "csv_missing_columns": {},      # dict[file, list[cols]]
         "csv_rows_needed": {},          # dict[file, int]
+        "artifact_errors": {},          # dict[file, str] (image/json/jsonl/size/hash)
         "stdout_error": None,           # str|None
     }
 
 
-def verify(spec: TaskSpec, last: Optional[ToolResult], check_stdout: bool = True) -> VerifyResult:
+def verify(
+    spec: TaskSpec, last: Optional[ToolResult], check_stdout: bool = True, root: Optional[str] = None
+) -> VerifyResult:
     """
     If check_stdout=False: validate ONLY artifacts (files/csv schema/rows) and return structured gaps.
     If check_stdout=True: validate artifacts + stdout constraints.
+    root: directory relative spec paths are checked in (a candidate's workspace); gaps keep the
+    spec's paths.
     """
+    with tracing.span("verify", cat="verify", check_stdout=check_stdout) as sp:
+        res = _verify(spec, last, check_stdout, root)
+        metrics.VERIFY.inc(mode="full" if check_stdout else "artifacts", ok=str(res.ok).lower())
+        sp.set(ok=res.ok)
+        return res
+
+
+def _verify(spec: TaskSpec, last: Optional[ToolResult], check_stdout: bool, root: Optional[str] = None) -> VerifyResult:
     msgs: List[str] = []
     gaps: Dict[str, object] = _init_gaps()
 
+    def at(path: str) -> str:
+        return path if root is None else os.path.join(root, path)
+
     # 1) required files
     for f in spec.required_files:
-        ok, msg = check_file_exists(f)
+        ok, msg = check_file_exists(at(f))
         msgs.append(msg)
         if not ok:
             gaps["missing_files"].append(f)
 
     # 2) CSV schema constraints
     for path, cols in spec.csv_required_columns.items():
-        ok, msg = check_csv_has_columns(path, cols)
+        ok, msg = check_csv_has_columns(at(path), cols)
         msgs.append(msg)
         if not ok:
             gaps["csv_missing_columns"][path] = cols
 
     # 3) CSV row count constraints
     for path, n in spec.csv_min_rows.items():
-        ok, msg = check_csv_min_rows(path, n)
+        ok, msg = check_csv_min_rows(at(path), n)
         msgs.append(msg)
         if not ok:
             gaps["csv_rows_needed"][path] = n
 
+    # 4) header-only artifact constraints (never load whole files)
+    def _artifact(path: str, result: Tuple[bool, str]) -> None:
+        ok, msg = result
+        msgs.append(msg)
+        if not ok and path not in gaps["artifact_errors"]:
+            gaps["artifact_errors"][path] = msg
+
+    for path, size in spec.image_min_size.items():
+        w, h = (list(size) + [1, 1])[:2]
+        _artifact(path, check_image_size(at(path), int(w), int(h)))
+    for path in spec.json_valid_files:
+        _artifact(path, check_json_valid(at(path)))
+    for path, n in spec.jsonl_min_lines.items():
+        _artifact(path, check_jsonl_min_lines(at(path), n))
+    for path in sorted(set(spec.file_min_bytes) | set(spec.file_max_bytes)):
+        _artifact(path, check_file_size(at(path), spec.file_min_bytes.get(path), spec.file_max_bytes.get(path)))
+    for path, digest in spec.file_sha256.items():
+        _artifact(path, check_sha256(at(path), digest))
+
     artifacts_ok = (
         len(gaps["missing_files"]) == 0
         and len(gaps["csv_missing_columns"]) == 0
         and len(gaps["csv_rows_needed"]) == 0
+        and len(gaps["artifact_errors"]) == 0
     )
 
     if not check_stdout:
@@ -136,7 +180,7 @@ def verify(spec: TaskSpec, last: Optional[ToolResult], check_stdout: bool = True
             gaps=gaps,
         )
 
-    # 4) stdout constraints
+    # 5) stdout constraints
     stdout = ""
     if last is not None and getattr(last, "output", None) is not None:
         stdout = str(last.output)
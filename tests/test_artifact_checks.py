@@ -0,0 +1,80 @@
+import json
+import struct
+import zlib
+
+from src.agent_core.specs.task_spec import TaskSpec
+from src.agent_core.verify.artifact_checks import (
+    check_image_size,
+    check_json_valid,
+    check_jsonl_min_lines,
+    check_sha256,
+    sha256_file,
+)
+from src.agent_core.verify.verifier import verify_artifacts_only
+
+
+def _png(w: int, h: int) -> bytes:
+    ihdr = struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)
+    chunk = struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    return b"\x89PNG\r\n\x1a\n" + chunk
+
+
+def _jpeg(w: int, h: int) -> bytes:
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof0 = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, h, w, 1) + b"\x01\x11\x00"
+    return b"\xff\xd8" + app0 + sof0 + b"\xff\xd9"
+
+
+def test_image_size_from_header(tmp_path):
+    png = tmp_path / "plot.png"
+    png.write_bytes(_png(640, 480))
+    jpg = tmp_path / "photo.jpg"
+    jpg.write_bytes(_jpeg(32, 16))
+
+    assert check_image_size(str(png), 100, 100)[0]
+    assert not check_image_size(str(png), 1000, 100)[0]
+    assert "jpeg 32x16" in check_image_size(str(jpg))[1]
+    (tmp_path / "fake.png").write_text("not an image")
+    assert not check_image_size(str(tmp_path / "fake.png"))[0]
+
+
+def test_json_stream_validation(tmp_path):
+    good = tmp_path / "good.json"
+    good.write_text(json.dumps({"a": [1, 2.5e3, "x\\\"y", None, True], "b": {"c": "é" * 50}}))
+    bad = tmp_path / "bad.json"
+    bad.write_text('{"a": [1, 2,], "b": 3}')
+    trailing = tmp_path / "trailing.json"
+    trailing.write_text('{"a": 1} {"b": 2}')
+
+    # tiny chunks force tokens to straddle chunk boundaries
+    for size in (3, 4, 7):
+        assert check_json_valid(str(good), chunk_size=size)[0]
+        assert not check_json_valid(str(bad), chunk_size=size)[0]
+        assert not check_json_valid(str(trailing), chunk_size=size)[0]
+
+
+def test_jsonl_and_hash(tmp_path):
+    p = tmp_path / "rows.jsonl"
+    p.write_text('{"i": 1}\n{"i": 2}\n{"i": 3}')
+    assert check_jsonl_min_lines(str(p), 3)[0]
+    assert not check_jsonl_min_lines(str(p), 4)[0]
+
+    digest = sha256_file(str(p))
+    assert check_sha256(str(p), digest)[0]
+    assert not check_sha256(str(p), "0" * 64)[0]
+
+
+def test_verify_reports_artifact_gaps(tmp_path):
+    png = tmp_path / "plot.png"
+    png.write_bytes(_png(10, 10))
+    spec = TaskSpec(task="t")
+    spec.image_min_size = {str(png): [20, 20]}
+    spec.file_max_bytes = {str(png): 1}
+
+    v = verify_artifacts_only(spec)
+    assert not v.ok
+    assert str(png) in v.gaps["artifact_errors"]
+
+    spec.image_min_size = {str(png): [10, 10]}
+    spec.file_max_bytes = {}
+    assert verify_artifacts_only(spec).ok
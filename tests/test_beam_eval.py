@@ -0,0 +1,58 @@
+import time
+
+from src.agent_core.search.beam import evaluate_candidates
+from src.agent_core.tools import TOOLS
+from src.agent_core.specs.task_spec import TaskSpec
+
+
+def test_first_success_cancels_slow_candidates_in_isolated_workspaces(tmp_path):
+    (tmp_path / "data.csv").write_text("x\n1\n2\n")
+    spec = TaskSpec(task="sum x", required_files=["out.txt"], stdout_is_number=True)
+    cands = [
+        {"name": "shell_exec", "args": {"cmd": "sleep 20; echo > out.txt; echo 3"}},
+        {"name": "python_exec", "args": {"code": (
+            "import csv\nrows = list(csv.DictReader(open('data.csv')))\n"
+            "open('out.txt', 'w').write('ok')\nprint(sum(int(r['x']) for r in rows))")}},
+        {"name": "shell_exec", "args": {"cmd": "echo not-a-number > out.txt; echo nope"}},
+        {"name": "pip_install", "args": {"packages": "nothing"}},
+    ]
+    t0 = time.perf_counter()
+    ev = evaluate_candidates(cands, spec, allowed=["shell_exec", "python_exec"], base=str(tmp_path), timeout=30)
+    try:
+        assert time.perf_counter() - t0 < 10
+        assert ev.winner is not None and ev.winner.index == 1 and ev.winner.result.output == "3"
+        assert [e.status for e in ev.evals] == ["cancelled", "done", "done", "skipped"]
+        assert not ev.evals[2].verify_ok and ev.evals[2].gaps["stdout_error"]
+        assert not (tmp_path / "out.txt").exists()  # nothing leaks before adopt()
+        assert ev.adopt(ev.winner) == ["out.txt"] and (tmp_path / "out.txt").read_text() == "ok"
+        assert ev.evals[0].to_json()["score"] is None
+    finally:
+        ev.cleanup()
+
+
+def test_candidates_cannot_write_outside_their_workspace(tmp_path, monkeypatch):
+    seen = {}
+
+    def fake_pip(args, **kw):
+        seen["pip"] = kw
+        return "ok"
+
+    monkeypatch.setitem(TOOLS, "pip_install", fake_pip)
+    outside = tmp_path / "outside.txt"
+    spec = TaskSpec(task="write", required_files=["a.txt"])
+    cands = [
+        {"name": "file_write", "args": {"path": str(outside), "content": "clobbered"}},
+        {"name": "file_write", "args": {"path": "../outside.txt", "content": "clobbered"}},
+        {"name": "file_write", "args": {"path": "a.txt", "content": "ok"}},
+        {"name": "pip_install", "args": {"packages": "pandas"}},
+    ]
+    base = tmp_path / "base"
+    base.mkdir()
+    ev = evaluate_candidates(cands, spec, allowed=["file_write", "pip_install"], base=str(base), race=False, timeout=5)
+    try:
+        assert [e.result.ok for e in ev.evals] == [False, False, True, True]
+        assert "timeout" not in seen["pip"]  # pip keeps its own (600 s) limit
+        assert "outside the working directory" in ev.evals[0].result.error
+        assert not outside.exists()
+    finally:
+        ev.cleanup()
@@ -0,0 +1,41 @@
+from src.agent_core.search.beam_search import BeamSearch
+from src.agent_core.specs.task_spec import TaskSpec
+
+USERS = {"name": "file_write", "args": {"path": "users.csv", "content": "id,name\n1,a\n2,b\n"}}
+EVENTS = {"name": "file_write", "args": {"path": "events.csv", "content": "user_id,event\n1,x\n2,y\n2,z\n"}}
+COUNT = {"name": "python_exec", "args": {"code": "print(sum(1 for _ in open('events.csv')) - 1)"}}
+
+
+def propose(task, obs, k):
+    gaps = obs.split("GAPS:")[1].split("\n")[0]
+    junk = {"name": "file_write", "args": {"path": "notes.txt", "content": "todo"}}
+    if "'missing_files': []" not in gaps:
+        return [junk, USERS if "users.csv" in gaps else EVENTS, {"name": "shell_exec", "args": {"cmd": "false"}}][:k]
+    return [{"name": "python_exec", "args": {"code": "print('n/a')"}}, COUNT][:k]
+
+
+def test_finds_three_step_trajectory_and_logs_tree(tmp_path):
+    spec = TaskSpec(task="write users.csv and events.csv, print the event count", stdout_is_number=True,
+                    required_files=["users.csv", "events.csv"],
+                    csv_required_columns={"users.csv": ["id", "name"], "events.csv": ["user_id", "event"]})
+    saved = {}
+    res = BeamSearch(spec, propose_fn=propose, width=2, k=3, base=str(tmp_path),
+                     save=lambda name, obj: saved.__setitem__(name, obj)).run()
+
+    assert res.ok and [n.action for n in res.path] == [USERS, EVENTS, COUNT]
+    assert res.path[-1].result.output == "3" and res.llm_calls <= 5
+    assert (tmp_path / "events.csv").exists() and not (tmp_path / "notes.txt").exists()
+    tree = saved["search_tree.json"]
+    assert tree["ok"] and tree["path"] == [n.id for n in res.path]
+    assert {n["status"] for n in tree["nodes"]} >= {"expanded", "pruned", "verified"}
+    assert all(n.workspace is None or not n.workspace.root.exists() for n in res.nodes)
+
+
+def test_root_carries_csv_min_rows_inputs(tmp_path):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "rows.csv").write_text("a\n1\n2\n")
+    spec = TaskSpec(task="count data rows", stdout_is_number=True, csv_min_rows={"data/rows.csv": 2})
+    count = {"name": "python_exec", "args": {"code": "print(sum(1 for _ in open('data/rows.csv')) - 1)"}}
+    res = BeamSearch(spec, propose_fn=lambda task, obs, k: [count], width=1, k=1, base=str(tmp_path)).run()
+
+    assert res.ok and res.path[-1].result.output == "2"
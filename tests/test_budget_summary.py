@@ -0,0 +1,50 @@
+import json
+
+from src.agent_core.llm.budget_summary import estimate_tokens, summarize_episodes, summary_json
+
+TB = 'Traceback (most recent call last):\n  File "/tmp/run_{}/x.py", line 3, in <module>\nKeyError: \'price\''
+
+
+def _step(i, ok, code="x", error=None):
+    return {"step": i, "action": {"name": "python_exec", "args": {"code": code}},
+            "result": {"name": "python_exec", "ok": ok, "output": "o" * 1000, "error": error}}
+
+
+def _episode(e):
+    hist = [_step(i, False, "same", TB.format(e)) for i in range(1, 6)]  # identical retries
+    hist += [_step(6, False, "other", "ValueError: bad"), _step(7, True, "print(1)")]
+    return {"task": f"t{e}", "history": hist, "meta": {"ok": True}}
+
+
+def test_keeps_key_steps_collapses_repeats_and_dedupes_tracebacks():
+    out = summarize_episodes([_episode(e) for e in range(3)], budget_tokens=100000)
+    assert set(out["errors"]) == {"E1", "E2"}  # one KeyError text across episodes (paths normalized)
+    steps = out["episodes"][0]["history"]
+    assert [s["step"] for s in steps] == [1, 6, 7] and steps[0]["repeat"] == 5
+    assert steps[0]["result"]["error"] == "E1" and len(steps[2]["result"]["output"]) < 400
+
+
+def test_budget_is_respected_and_output_is_valid_json():
+    eps = [_episode(e) for e in range(50)]
+    for budget in (200, 1000, 4000):
+        text = summary_json(eps, budget)
+        d = json.loads(text)
+        assert estimate_tokens(text) <= budget
+        assert all(ep["history"][-1]["step"] == 7 for ep in d["episodes"])  # winning step kept first
+        assert d["episodes"][-1]["task"] == "t49"  # newest episodes win the budget
+        assert len(d["episodes"]) + d.get("omitted_episodes", 0) == 50
+
+
+def test_newest_first_source_is_read_only_as_far_as_the_budget_needs():
+    pulled = []
+
+    def newest_first():
+        for e in range(499, -1, -1):
+            pulled.append(e)
+            yield _episode(e)
+
+    out = summarize_episodes(newest_first(), budget_tokens=1000, newest_first=True)
+    assert len(pulled) < 50 and out["unread_episodes"] is True
+    assert out["episodes"][-1]["task"] == "t499"  # still oldest first in the output
+    read = sorted(pulled[:-1])  # the last one pulled only showed that older episodes exist
+    assert out == summarize_episodes([_episode(e) for e in read], budget_tokens=1000) | {"unread_episodes": True}
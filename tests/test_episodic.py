@@ -0,0 +1,60 @@
+import threading
+
+from src.agent_core.memory.episodic import EpisodicMemory
+
+
+def test_concurrent_saves_get_unique_ids_and_iterate_lazily(tmp_path):
+    (tmp_path / "episode_0007.json").write_text('{"task": "legacy", "history": [], "meta": {}}')
+    mem = EpisodicMemory(str(tmp_path))
+
+    def worker(w):
+        for i in range(10):
+            EpisodicMemory(str(tmp_path)).save_episode(f"t{w}", [{"step": i}], {"ok": i % 2 == 0})
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    ids = [ep["id"] for ep in mem.iter_episodes()]
+    assert ids == [7] + list(range(8, 48))  # continues after the legacy file, no duplicates
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+    newest = list(mem.iter_episodes(filter=lambda ep: ep["meta"].get("ok"), newest_first=True, limit=3))
+    assert [ep["id"] for ep in newest] == sorted((ep["id"] for ep in newest), reverse=True)
+    assert len(newest) == 3 and all(ep["meta"]["ok"] for ep in newest)
+    assert mem.load_all()[0]["task"] == "legacy"
+    assert not (tmp_path / "lsh.db").exists()  # saving does not touch the index
+    hits = mem.similar_episodes("t2", k=20, ok=True)
+    mem.save_episode("t2", [], {"ok": True})
+    assert len(mem.similar_episodes("t2", k=20, ok=True)) == 6  # indexed on the next query
+    assert len(hits) == 5 and all(ep["task"] == "t2" and ep["meta"]["ok"] for _, ep in hits)
+
+
+def test_jsonl_backend_reads_steps_and_compacts(tmp_path):
+    legacy = EpisodicMemory(str(tmp_path))
+    legacy.save_episode("old", [{"step": 1}], {"ok": False})
+
+    mem = EpisodicMemory(str(tmp_path), backend="jsonl")
+    mem.store.seg_max_bytes = 200  # force several segments
+    for e in range(6):
+        mem.save_episode(f"t{e}", [{"step": i, "out": "x" * 20} for i in range(10)], {"e": e})
+
+    assert [s["step"] for s in mem.last_steps(4, 3)] == [7, 8, 9]
+    assert mem.load(1)["task"] == "old" and mem.load(7)["meta"] == {"e": 5}
+    assert len(mem.store._segments()) > 2
+
+    res = mem.compact()
+    assert res["legacy_imported"] == 1 and res["segments_merged"] >= 2
+    assert not (tmp_path / "episode_0001.json").exists()
+    assert [ep["id"] for ep in mem.iter_episodes()] == list(range(1, 8))
+    steps_idx = tmp_path / "jsonl" / "steps.idx"
+    assert steps_idx.stat().st_size == 61 * 12  # live step records only: 1 legacy + 6 x 10
+    mem.store.compact(min_segments=1)
+    assert steps_idx.stat().st_size == 61 * 12
+
+    mem.save_episode("after", [{"step": 0}])  # appends keep working after compaction
+    other = EpisodicMemory(str(tmp_path), backend="jsonl")
+    assert [s["step"] for s in other.last_steps(5, 2)] == [8, 9]
+    assert other.load(8)["task"] == "after" and other.load(1)["history"] == [{"step": 1}]
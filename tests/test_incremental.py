@@ -0,0 +1,59 @@
+from src.agent_core.learning.incremental import Watermarks, mine_new_runs, reflect_new_episodes
+from src.agent_core.learning.rule_store import RuleStore
+from src.agent_core.memory.episodic import EpisodicMemory
+from src.agent_core.runtime.run_catalog import RunCatalog, RunRecord
+
+
+def test_reflects_only_new_episodes_and_rebuilds_on_request(tmp_path):
+    mem = EpisodicMemory(str(tmp_path / "memory"))
+    store, marks = RuleStore(str(tmp_path / "rules.json")), Watermarks(str(tmp_path / "state.json"))
+    seen = []
+
+    def reflect_fn(eps):
+        seen.append([ep["id"] for ep in eps])
+        return {"rules": [f"rule from {ep['task']}" for ep in eps]}
+
+    for i in range(5):
+        mem.save_episode(f"t{i}", [])
+    store.add(["hand-written rule"])
+    store.save()
+    assert reflect_new_episodes(mem, reflect_fn, store, marks, batch=3).processed == 3  # newest batch only
+    assert reflect_new_episodes(mem, reflect_fn, store, marks, batch=3).processed == 0  # nothing new: no call
+    mem.save_episode("t5", [])
+    r = reflect_new_episodes(mem, reflect_fn, store, marks, batch=3)
+    assert seen == [[3, 4, 5], [6]] and r.rules_added == ["rule from t5"] and r.watermark == 6
+
+    loaded = RuleStore(str(tmp_path / "rules.json"))
+    loaded.load()
+    assert loaded.provenance["rule from t5"][0]["source"] == "reflect:episodic:6-6"
+
+    r = reflect_new_episodes(mem, reflect_fn, store, marks, batch=4, rebuild=True)
+    assert seen[2:] == [[1, 2, 3, 4], [5, 6]] and r.watermark == 6
+    assert store.rules[0] == "hand-written rule" and len(store.rules) == 7
+
+    late = mem._allocate_id()  # a writer that has not written its episode yet
+    mem.save_episode("t8", [])
+    assert reflect_new_episodes(mem, reflect_fn, store, marks).processed == 0 and marks.get("reflect:episodic") == 6
+    mem.path_for(late).write_text('{"task": "t7", "history": [], "meta": {}}')
+    assert reflect_new_episodes(mem, reflect_fn, store, marks).processed == 2 and seen[-1] == [7, 8]
+
+
+def test_mines_runs_after_watermark(tmp_path):
+    catalog = RunCatalog(str(tmp_path / "catalog.db"))
+    for i in range(4):
+        catalog.start_run(RunRecord(f"r{i}", "t", None, None, "done" if i != 1 else "failed", "", float(i),
+                                    finished_at=float(i) + 0.5))
+    marks = Watermarks(str(tmp_path / "state.json"))
+    store = RuleStore(str(tmp_path / "rules.json"))
+    mine = lambda eps: [f"rule {ep['run']}" for ep in eps]
+    load = lambda rec: {"run": rec.run_id, "history": []}
+
+    assert mine_new_runs(catalog, load, mine, store, marks, batch=2).rules_added == ["rule r2", "rule r3"]
+    catalog.start_run(RunRecord("r4", "t", None, None, "done", "", 4.0, finished_at=4.5))
+    r = mine_new_runs(catalog, load, mine, store, marks, batch=2)
+    assert r.rules_added == ["rule r4"] and r.watermark == {"finished_at": 4.5, "run_id": "r4"}
+
+    # started before r4, finished after it was mined (a parallel worker or a long search)
+    catalog.start_run(RunRecord("r5", "t", None, None, "running", "", 3.9))
+    catalog.finish_run("r5", "done", finished_at=9.0)
+    assert mine_new_runs(catalog, load, mine, store, marks, batch=2).rules_added == ["rule r5"]
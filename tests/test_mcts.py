@@ -0,0 +1,40 @@
+from src.agent_core.search.mcts import MCTS, gap_reward
+from src.agent_core.specs.task_spec import TaskSpec
+
+WRITE = {"name": "file_write", "args": {"path": "data.csv", "content": "x\n1\n2\n"}}
+SUM = {"name": "python_exec", "args": {"code": "print(sum(int(l) for l in open('data.csv').read().split()[1:]))"}}
+
+
+def _spec():
+    return TaskSpec(task="write data.csv then print the sum", required_files=["data.csv"],
+                    csv_required_columns={"data.csv": ["x"]}, stdout_is_number=True)
+
+
+def test_mcts_finds_verified_trajectory_and_backpropagates(tmp_path):
+    def propose(task, obs, k):
+        if "'missing_files': ['data.csv']" in obs:
+            return [{"name": "shell_exec", "args": {"cmd": "echo hi"}}, WRITE]
+        return [{"name": "python_exec", "args": {"code": "print('x')"}}, SUM]
+
+    saved = {}
+    res = MCTS(_spec(), propose_fn=propose, k=2, base=str(tmp_path), save=saved.__setitem__).run()
+    assert res.ok and [n.action for n in res.path] == [WRITE, SUM] and res.llm_calls == 2
+    assert (tmp_path / "data.csv").exists()
+    tree = saved["mcts_tree.json"]
+    root = tree["nodes"][0]
+    assert root["visits"] == 3  # executed children backpropagate; the pre-scored no-op never runs
+    assert [n["status"] for n in tree["nodes"][1:4]] == ["prefiltered", "expanded", "transposed"]
+    assert tree["avoided"] == 1
+
+
+def test_mcts_stops_at_llm_call_budget(tmp_path):
+    calls = []
+
+    def propose(task, obs, k):
+        calls.append(obs)
+        return [{"name": "file_write", "args": {"path": f"f{len(calls)}_{i}.txt", "content": "x"}} for i in range(k)]
+
+    res = MCTS(_spec(), propose_fn=propose, k=2, max_llm_calls=3, base=str(tmp_path)).run()
+    assert not res.ok and res.llm_calls == 3 == len(calls) and res.executions == 6
+    assert not list(tmp_path.iterdir())  # nothing promoted without a verified trajectory
+    assert gap_reward({"missing_files": ["a"]}) < gap_reward({"stdout_error": "x"}) < 1.0
@@ -0,0 +1,35 @@
+import urllib.request
+
+from src.agent_core.runtime import metrics
+from src.agent_core.runtime.executor import execute_tool
+from src.agent_core.schemas.tool import ToolCall
+
+
+def test_prometheus_text_format():
+    reg = metrics.Registry()
+    c = reg.counter("jobs_total", "Jobs.", ("kind",))
+    h = reg.histogram("lat_seconds", "Latency.", buckets=(0.1, 1.0))
+    c.inc(kind='a"b')
+    c.inc(2, kind='a"b')
+    for v in (0.05, 0.5, 5.0):
+        h.observe(v)
+    text = reg.render()
+    assert '# TYPE jobs_total counter\njobs_total{kind="a\\"b"} 3\n' in text
+    assert 'lat_seconds_bucket{le="0.1"} 1\nlat_seconds_bucket{le="1"} 2\nlat_seconds_bucket{le="+Inf"} 3\n' in text
+    assert "lat_seconds_sum 5.55\nlat_seconds_count 3\n" in text
+
+
+def test_tools_and_episodes_recorded_and_served():
+    before = metrics.TOOL_CALLS.value(tool="shell_exec", ok="true")
+    with metrics.episode("beam") as ep:
+        ep["ok"] = execute_tool(ToolCall(name="shell_exec", args={"cmd": "true"})).ok
+    assert metrics.TOOL_CALLS.value(tool="shell_exec", ok="true") == before + 1
+    assert metrics.EPISODES_RUNNING.value(strategy="beam") == 0
+
+    server = metrics.serve_http(0)
+    try:
+        body = urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics").read().decode()
+    finally:
+        server.shutdown()
+    assert 'agent_episodes_total{strategy="beam",ok="true"} 1' in body
+    assert 'agent_tool_latency_seconds_count{tool="shell_exec"}' in body
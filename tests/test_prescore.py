@@ -0,0 +1,63 @@
+from src.agent_core.runtime import metrics
+from src.agent_core.search.beam import evaluate_candidates
+from src.agent_core.search.prescore import prescore, rank_candidates
+from src.agent_core.specs.task_spec import TaskSpec
+
+SPEC = TaskSpec(task="write users.csv", required_files=["users.csv"],
+                csv_required_columns={"users.csv": ["id", "name"]}, csv_min_rows={"users.csv": 2})
+GAPS = {"missing_files": ["users.csv"], "csv_missing_columns": {"users.csv": ["id", "name"]},
+        "csv_rows_needed": {"users.csv": 2}, "artifact_errors": {}, "stdout_error": None}
+GOOD = {"name": "file_write", "args": {"path": "users.csv", "content": "id,name\n1,a\n2,b\n"}}
+CANDS = [
+    {"name": "shell_exec", "args": {"cmd": "ls -l && cat README.md"}},
+    {"name": "file_write", "args": {"path": "users.csv", "content": "id\n1\n"}},
+    GOOD,
+    {"name": "python_exec", "args": {"code": "import csv\ncsv.writer(open('users.csv', 'w')).writerow(['id', 'name'])"}},
+    {"name": "file_write", "args": {"path": "./users.csv", "content": "id,name\n1,a\n2,b\n"}},
+    {"name": "pip_install", "args": {"packages": "pandas"}},
+]
+
+
+def test_ranks_gap_closing_writes_and_drops_noops():
+    assert prescore(GOOD, GAPS, SPEC).closes == ["missing_files:users.csv", "csv_missing_columns:users.csv",
+                                                 "csv_rows_needed:users.csv"]
+    r = rank_candidates(CANDS, GAPS, SPEC, allowed=["shell_exec", "python_exec", "file_write"], top_m=2)
+    assert r.run == [2, 3] and r.dropped[1] == "below_top_m"  # a header missing "name" scores below the writer
+    assert r.dropped[0] == "no_op" and r.dropped[4] == "duplicate" and r.duplicate_of[4] == 2
+    assert r.dropped[5] == "disallowed" and len(r.run) + len(r.dropped) == len(CANDS)
+    # reading a file writes nothing while users.csv is missing; an open() in a write mode does
+    read = {"name": "python_exec", "args": {"code": "print(open('README.md').read())"}}
+    assert prescore(read, GAPS, SPEC).drop == "no_op"
+    append = {"name": "python_exec", "args": {"code": "with open('users.csv', mode='a') as f:\n    f.writelines(rows)"}}
+    assert prescore(append, GAPS, SPEC).closes == ["missing_files:users.csv"]
+
+
+
+def test_python_is_dropped_only_on_read_only_evidence():
+    gaps = {"missing_files": ["plot.png"]}
+
+    def score(code):
+        return prescore({"name": "python_exec", "args": {"code": code}}, gaps)
+
+    for code in ('from PIL import Image\nImage.new("RGB", (8, 8)).save("plot.png")',
+                 'import numpy as np\nnp.savetxt("plot.png", np.zeros(3))'):
+        assert score(code).drop is None and score(code).closes == ["missing_files:plot.png"]
+    unknown = score('import numpy as np\nnp.zeros(3).tofile("plot.png")')  # no known write API: kept, lower
+    assert unknown.drop is None and 0 < unknown.score < score('Image.new("RGB", (8, 8)).save("plot.png")').score
+    assert score("import os\nos.remove('old.png')").drop is None  # may touch the disk: not provably read-only
+    assert score("rows = open('data.csv').readlines()\nprint(len(rows))").drop == "no_op"
+    assert score("print(").drop is None  # unparseable: no evidence either way
+    # once artifacts are fine, printing beats not printing
+    assert prescore({"name": "python_exec", "args": {"code": "print(2)"}}, {}).score > prescore(GOOD, {}).score
+
+
+def test_evaluator_executes_only_top_m_and_counts_avoided(tmp_path):
+    before = metrics.EXECUTIONS_AVOIDED.value(reason="no_op")
+    ev = evaluate_candidates(CANDS, SPEC, allowed=["shell_exec", "python_exec", "file_write"], base=str(tmp_path),
+                             gaps=GAPS, top_m=1)
+    try:
+        assert [e.status for e in ev.evals] == ["prefiltered", "prefiltered", "done", "prefiltered", "duplicate", "skipped"]
+        assert ev.winner is ev.evals[2] and ev.avoided == 5
+        assert metrics.EXECUTIONS_AVOIDED.value(reason="no_op") == before + 1
+    finally:
+        ev.cleanup()
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from src.agent_core.llm.reflection_mr import dedupe_rules, reflect_map_reduce
+
+
+def _eps(n):
+    return [{"task": f"task {i % 5}", "history": [{"step": 1, "result": {"ok": i % 2 == 0, "error": "KeyError: 'x'"}}]}
+            for i in range(n)]
+
+
+def test_shards_run_concurrently_and_failed_shards_resume(tmp_path):
+    active, peak, fail = [0], [0], {"task 3"}
+    lock = threading.Lock()
+
+    def reflect_fn(eps):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        if eps[0]["task"] in fail:
+            raise RuntimeError("model timeout")
+        return {"rules": [f"Rule for {eps[0]['task']}.", "Always print the final answer to stdout"]}
+
+    res = reflect_map_reduce(_eps(100), concurrency=4, shard_size=10, state_dir=str(tmp_path), reflect_fn=reflect_fn,
+                             reduce_fn=lambda rules, n: rules[:n])
+    assert res.shards == 10 and peak[0] == 4 and len(res.failed) == 2
+    assert res.rules[0] == "Always print the final answer to stdout"  # proposed by every shard
+
+    fail.clear()
+    again = reflect_map_reduce(_eps(100), concurrency=4, shard_size=10, state_dir=str(tmp_path), reflect_fn=reflect_fn,
+                               reduce_fn=lambda rules, n: rules[:n])
+    assert (again.resumed, again.failed) == (8, {}) and "Rule for task 3." in again.rules
+
+
+def test_dedupe_rules_merges_near_duplicates():
+    rules = [
+        "Verify file paths and existence before reading files.",
+        "verify file paths and existence before reading files",
+        "Verify file paths and existence before reading any files.",
+        "Use pip_install when a module is missing.",
+    ]
+    assert dedupe_rules(rules) == [rules[0], rules[3]]
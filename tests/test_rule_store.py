@@ -0,0 +1,60 @@
+import json
+import multiprocessing
+
+import pytest
+
+from src.agent_core.learning.rule_store import RuleStore, SQLiteRuleStore
+
+
+def test_merges_near_duplicates_and_loads_plain_files(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"rules": [
+        "Verify file paths and existence of input files before executing data manipulation code.",
+        "Verify the file paths and existence of input files before executing any data manipulation code!",
+        "Use pip_install when a module is missing.",
+        "Use pandas to read users.csv and compute the mean age.",
+        "Use pandas to read users.csv then drop duplicate rows before saving.",
+    ]}))
+    store = RuleStore(str(path))
+    assert len(store.load()) == 4  # same opening words, different rules: both survive
+    assert store.records[store.rules[0]].aliases[0].endswith("data manipulation code!")
+    assert store.rules[2:] == ["Use pandas to read users.csv and compute the mean age.",
+                               "Use pandas to read users.csv then drop duplicate rows before saving."]
+
+    assert store.add(["use pip_install when a module is missing", "Prefer the csv module over pandas."], source="s1") == [
+        "Prefer the csv module over pandas."]
+    store.save()
+    again = RuleStore(str(path))
+    assert again.load() == store.rules and again.provenance["Use pip_install when a module is missing."][0]["source"] == "s1"
+
+
+def test_select_ranks_by_task_overlap_and_outcomes_and_evicts(tmp_path):
+    store = RuleStore(str(tmp_path / "rules.json"))
+    store.add(["Plot with matplotlib and save the png before finishing.",
+               "Skip header rows when reading CSV files.",
+               "Retry failed shell commands once with a different approach."])
+    assert store.select("Read data.csv and print the mean of column x", k=1) == ["Skip header rows when reading CSV files."]
+
+    for _ in range(6):
+        store.record_outcome(["Skip header rows when reading CSV files."], ok=False)
+    assert store.select("Read data.csv and print the mean", k=1) != ["Skip header rows when reading CSV files."]
+    assert "Skip header rows when reading CSV files." in store.evict()  # 1/8 smoothed success < 0.2
+
+    store.add([f"Rule number {i} about topic{i} handling." for i in range(10)], max_rules=5)
+    assert len(store.rules) == 5
+
+
+def _contribute(args):
+    cls, path, worker = args
+    store = cls(path)
+    for i in range(8):
+        store.update(lambda s: s.add([f"Worker{worker} prefers tool{worker}x{i} for stage{worker}y{i}."], max_rules=1000))
+
+
+@pytest.mark.parametrize("cls", [RuleStore, SQLiteRuleStore])
+def test_parallel_writers_lose_no_rules(tmp_path, cls):
+    path = str(tmp_path / ("rules.json" if cls is RuleStore else "rules.db"))
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        pool.map(_contribute, [(cls, path, w) for w in range(4)])
+    store = cls(path)
+    assert len(store.load()) == 32
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src.agent_core.runtime.run_log import INDEX_NAME, SEGMENT_NAME, RunLogReader, convert_run_dir, pack_run_dir
+from src.agent_core.runtime.run_manager import RunManager
+
+
+def test_log_layout_roundtrip(tmp_path):
+    with RunManager(str(tmp_path), async_writes=True) as rm:
+        ctx = rm.start(tag="t")
+        rm.save_text(ctx, "task.txt", "do it")
+        for step in (1, 2):
+            rm.save_text(ctx, f"step_{step:02d}_obs.txt", f"obs {step}")
+            rm.save_json(ctx, f"step_{step:02d}_result.json", {"ok": step == 2})
+        rm.save_text(ctx, "final.txt", "FAILED")
+        rm.save_text(ctx, "final.txt", "DONE")
+
+    # one segment + one index instead of a file per artifact
+    assert sorted(p.name for p in ctx.run_dir.iterdir()) == sorted([SEGMENT_NAME, INDEX_NAME])
+
+    r = rm.reader(ctx.run_id)
+    assert r.read_text("final.txt") == "DONE"
+    assert r.steps() == [1, 2]
+    assert r.step_artifacts(2) == {"step_02_obs.txt": "obs 2", "step_02_result.json": {"ok": True}}
+
+    out = r.materialize(tmp_path / "view")
+    assert json.loads((out / "step_01_result.json").read_text()) == {"ok": False}
+
+
+def test_flush_after_close_does_not_block(tmp_path):
+    rm = RunManager(str(tmp_path), async_writes=True)
+    ctx = rm.start(tag="t")
+    rm.save_text(ctx, "a.txt", "1")
+    rm.close()
+    t = threading.Thread(target=lambda: (rm.flush(), rm.flush(), rm.close()), daemon=True)
+    t.start()
+    t.join(timeout=5)
+    assert not t.is_alive()
+    assert rm.reader(ctx.run_id).read_text("a.txt") == "1"
+
+
+def test_index_rebuilt_from_segment_tail(tmp_path):
+    rm = RunManager(str(tmp_path))
+    ctx = rm.start(tag="t")
+    rm.save_text(ctx, "a.txt", "1")
+    rm.save_text(ctx, "b.txt", "2")
+    idx = ctx.run_dir / INDEX_NAME
+    idx.write_text(idx.read_text().splitlines()[0] + "\n")  # simulate a crash before the 2nd index write
+
+    assert RunLogReader(ctx.run_dir).read_text("b.txt") == "2"
+
+
+def test_convert_legacy_run(tmp_path):
+    rm = RunManager(str(tmp_path), layout="files")
+    ctx = rm.start(tag="legacy")
+    rm.save_json(ctx, "history.json", {"history": [1, 2]})
+    rm.save_text(ctx, "final.txt", "DONE")
+    (ctx.run_dir / "plot.png").write_bytes(b"\x89PNG\xff\xfe")
+
+    assert RunLogReader(ctx.run_dir).read_json("history.json") == {"history": [1, 2]}
+    assert convert_run_dir(ctx.run_dir) == 2
+
+    r = RunLogReader(ctx.run_dir)
+    assert r.is_log
+    assert r.read_json("history.json") == {"history": [1, 2]}
+    assert r.names() == ["final.txt", "history.json", "plot.png"]  # binary file left in place
+
+
+def test_catalog_tracks_runs_and_backfills(tmp_path):
+    legacy = RunManager(str(tmp_path), layout="files", catalog=False)
+    old = legacy.start(tag="agent_day12_beam_mean_csv_v1")
+    legacy.save_text(old, "step_02_obs.txt", "x")
+    legacy.save_text(old, "final.txt", "DONE")
+
+    rm = RunManager(str(tmp_path))
+    ctx = rm.start(tag="agent_day13_critic_mean_csv_v1", task_id="mean_csv_v1", strategy="critic")
+    rm.save_text(ctx, "step_04_obs.txt", "y")
+    rm.save_text(ctx, "final.txt", "FAILED")
+
+    assert rm.catalog.ensure_backfilled(str(tmp_path)) == 1
+    assert rm.catalog.ensure_backfilled(str(tmp_path)) == 0
+
+    done = rm.catalog.latest(status="done", task_id="mean_csv_v1")
+    assert [(r.run_id, r.strategy, r.steps) for r in done] == [(old.run_id, "beam", 2)]
+    failed = rm.catalog.get(ctx.run_id)
+    assert (failed.status, failed.steps) == ("failed", 4)
+
+
+
+def test_unfinished_runs_are_aborted_and_abandoned(tmp_path):
+    from src.agent_core.runtime.retention import Retention, RetentionPolicy
+
+    with pytest.raises(ValueError):
+        with RunManager(str(tmp_path), async_writes=True) as rm:
+            ctx = rm.start(tag="crash")
+            rm.save_text(ctx, "step_01_obs.txt", "x")
+            raise ValueError("boom")
+    assert rm.catalog.get(ctx.run_id).status == "failed"
+    assert rm.reader(ctx).read_text("final.txt") == "ABORTED: ValueError: boom"
+
+    stale = rm.start(tag="killed")  # never finished or closed: its process died
+    ret = Retention(str(tmp_path), RetentionPolicy(max_age_days=None, failed_max_age_days=None), catalog=rm.catalog)
+    assert ret.run_once(now=time.time() + 3600).abandoned == 0
+    assert ret.run_once(now=time.time() + 3 * 86400).abandoned == 1
+    assert rm.catalog.get(stale.run_id).status == "incomplete"
+
+def test_run_ids_unique_sortable_and_sharded(tmp_path):
+    import threading
+    import time
+
+    from src.agent_core.runtime.run_ids import iter_run_dirs, new_ulid, parse_run_id, run_dir_for
+
+    ids = [new_ulid(now_ms=1_700_000_000_000) for _ in range(1000)]  # same millisecond
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+
+    rm = RunManager(str(tmp_path), catalog=False)
+    ctxs = []
+    workers = [threading.Thread(target=lambda: ctxs.append(rm.start(tag="w"))) for _ in range(16)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    assert len({c.run_id for c in ctxs}) == 16
+
+    ctx = ctxs[0]
+    assert run_dir_for(tmp_path, ctx.run_id) == ctx.run_dir
+    day = time.strftime("%Y/%m/%d", time.gmtime(parse_run_id(ctx.run_id)[0]))
+    assert ctx.run_dir.parent.relative_to(tmp_path).as_posix() == day
+    (tmp_path / "20240101_120000_old").mkdir()  # legacy flat run
+    found = {p.name for p in iter_run_dirs(tmp_path)}
+    assert found == {c.run_id for c in ctxs} | {"20240101_120000_old"}
+    assert parse_run_id("20240101_120000_old")[1] == "old"
+
+
+def test_retention_packs_and_expires_runs(tmp_path):
+    from src.agent_core.runtime.retention import Retention, RetentionPolicy
+
+    rm = RunManager(str(tmp_path))
+    ctxs = {}
+    for tag, final in (("ok", "DONE"), ("bad", "FAILED"), ("pinned", "DONE")):
+        ctx = ctxs[tag] = rm.start(tag=tag)
+        rm.save_text(ctx, "step_01_obs.txt", "x" * 5000)
+        rm.save_text(ctx, "step_01_obs.txt", "y" * 5000)  # superseded record is dropped when packing
+        rm.save_text(ctx, "final.txt", final)
+        (ctx.run_dir / "plot.png").write_bytes(b"\x89PNG\x00\x01")
+
+    policy = RetentionPolicy(max_age_days=1, failed_max_age_days=3, tag_max_age_days={"pinned": None}, compress_after_s=0)
+    ret = Retention(str(tmp_path), policy, catalog=rm.catalog)
+    rep = ret.run_once(now=time.time() + 1)
+    assert (rep.packed, rep.deleted) == (3, 0) and rep.bytes_reclaimed > 0
+
+    r = rm.reader(ctxs["ok"].run_id)
+    assert r.packed is not None and r.read_text("final.txt") == "DONE"
+    assert r.read_text("step_01_obs.txt") == "y" * 5000
+    assert r.read_bytes("plot.png") == b"\x89PNG\x00\x01"
+    assert len(list(ctxs["ok"].run_dir.iterdir())) == 2  # archive + its index
+
+    rep = ret.run_once(now=time.time() + 2 * 86400)
+    assert rep.deleted == 1 and not ctxs["ok"].run_dir.exists()
+    rep = ret.run_once(now=time.time() + 10 * 86400)
+    assert rep.deleted == 1 and ctxs["pinned"].run_dir.exists()
+    assert rm.catalog.count() == 1
+
+
+def test_late_writes_survive_packing(tmp_path):
+    from src.agent_core.runtime.retention import Retention, RetentionPolicy
+
+    rm = RunManager(str(tmp_path), async_writes=True)
+    ctx = rm.start(tag="late")
+    rm.save_text(ctx, "step_01_obs.txt", "x")
+    rm.save_text(ctx, "final.txt", "DONE")  # finish() flushes the writer before the row says finished
+
+    ret = Retention(str(tmp_path), RetentionPolicy(compress_after_s=60), catalog=rm.catalog)
+    assert ret.run_once(now=time.time() + 1).packed == 0  # within the grace after finishing
+    pack_run_dir(ctx.run_dir)  # what a later pass does
+    assert rm.reader(ctx).read_text("final.txt") == "DONE"
+
+    rm.save_json(ctx, "trace.json", {"late": 1})  # e.g. the trace re-exported by close()
+    rm.close()
+    r = rm.reader(ctx)
+    assert r.packed is not None and r.read_json("trace.json") == {"late": 1}
+    assert r.read_text("step_01_obs.txt") == "x" and r.read_text("final.txt") == "DONE"
+
+    pack_run_dir(ctx.run_dir)  # folds the leftover segment into the archive
+    r = rm.reader(ctx)
+    assert not r.has_segment and len(list(ctx.run_dir.iterdir())) == 2
+    assert r.read_json("trace.json") == {"late": 1} and r.read_text("final.txt") == "DONE"
@@ -0,0 +1,145 @@
+import json
+import threading
+
+from src.agent_core.memory.sqlite_store import EpisodeRow, SQLiteMemoryStore
+
+
+def test_wal_batch_and_concurrent_writers(tmp_path):
+    store = SQLiteMemoryStore(str(tmp_path / "mem.db"))
+    assert store._conn().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert store.add_episodes([EpisodeRow("r0", "a", True, {"x": 0})] + [(f"r{i}", "b", False, {}) for i in range(1, 100)]) == 100
+
+    def worker(w):
+        for i in range(20):
+            store.add_episode(f"w{w}_{i}", "c", i % 2 == 0, {"w": w})
+        store.recent(5)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert store.count() == 180
+    assert len(store._all) == 5  # one connection per thread, reused across calls
+    assert store.by_task("a")[0].payload == {"x": 0}
+    store.close()
+    assert SQLiteMemoryStore(str(tmp_path / "mem.db")).count() == 180
+
+
+def _ep(task, ok_flags, out="x"):
+    return {
+        "task": task,
+        "ok": all(ok_flags),
+        "history": [
+            {"step": i + 1, "action": {"name": "python_exec", "args": {}},
+             "result": {"name": "python_exec", "ok": ok, "output": out, "error": None if ok else "Traceback...\nKeyError: 'a'"}}
+            for i, ok in enumerate(ok_flags)
+        ],
+    }
+
+
+def test_payload_round_trips_exactly(tmp_path):
+    store = SQLiteMemoryStore(str(tmp_path / "mem.db"))
+    payload = {"task": "T", "meta": {"k": [1]}, "history": [
+        "free-form note",
+        {"step": 1, "result": {"ok": True, "output": {"rows": 3}, "error": None}},
+        {"step": 2, "result": {"ok": False}},
+        {"step": 3, "result": {"ok": True, "output": "done"}},
+        {"step": 4, "result": "not a dict"},
+        ["a", 1],
+    ]}
+    store.add_episode("r", "T", True, payload)
+    assert store.by_task("T")[0].payload == payload
+    assert store.step_output(1, 3) == ("done", None)
+
+
+def test_migrates_payload_table_and_queries_failure_rate(tmp_path):
+    import json
+    import sqlite3
+
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE episodes (id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT, task TEXT, ok INTEGER, payload TEXT)")
+    conn.execute("INSERT INTO episodes(run_id, task, ok, payload) VALUES(?,?,?,?)", ("r1", "A", 0, json.dumps(_ep("A", [False, True], "y" * 5000))))
+    conn.commit()
+    conn.close()
+
+    store = SQLiteMemoryStore(path)
+    assert store._conn().execute("PRAGMA user_version").fetchone()[0] == 2
+    assert store.by_task("A")[0].payload == _ep("A", [False, True], "y" * 5000)
+    assert store.step_output(1, 1) == ("y" * 5000, None)
+    (blob_len,) = store._conn().execute("SELECT length(output) FROM steps WHERE episode_id=1 AND idx=0").fetchone()
+    assert blob_len < 200  # large outputs are stored compressed
+
+    store.add_episodes([(f"r{i}", "B", False, _ep("B", [False, False, True])) for i in range(3)])
+    rates = {r["task"]: (r["n"], r["failures"]) for r in store.failure_rate("python_exec")}
+    assert rates == {"A": (2, 1), "B": (9, 6)}
+    assert {r["task"] for r in store.failure_rate("python_exec", last_n=2)} == {"B"}
+    (cls,) = store._conn().execute("SELECT DISTINCT error_class FROM steps WHERE ok=0").fetchone()
+    assert cls == "KeyError"
+    assert {r["task"] for r in store.search("KeyError: 'a'", limit=20)} == {"A", "B"}  # migrated rows backfilled
+
+
+def test_search_ranks_normalized_errors(tmp_path):
+    store = SQLiteMemoryStore(str(tmp_path / "mem.db"))
+    tb = 'Traceback (most recent call last):\n  File "/tmp/run_1/solution.py", line 12, in <module>\nModuleNotFoundError: No module named \'pandas\''
+    ep = _ep("load csv", [False, True])
+    ep["history"][0]["result"]["error"] = tb
+    ep["history"][1]["critic_instruction"] = "use the csv module instead of pandas"
+    store.add_episodes([("r1", "load csv", False, ep), ("r2", "other", False, _ep("other", [False]))])
+
+    hits = store.search('File "/home/u/x/solution.py", line 99\nModuleNotFoundError: pandas')
+    assert (hits[0]["task"], hits[0]["kind"], hits[0]["idx"]) == ("load csv", "error", 0)
+    assert "[pandas]" in hits[0]["snippet"] and "/tmp/run_1" not in hits[0]["snippet"]
+    assert [h["idx"] for h in store.search("pandas", kind="critic")] == [1]
+    assert store.search("") == []
+
+
+def test_similar_episodes_finds_reworded_tasks(tmp_path):
+    store = SQLiteMemoryStore(str(tmp_path / "mem.db"))
+    tasks = [f"Plot a histogram of column {c} from sales_{c}.csv and save it as hist.png" for c in "xyz"]
+    tasks += [f"unrelated task number {i} about parsing json configs" for i in range(200)]
+    store.add_episodes([(f"r{i}", t, i != 1, _ep(t, [True])) for i, t in enumerate(tasks)])
+
+    hits = store.similar_episodes("plot histogram of column x from sales_x.csv, save as hist.png", k=3)
+    assert [row.task for _, row in hits] == [tasks[0], tasks[2]]  # tasks[1] failed; ok=True by default
+    assert hits[0][0] > 0.5
+    assert [row.task for _, row in store.similar_episodes(tasks[1], ok=None)][0] == tasks[1]
+    store.add_episodes([(f"f{i}", tasks[0], False, _ep(tasks[0], [False])) for i in range(5)])
+    assert store.lsh.max_id(store._conn()) == 203  # inserts leave the index alone
+    hits = store.similar_episodes(tasks[0], k=1)  # syncs; the 5 newest colliding episodes failed
+    assert store.lsh.max_id(store._conn()) == 208 and hits[0][1].ok
+    assert [eid for eid, _ in store.lsh.query(store._conn(), tasks[0], ok=True, max_candidates=2)] == [1, 3]
+    store.close()
+    reopened = SQLiteMemoryStore(str(tmp_path / "mem.db"))
+    reopened._conn().execute("DROP TABLE lsh_sigs")
+    reopened._conn().execute("DROP TABLE lsh_bands")
+    reopened._conn().commit()
+    assert SQLiteMemoryStore(str(tmp_path / "mem.db")).similar_episodes(tasks[0], k=1)[0][1].task == tasks[0]  # backfilled
+
+
+def test_import_from_episodic_dedupes_and_resumes(tmp_path):
+    from src.agent_core.memory.episodic import EpisodicMemory
+    from src.agent_core.memory.importer import import_episodic
+
+    mem = EpisodicMemory(str(tmp_path / "memory"))
+    for i in range(5):
+        mem.save_episode(f"t{i % 2}", _ep(f"t{i % 2}", [True])["history"], {"ok": True, "i": i})
+    mem.save_episode("t0", _ep("t0", [True])["history"], {"ok": True, "i": 0})  # same content as episode 1
+    store = SQLiteMemoryStore(str(tmp_path / "mem.db"))
+
+    first = import_episodic(str(tmp_path / "memory"), store, batch=2, limit=3)
+    assert (first["imported"], first["last_id"]) == (3, 3)
+    rest = import_episodic(str(tmp_path / "memory"), store, batch=2)
+    assert (rest["scanned"], rest["imported"], rest["duplicates"], rest["last_id"]) == (3, 2, 1, 6)
+    assert import_episodic(str(tmp_path / "memory"), store)["scanned"] == 0
+    assert store.count() == 5 and [r.payload["meta"]["i"] for r in store.by_task("t0")] == [4, 2, 0]
+
+    # an id allocated by a writer that has not written its episode yet holds the watermark back
+    late = mem._allocate_id()
+    mem.save_episode("t2", _ep("t2", [True])["history"], {"ok": True, "i": 8})
+    assert import_episodic(str(tmp_path / "memory"), store)["last_id"] == 6
+    mem.path_for(late).write_text(json.dumps({"id": late, "task": "t3", "history": [], "meta": {"i": 7}}))
+    last = import_episodic(str(tmp_path / "memory"), store)
+    assert (last["imported"], last["last_id"]) == (2, 8) and store.count() == 7
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.agent_core.runtime import tracing
+from src.agent_core.runtime.executor import execute_tool
+from src.agent_core.runtime.run_manager import RunManager
+from src.agent_core.schemas.tool import ToolCall
+from src.agent_core.specs.task_spec import TaskSpec
+from src.agent_core.verify.verifier import verify
+
+
+def test_disabled_span_is_shared_noop():
+    assert tracing.current() is None
+    assert tracing.span("x", a=1) is tracing.span("y")
+
+
+def test_run_trace_exported_as_chrome_events(tmp_path):
+    with RunManager(str(tmp_path), trace=True) as rm:
+        ctx = rm.start(tag="t")
+        for step in tracing.steps(range(1, 3)):
+            res = execute_tool(ToolCall(name="shell_exec", args={"cmd": "echo 1"}))
+            verify(TaskSpec(task="t"), res)
+            rm.save_json(ctx, f"step_{step:02d}_result.json", res.model_dump())
+            if step == 2:
+                rm.save_text(ctx, "final.txt", "DONE")
+    assert tracing.current() is None
+
+    trace = rm.reader(ctx).read_json("trace.json")
+    spans = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    names = [e["name"] for e in spans]
+    assert names.count("step") == 2 and names.count("tool") == 2 and names.count("verify") == 2
+    assert not any(e["args"].get("open") for e in spans)  # re-exported on close with the last step closed
+    step2 = next(e for e in spans if e["name"] == "step" and e["args"]["step"] == 2)
+    tool2 = [e for e in spans if e["name"] == "tool"][1]
+    assert step2["ts"] <= tool2["ts"] and tool2["ts"] + tool2["dur"] <= step2["ts"] + step2["dur"]
+    assert tool2["args"] == {"tool": "shell_exec", "ok": True}
+
+
+def test_tracer_scoped_to_run_and_propagated_to_threads(tmp_path):
+    rm = RunManager(str(tmp_path), trace=True)
+    ctx = rm.start(tag="t")
+    with ThreadPoolExecutor(2) as pool:
+        def work(i):
+            with tracing.span("work", i=i):
+                return i
+
+        assert list(pool.map(tracing.propagate(work), range(2))) == [0, 1]
+    rm.finish(ctx, "done")
+    assert tracing.current() is None  # finished but not closed: later spans go nowhere
+    with tracing.span("after"):
+        pass
+    names = [e["name"] for e in ctx.tracer.events]
+    assert names.count("work") == 2 and "after" not in names
+    rm.close()
@@ -0,0 +1,50 @@
+from src.agent_core.search.beam import evaluate_candidates
+from src.agent_core.search.transposition import TranspositionTable, action_key, canonical_action, state_hash
+from src.agent_core.specs.task_spec import TaskSpec
+
+
+def test_action_keys_ignore_formatting_only():
+    a = {"name": "python_exec", "args": {"code": "\nprint(1)   \n"}}
+    b = {"args": {"code": "print(1)"}, "name": "python_exec"}
+    assert action_key(a) == action_key(b)
+    assert action_key({"name": "shell_exec", "args": {"cmd": " ls   -l "}}) == action_key(
+        {"name": "shell_exec", "args": {"cmd": "ls -l"}})
+    assert action_key({"name": "shell_exec", "args": {"cmd": "echo 'a  b'"}}) != action_key(
+        {"name": "shell_exec", "args": {"cmd": "echo 'a b'"}})
+    assert canonical_action({"name": "pip_install", "args": {"packages": ["b", "a", "a"]}})["args"] == {"packages": ["a", "b"]}
+
+
+def test_shell_keys_keep_newlines_and_heredoc_bodies():
+    def key(cmd):
+        return action_key({"name": "shell_exec", "args": {"cmd": cmd}})
+
+    assert key("echo a\necho b") != key("echo a echo b")
+    heredoc = "cat <<EOF > f.txt\n  a   b\nEOF\nwc -l f.txt"
+    assert key(heredoc) != key("cat <<EOF > f.txt a b EOF wc -l f.txt")
+    assert key(heredoc) != key(heredoc.replace("  a   b", "a b"))
+    assert key(heredoc.replace("wc -l", "wc   -l")) == key(heredoc)
+    assert key("echo a\\\n   b") != key("echo a\\\nb")
+
+
+def test_table_replays_result_and_files_without_executing(tmp_path):
+    base, marker = tmp_path / "base", tmp_path / "executions.log"
+    base.mkdir()
+    (base / "in.txt").write_text("2")
+    h0 = state_hash(base)
+    spec = TaskSpec(task="double", required_files=["out.txt"], stdout_is_number=True)
+    cmd = f"echo run >> {marker}; echo $(( $(cat in.txt) * 2 )) | tee out.txt"
+    cands = [{"name": "shell_exec", "args": {"cmd": cmd}}, {"name": "shell_exec", "args": {"cmd": "  " + cmd}}]
+    table = TranspositionTable()
+
+    first = evaluate_candidates(cands, spec, base=str(base), table=table, race=False)
+    assert [e.status for e in first.evals] == ["done", "duplicate"] and first.evals[1].duplicate_of == 0
+    second = evaluate_candidates(cands[1:], spec, base=str(base), table=table)
+    try:
+        ev = second.evals[0]
+        assert ev.cached and ev.verify_ok and ev.result.output == "4"
+        assert (ev.workspace.root / "out.txt").read_text().strip() == "4"
+        assert marker.read_text().count("run") == 1 and table.stats()["hits"] == 1
+        assert second.adopt(ev) == ["out.txt"] and state_hash(base) != h0
+    finally:
+        first.cleanup()
+        second.cleanup()